@@ -0,0 +1,130 @@
+"""
+关键词匹配性能基准测试
+对比旧的逐关键词子串扫描与 crawler.matcher 自动机的每秒匹配帖子数
+
+用法: python bench_matcher.py [--keywords 10000] [--posts 1000000]
+关键词和帖子正文用固定种子随机生成（常用汉字为主，混入英文和全角字符），
+旧匹配路径耗时与关键词数成正比，只取部分帖子测速后按比例估算总耗时。
+"""
+import sys
+import os
+import time
+import random
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawler.matcher import KeywordMatcher
+from utils.text import normalize
+
+# 常用汉字，关键词和正文都从中取字，保证有一定命中率
+COMMON_CHARS = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动'
+                '同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二'
+                '理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社'
+                '义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没'
+                '结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活'
+                '设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放'
+                '决西被干做必战先回则任取据处队南给色光门即保治北造百规热领七海口东导器压志世金增争'
+                '济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具'
+                '万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石')
+ASCII_WORDS = ['iPhone', 'Mate', 'Switch', 'OLED', 'Pro', 'Max', 'AI', 'GPU', 'VR', 'Ultra']
+
+
+def make_keywords(count, rng):
+    """生成不重复的关键词"""
+    keywords = set()
+    while len(keywords) < count:
+        if rng.random() < 0.1:
+            keyword = rng.choice(ASCII_WORDS) + str(rng.randint(1, 99))
+        else:
+            keyword = ''.join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(2, 4)))
+        keywords.add(keyword)
+    return sorted(keywords)
+
+
+def make_posts(count, rng, length=80):
+    """生成帖子正文，部分英文写成全角或大写，检验折叠"""
+    posts = []
+    for _ in range(count):
+        parts = [''.join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(5, 15)))
+                 for _ in range(length // 10)]
+        if rng.random() < 0.3:
+            word = rng.choice(ASCII_WORDS) + str(rng.randint(1, 99))
+            if rng.random() < 0.5:
+                word = ''.join(chr(ord(c) + 0xFEE0) for c in word.upper())
+            parts.insert(rng.randrange(len(parts)), word)
+        posts.append('，'.join(parts))
+    return posts
+
+
+def legacy_match(keywords, content, match_mode='any'):
+    """重构前的匹配：每条帖子把每个关键词转小写后做一次子串查找"""
+    content = content.lower()
+    matched = []
+    for keyword in keywords:
+        keyword_lower = keyword.lower().strip()
+        if keyword_lower and keyword_lower in content:
+            matched.append(keyword)
+    if match_mode == 'all':
+        return matched if len(matched) == len(keywords) else []
+    return matched
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='关键词匹配性能基准测试')
+    arg_parser.add_argument('--keywords', type=int, default=10000, help='关键词数')
+    arg_parser.add_argument('--posts', type=int, default=1000000, help='帖子数')
+    arg_parser.add_argument('--distinct', type=int, default=20000, help='不同正文数，循环使用')
+    arg_parser.add_argument('--legacy-posts', type=int, default=500, help='旧匹配路径实测的帖子数')
+    args = arg_parser.parse_args()
+
+    rng = random.Random(42)
+    keywords = make_keywords(args.keywords, rng)
+    posts = make_posts(min(args.distinct, args.posts), rng)
+
+    print("=" * 60)
+    print("关键词匹配性能基准测试")
+    print("=" * 60)
+    print(f"关键词: {len(keywords)} 个，帖子: {args.posts} 条（{len(posts)} 种正文，"
+          f"平均 {sum(map(len, posts)) // len(posts)} 字）\n")
+
+    started = time.perf_counter()
+    matcher = KeywordMatcher(keywords)
+    print(f"  编译自动机     {time.perf_counter() - started:>10.3f} 秒")
+
+    legacy_count = min(args.legacy_posts, args.posts)
+    started = time.perf_counter()
+    for i in range(legacy_count):
+        legacy_match(keywords, posts[i % len(posts)])
+    legacy_rate = legacy_count / (time.perf_counter() - started)
+    print(f"  旧匹配路径     {legacy_rate:>10,.0f} 帖子/秒  "
+          f"(实测 {legacy_count} 条，{args.posts} 条估算 {args.posts / legacy_rate:,.0f} 秒)")
+
+    # 入库时每条帖子归一化一次，匹配直接扫描归一化内容
+    started = time.perf_counter()
+    normalized = [normalize(content) for content in posts]
+    elapsed = time.perf_counter() - started
+    print(f"  归一化（入库） {len(posts) / elapsed:>10,.0f} 帖子/秒")
+
+    hits = 0
+    matched_posts = 0
+    started = time.perf_counter()
+    for i in range(args.posts):
+        found = matcher.scan(normalized[i % len(normalized)])
+        if found:
+            matched_posts += 1
+            hits += len(found)
+    elapsed = time.perf_counter() - started
+    rate = args.posts / elapsed
+    print(f"  自动机         {rate:>10,.0f} 帖子/秒  ({args.posts} 条，{elapsed:.2f} 秒)")
+    print(f"\n命中帖子: {matched_posts}（{matched_posts / args.posts:.1%}），命中次数: {hits}")
+
+    # 抽样核对：对归一化后的正文，旧路径与自动机结果一致
+    for content in posts[:200]:
+        assert set(legacy_match(keywords, normalize(content))) == set(matcher.matched_keywords(content))
+
+    print(f"\n加速比: {rate / legacy_rate:.1f}x")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
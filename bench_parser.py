@@ -0,0 +1,165 @@
+"""
+解析性能基准测试
+对比旧解析路径与 crawler.parser 快速路径的每秒解析帖子数
+
+用法: python bench_parser.py [fixture.json ...]
+默认使用 weibo_search_response.json，从中取出真实的 mblog，
+再按 container/getIndex 的格式拼成分页响应（混入非微博卡片）进行测试。
+"""
+import sys
+import os
+import re
+import json
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawler import parser
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weibo_search_response.json')
+
+# 常见的相对时间写法，模拟真实分页中的 created_at 分布
+TIME_SAMPLES = ['刚刚', '3分钟前', '25分钟前', '2小时前', '今天 12:30', '昨天 08:05',
+                'Mon Jan 19 15:23:04 +0800 2026']
+
+
+def collect_mblogs(node, found):
+    """递归收集响应中的 mblog（带 idstr 和 text 的对象）"""
+    if isinstance(node, dict):
+        if 'text' in node and ('idstr' in node or 'mid' in node):
+            found.append(node)
+        for value in node.values():
+            collect_mblogs(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            collect_mblogs(value, found)
+    return found
+
+
+def build_pages(fixture_paths, cards_per_page=10, pages=50):
+    """用夹具中的 mblog 拼出 getIndex 分页响应（bytes）"""
+    mblogs = []
+    for path in fixture_paths:
+        with open(path, 'rb') as f:
+            data = json.loads(f.read())
+        # 已经是 getIndex 响应时直接使用
+        if isinstance(data.get('data'), dict) and data['data'].get('cards'):
+            mblogs.extend(card['mblog'] for card in data['data']['cards']
+                          if card.get('card_type') == 9 and card.get('mblog'))
+        else:
+            mblogs.extend(collect_mblogs(data, []))
+
+    if not mblogs:
+        raise SystemExit("夹具中没有找到 mblog")
+
+    result = []
+    n = 0
+    for _ in range(pages):
+        cards = []
+        for _ in range(cards_per_page):
+            mblog = dict(mblogs[n % len(mblogs)])
+            mblog['id'] = mblog.get('idstr') or mblog.get('mid')
+            mblog['text'] = f'<a href="/n/x">@用户</a> {mblog["text"]}&nbsp;<br />'
+            mblog['created_at'] = TIME_SAMPLES[n % len(TIME_SAMPLES)]
+            cards.append({'card_type': 9, 'mblog': mblog})
+            n += 1
+        # 真实分页中夹杂的非微博卡片
+        cards.append({'card_type': 11, 'card_group': [{'card_type': 4, 'desc': '推荐'}]})
+        page = {'ok': 1, 'data': {'cards': cards, 'cardlistInfo': {'page': 1}}}
+        result.append(json.dumps(page, ensure_ascii=False).encode('utf-8'))
+    return result, len(mblogs)
+
+
+def legacy_parse_time(time_str):
+    """重构前的时间解析（逐分支正则）"""
+    try:
+        if '刚刚' in time_str:
+            return datetime.now()
+        elif '分钟前' in time_str:
+            minutes = int(re.search(r'(\d+)', time_str).group(1))
+            return datetime.now() - timedelta(minutes=minutes)
+        elif '小时前' in time_str:
+            hours = int(re.search(r'(\d+)', time_str).group(1))
+            return datetime.now() - timedelta(hours=hours)
+        elif '今天' in time_str:
+            time_part = re.search(r'(\d{2}:\d{2})', time_str).group(1)
+            return datetime.strptime(f'{datetime.now().date()} {time_part}', '%Y-%m-%d %H:%M')
+        elif '昨天' in time_str:
+            time_part = re.search(r'(\d{2}:\d{2})', time_str).group(1)
+            yesterday = datetime.now().date() - timedelta(days=1)
+            return datetime.strptime(f'{yesterday} {time_part}', '%Y-%m-%d %H:%M')
+        else:
+            return datetime.strptime(time_str, '%a %b %d %H:%M:%S %z %Y')
+    except Exception:
+        return datetime.now()
+
+
+def legacy_parse_page(raw):
+    """重构前的解析路径：标准库 json + 未预编译的 re.sub"""
+    data = json.loads(raw.decode('utf-8'))
+    posts = []
+    for card in data['data'].get('cards', []):
+        if card.get('card_type') != 9:
+            continue
+        mblog = card.get('mblog')
+        if not mblog:
+            continue
+        text = re.sub(r'<[^>]+>', '', mblog.get('text', ''))
+        images = [pic.get('large', {}).get('url', '') for pic in mblog.get('pics', [])]
+        posts.append({
+            'post_id': str(mblog.get('id', '')),
+            'content': text,
+            'images': json.dumps(images) if images else None,
+            'likes': mblog.get('attitudes_count', 0),
+            'comments': mblog.get('comments_count', 0),
+            'shares': mblog.get('reposts_count', 0),
+            'published_at': legacy_parse_time(mblog.get('created_at', '')),
+        })
+    return posts
+
+
+def fast_parse_page(raw):
+    """快速路径"""
+    data = parser.loads(raw)
+    now = datetime.now()
+    return [parser.parse_mblog(mblog, now) for mblog in parser.iter_mblogs(data['data'].get('cards', []))]
+
+
+def run(name, func, pages, min_seconds=1.0):
+    """重复解析直到超过 min_seconds，返回每秒帖子数"""
+    count = 0
+    rounds = 0
+    started = time.perf_counter()
+    while True:
+        for raw in pages:
+            count += len(func(raw))
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+    rate = count / elapsed
+    print(f"  {name:<12} {rate:>12,.0f} 帖子/秒  ({count} 条, {rounds} 轮, {elapsed:.2f} 秒)")
+    return rate
+
+
+def main():
+    fixtures = sys.argv[1:] or [DEFAULT_FIXTURE]
+    pages, unique = build_pages(fixtures)
+
+    print("=" * 60)
+    print("解析性能基准测试")
+    print("=" * 60)
+    print(f"夹具: {', '.join(os.path.basename(p) for p in fixtures)} ({unique} 条不同 mblog)")
+    print(f"JSON 解码: {'orjson' if parser.orjson else 'json (未安装 orjson)'}")
+    per_page = len(fast_parse_page(pages[0]))
+    print(f"分页数: {len(pages)}，每页 {per_page} 条微博\n")
+
+    legacy = run("旧解析路径", legacy_parse_page, pages)
+    fast = run("快速路径", fast_parse_page, pages)
+
+    print(f"\n加速比: {fast / legacy:.2f}x")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+原始响应归档 - 按段轮转的压缩 JSONL，用于离线重新解析
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from config import config, DATA_DIR
+from utils.logger import get_logger
+from .parser import loads, iter_mblogs, parse_mblog, parse_aweme
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时使用 gzip
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ARCHIVE_DIR = DATA_DIR / 'archive'
+
+# 读取截断的段时可能出现的异常
+_READ_ERRORS = (EOFError, OSError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def _dumps(obj) -> bytes:
+    """紧凑序列化为 bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _Segment:
+    """正在写入的归档段"""
+
+    def __init__(self, path: Path, compression: str):
+        self.path = path
+        self.opened_at = time.monotonic()
+        self.raw_bytes = 0
+        self._file = open(path, 'wb')
+        if compression == 'zstd':
+            self._writer = zstandard.ZstdCompressor(level=3).stream_writer(self._file)
+        else:
+            self._writer = gzip.GzipFile(fileobj=self._file, mode='wb', compresslevel=6)
+
+    def write(self, line: bytes):
+        self._writer.write(line)
+        self.raw_bytes += len(line)
+
+    def close(self):
+        self._writer.close()
+        if not self._file.closed:
+            self._file.close()
+
+
+class RawArchive:
+    """
+    原始响应归档
+
+    每个平台一个当前段，超过大小或时长后轮转。每行一条记录:
+    {"ts": 抓取时间戳, "platform", "kind", "user_id", "body": 原始响应JSON}
+    body 直接拼接原始字节，不做二次序列化。
+    """
+
+    def __init__(self, archive_dir: Path = ARCHIVE_DIR):
+        self.archive_dir = Path(archive_dir)
+        self.logger = get_logger('crawler.archive')
+        self._lock = threading.Lock()
+        self._segments: Dict[str, _Segment] = {}
+        self._sequence = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用归档"""
+        return config.get('archive.enabled', False)
+
+    @property
+    def compression(self) -> str:
+        """实际使用的压缩格式"""
+        return 'zstd' if zstandard is not None else 'gzip'
+
+    def append(self, platform: str, kind: str, user_id: str, body: bytes):
+        """追加一条原始响应"""
+        if not self.enabled or not body:
+            return
+        # 原始响应带换行时重新压缩成一行
+        if b'\n' in body:
+            body = _dumps(loads(body))
+        meta = _dumps({'ts': time.time(), 'platform': platform, 'kind': kind, 'user_id': user_id})
+        line = meta[:-1] + b',"body":' + body + b'}\n'
+
+        with self._lock:
+            try:
+                segment = self._current_segment(platform)
+                segment.write(line)
+            except OSError as e:
+                self.logger.error(f"写入归档失败: {e}")
+
+    def close(self):
+        """关闭所有段"""
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def _current_segment(self, platform: str) -> _Segment:
+        """获取当前段，必要时轮转（调用方持有锁）"""
+        segment = self._segments.get(platform)
+        max_bytes = config.get('archive.segment_mb', 64) * 1024 * 1024
+        max_age = config.get('archive.segment_minutes', 60) * 60
+        if segment and (segment.raw_bytes >= max_bytes
+                        or time.monotonic() - segment.opened_at >= max_age):
+            segment.close()
+            self.logger.debug(f"归档段已轮转: {segment.path.name}")
+            segment = None
+        if segment is None:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            suffix = '.jsonl.zst' if self.compression == 'zstd' else '.jsonl.gz'
+            self._sequence += 1
+            name = f"{platform}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{self._sequence:04d}{suffix}"
+            segment = _Segment(self.archive_dir / name, self.compression)
+            self._segments[platform] = segment
+        return segment
+
+
+def list_segments(archive_dir: Path = ARCHIVE_DIR, platform: Optional[str] = None) -> List[Path]:
+    """列出归档段（按文件名即时间排序）"""
+    archive_dir = Path(archive_dir)
+    if not archive_dir.exists():
+        return []
+    prefix = f"{platform}-" if platform else ''
+    return sorted(p for p in archive_dir.iterdir()
+                  if p.name.startswith(prefix) and p.name.endswith(('.jsonl.zst', '.jsonl.gz')))
+
+
+def iter_records(path: Path) -> Iterator[Dict]:
+    """
+    逐条读取归档段
+
+    正在写入或异常退出的段末尾可能不完整，读到截断处即停止。
+    """
+    path = Path(path)
+    with open(path, 'rb') as f:
+        if path.name.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("读取 .zst 归档需要安装 zstandard")
+            stream = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        else:
+            stream = gzip.GzipFile(fileobj=f, mode='rb')
+        buffer = b''
+        try:
+            while True:
+                chunk = stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                buffer += chunk
+                lines = buffer.split(b'\n')
+                buffer = lines.pop()
+                for line in lines:
+                    if line:
+                        yield loads(line)
+        except _READ_ERRORS:
+            pass
+
+
+def parse_record(record: Dict) -> List[Dict]:
+    """
+    把一条归档记录解析为帖子行（含 platform/user_id/username/fetched_at），
+    相对时间按抓取时间而不是当前时间计算
+    """
+    if record.get('kind') != 'posts_page':
+        return []
+    platform = record.get('platform')
+    body = record.get('body') or {}
+    fetched_at = datetime.fromtimestamp(record.get('ts', time.time()))
+    rows = []
+
+    if platform == 'weibo':
+        if body.get('ok') != 1:
+            return []
+        for mblog in iter_mblogs(body.get('data', {}).get('cards', [])):
+            user = mblog.get('user') or {}
+            post = parse_mblog(mblog, fetched_at)
+            post['user_id'] = str(user.get('id') or record.get('user_id'))
+            post['username'] = user.get('screen_name') or ''
+            rows.append(post)
+    elif platform == 'douyin':
+        for aweme in body.get('aweme_list') or []:
+            author = aweme.get('author') or {}
+            post = parse_aweme(aweme)
+            post['user_id'] = str(author.get('uid') or record.get('user_id'))
+            post['username'] = author.get('nickname') or ''
+            rows.append(post)
+
+    for post in rows:
+        post['platform'] = platform
+        post['fetched_at'] = fetched_at
+    return rows
+
+
+def parse_segment(path: Path) -> List[Dict]:
+    """解析整个归档段，同一帖子只保留最后一次抓取的结果"""
+    latest = {}
+    for record in iter_records(path):
+        for post in parse_record(record):
+            latest[(post['platform'], post['post_id'])] = post
+    return list(latest.values())
+
+
+# 全局归档实例
+raw_archive = RawArchive()
@@ -2,18 +2,34 @@
 爬虫基类
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import time
+import requests
+from config import config
 from utils.logger import get_logger
+from .resilience import (RetryPolicy, CrawlerRequestError, CircuitOpenError,
+                         classify_status, get_breaker, RESULT_OK, RESULT_TIMEOUT,
+                         RESULT_BLOCKED, RESULT_THROTTLED)
+from .proxy_pool import proxy_pool
 
 class BaseCrawler(ABC):
     """爬虫基类"""
     
+    # 是否支持 probe_latest 轻量探测
+    supports_probe = False
+    # 是否支持 get_post_metrics 单帖互动数据刷新
+    supports_metrics = False
+    # 是否支持 get_posts_page 按游标翻页（历史回填）
+    supports_backfill = False
+    
     def __init__(self, platform: str):
         self.platform = platform
         self.logger = get_logger(f'crawler.{platform}')
         self.session = None
         self.proxy = None
+        self.account = None
+        self.retry_policy = RetryPolicy.from_config()
+        self.breaker = get_breaker(platform)
     
     @abstractmethod
     def get_user_info(self, user_id: str) -> Optional[Dict]:
@@ -43,10 +59,124 @@ class BaseCrawler(ABC):
         """
         pass
     
+    def probe_latest(self, user_id: str) -> Optional[Dict]:
+        """
+        轻量探测最新一条帖子（不支持时返回 None，由调用方走完整爬取）
+        
+        Returns:
+            最新帖子 {post_id, published_at, ...}，没有帖子时返回 None
+        """
+        return None
+    
+    def get_posts_page(self, user_id: str, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按游标获取一页帖子
+        
+        Args:
+            cursor: 上一页返回的游标，None 表示第一页
+            
+        Returns:
+            (帖子列表, 下一页游标)，没有更多时游标为 None
+        """
+        return [], None
+    
+    def get_post_metrics(self, post_id: str) -> Optional[Dict]:
+        """
+        获取单条帖子的互动数据
+        
+        Returns:
+            {likes, comments, shares}，帖子已删除或不可见时返回 None
+        """
+        return None
+    
     def set_proxy(self, proxy: Dict):
-        """设置代理"""
+        """设置固定代理（优先于代理池）"""
         self.proxy = proxy
     
+    def set_account(self, account: str):
+        """设置当前账号，代理池按账号粘性分配代理"""
+        self.account = account
+    
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求，按错误类型重试并上报熔断器
+        
+        超时/连接异常、5xx、429 按指数退避重试；418 表示被反爬拦截，
+        直接熔断不再重试；其他状态码原样返回由调用方处理。
+        启用代理池时每次请求单独选择代理，被拦截只隔离该代理并换代理重试。
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+            CrawlerRequestError: 重试耗尽或被拦截
+        """
+        kwargs.setdefault('timeout', config.get('retry.timeout', 10))
+        attempt = 0
+        while True:
+            if not self.breaker.allow_request():
+                raise CircuitOpenError(self.platform, self.breaker.retry_after())
+            
+            proxy_state = None
+            if self.proxy:
+                kwargs['proxies'] = self.proxy
+            elif proxy_pool.enabled:
+                proxy_state = proxy_pool.select(self.account)
+                kwargs['proxies'] = proxy_state.proxies
+            
+            retry_after = None
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                kind = RESULT_TIMEOUT
+                detail = str(e)
+            except requests.RequestException:
+                # 其他网络异常（分块编码错误、重定向过多、URL 无效等）同样记为失败，
+                # 否则半开状态下的探测会一直处于"进行中"，整个平台无法再请求
+                if proxy_state:
+                    proxy_pool.report(proxy_state, time.monotonic() - started, RESULT_TIMEOUT)
+                self.breaker.record_failure(RESULT_TIMEOUT)
+                raise
+            except Exception:
+                if proxy_state:
+                    proxy_pool.report(proxy_state, time.monotonic() - started, RESULT_TIMEOUT)
+                self.breaker.release_probe()
+                raise
+            else:
+                kind = classify_status(response.status_code)
+                detail = f"HTTP {response.status_code}"
+                retry_after = self._parse_retry_after(response)
+            
+            if proxy_state:
+                proxy_pool.report(proxy_state, time.monotonic() - started, kind)
+                # 拦截针对的是出口IP，换代理即可，不应熔断整个平台
+                if kind == RESULT_BLOCKED:
+                    kind = RESULT_THROTTLED
+            
+            if kind == RESULT_OK:
+                self.breaker.record_success()
+                return response
+            
+            self.breaker.record_failure(kind)
+            if not self.retry_policy.should_retry(kind, attempt):
+                raise CrawlerRequestError(f"请求失败 {url}: {detail}", kind)
+            
+            delay = self.retry_policy.backoff(kind, attempt, retry_after)
+            self.logger.warning(f"请求失败({detail})，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+            time.sleep(delay)
+            attempt += 1
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET 请求"""
+        return self.request('GET', url, **kwargs)
+    
+    @staticmethod
+    def _parse_retry_after(response) -> Optional[float]:
+        """解析 Retry-After 头（仅支持秒数）"""
+        value = response.headers.get('Retry-After')
+        if value and value.isdigit():
+            return float(value)
+        return None
+    
     def sleep(self, seconds: float = 1.0):
         """随机延迟，避免被封"""
         import random
@@ -54,6 +184,5 @@ class BaseCrawler(ABC):
         time.sleep(delay)
     
     def close(self):
-        """关闭爬虫，释放资源"""
-        if self.session:
-            self.session.close()
+        """关闭爬虫，释放资源（会话由 session_pool 共享管理，不在此关闭）"""
+        self.session = None
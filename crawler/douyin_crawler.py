@@ -2,13 +2,21 @@
 抖音爬虫
 使用抖音Web API进行爬取
 """
-import requests
 from typing import List, Dict, Optional
 from datetime import datetime
 import json
 import hashlib
 import time
 from .base import BaseCrawler
+from .parser import parse_aweme
+from .session_pool import session_pool
+
+# 注册共享会话的请求头和预热地址
+session_pool.register('douyin', headers={
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Referer': 'https://www.douyin.com/',
+    'Accept': 'application/json',
+}, prewarm_url='https://www.douyin.com/')
 
 class DouyinCrawler(BaseCrawler):
     """抖音爬虫"""
@@ -16,12 +24,7 @@ class DouyinCrawler(BaseCrawler):
     def __init__(self):
         super().__init__('douyin')
         self.base_url = 'https://www.douyin.com'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Referer': 'https://www.douyin.com/',
-            'Accept': 'application/json',
-        })
+        self.session = session_pool.get_session(self.platform)
     
     def get_user_info(self, user_id: str) -> Optional[Dict]:
         """
@@ -72,41 +75,7 @@ class DouyinCrawler(BaseCrawler):
     def _parse_post(self, aweme: Dict) -> Optional[Dict]:
         """解析视频数据"""
         try:
-            # 提取文本
-            desc = aweme.get('desc', '')
-            
-            # 提取视频封面
-            images = []
-            video = aweme.get('video', {})
-            cover = video.get('origin_cover', {}).get('url_list', [])
-            if cover:
-                images.append(cover[0])
-            
-            # 提取视频链接
-            videos = []
-            play_addr = video.get('play_addr', {}).get('url_list', [])
-            if play_addr:
-                videos.append(play_addr[0])
-            
-            # 统计数据
-            statistics = aweme.get('statistics', {})
-            
-            # 发布时间
-            create_time = aweme.get('create_time', 0)
-            published_at = datetime.fromtimestamp(create_time)
-            
-            return {
-                'post_id': str(aweme.get('aweme_id', '')),
-                'content': desc,
-                'images': json.dumps(images) if images else None,
-                'videos': json.dumps(videos) if videos else None,
-                'likes': statistics.get('digg_count', 0),
-                'comments': statistics.get('comment_count', 0),
-                'shares': statistics.get('share_count', 0),
-                'post_url': f'https://www.douyin.com/video/{aweme.get("aweme_id")}',
-                'published_at': published_at,
-            }
-            
+            return parse_aweme(aweme)
         except Exception as e:
             self.logger.error(f"解析视频异常: {e}")
             return None
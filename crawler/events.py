@@ -0,0 +1,187 @@
+"""
+事件循环与信号 - 不依赖 Qt 的回调调度
+
+爬取、调度、匹配核心只通过这里的 EventLoop 投递回调：
+无界面运行时用 ThreadEventLoop，图形界面用 gui.qt_loop.QtEventLoop 接到 Qt 事件循环上。
+"""
+import heapq
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, List, Optional
+from utils.logger import get_logger
+
+
+class TimerHandle:
+    """延时回调句柄"""
+
+    def __init__(self, when: float, callback: Callable, args: tuple):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """取消（尚未执行时生效）"""
+        self.cancelled = True
+
+    def run(self):
+        """执行回调"""
+        if not self.cancelled:
+            self.callback(*self.args)
+
+
+class EventLoop(ABC):
+    """
+    事件循环接口
+
+    post 可在任意线程调用，回调总是在循环所在线程按投递顺序执行，
+    所以核心对象的状态只在一个线程里修改，不需要加锁。
+    """
+
+    @abstractmethod
+    def post(self, callback: Callable, *args):
+        """投递回调到循环线程（线程安全）"""
+        pass
+
+    @abstractmethod
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒后在循环线程执行回调"""
+        pass
+
+
+class ThreadEventLoop(EventLoop):
+    """无界面事件循环，在调用 run_forever 的线程执行回调"""
+
+    def __init__(self):
+        self.logger = get_logger('events')
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._timers: List = []
+        self._counter = itertools.count()
+        self._stopping = False
+
+    def post(self, callback: Callable, *args):
+        """投递回调（线程安全）"""
+        with self._cond:
+            self._ready.append((callback, args))
+            self._cond.notify()
+
+    def call_later(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒后执行回调（线程安全）"""
+        handle = TimerHandle(time.monotonic() + max(0.0, delay), callback, args)
+        with self._cond:
+            heapq.heappush(self._timers, (handle.when, next(self._counter), handle))
+            self._cond.notify()
+        return handle
+
+    def stop(self):
+        """让 run_forever 在处理完当前回调后返回（可在信号处理函数中调用）"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def run_forever(self, timeout: Optional[float] = None):
+        """运行循环直到 stop()，或 timeout 秒后返回"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stopping = False
+        while True:
+            with self._cond:
+                batch = self._collect(deadline)
+                if batch is None:
+                    return
+            for callback, args in batch:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    self.logger.error(f"回调异常 {getattr(callback, '__name__', callback)}: {e}")
+
+    def _collect(self, deadline: Optional[float]):
+        """等待并取出一批可执行的回调，应当退出时返回 None（调用方持有锁）"""
+        while True:
+            if self._stopping:
+                return None
+            now = time.monotonic()
+            while self._timers and self._timers[0][0] <= now:
+                handle = heapq.heappop(self._timers)[2]
+                if not handle.cancelled:
+                    self._ready.append((handle.run, ()))
+            if self._ready:
+                batch = list(self._ready)
+                self._ready.clear()
+                return batch
+            if deadline is not None and now >= deadline:
+                return None
+            wake = [t for t in (deadline, self._timers[0][0] if self._timers else None)
+                    if t is not None]
+            self._cond.wait(min(wake) - now if wake else None)
+
+
+class Signal:
+    """
+    信号：emit 可在任意线程调用，已连接的回调通过事件循环在循环线程执行
+    （相当于 Qt 的排队连接）
+    """
+
+    def __init__(self, loop: EventLoop):
+        self.loop = loop
+        self._slots: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot: Callable):
+        """连接回调"""
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot: Optional[Callable] = None):
+        """断开回调，slot 为空时断开全部"""
+        with self._lock:
+            if slot is None:
+                self._slots.clear()
+            elif slot in self._slots:
+                self._slots.remove(slot)
+
+    def emit(self, *args):
+        """发出信号"""
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            self.loop.post(slot, *args)
+
+
+class Timer:
+    """事件循环上的定时器（接口与 QTimer 类似，时间单位为秒）"""
+
+    def __init__(self, loop: EventLoop, callback: Callable, single_shot: bool = False):
+        self.loop = loop
+        self.callback = callback
+        self.single_shot = single_shot
+        self.interval = 0.0
+        self._handle: Optional[TimerHandle] = None
+
+    def start(self, interval: Optional[float] = None):
+        """启动（已在运行时重新计时）"""
+        if interval is not None:
+            self.interval = interval
+        self.stop()
+        self._handle = self.loop.call_later(self.interval, self._fire)
+
+    def stop(self):
+        """停止"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def is_active(self) -> bool:
+        """是否在计时"""
+        return self._handle is not None
+
+    def _fire(self):
+        """到时执行回调，重复定时器在回调前安排下一次"""
+        if self.single_shot:
+            self._handle = None
+        else:
+            self._handle = self.loop.call_later(self.interval, self._fire)
+        self.callback()
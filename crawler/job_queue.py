@@ -0,0 +1,167 @@
+"""
+持久化任务队列工作进程 - 从数据库的 crawl_jobs 表认领爬取任务
+
+多个工作进程（可以在不同机器上，共用同一个数据库）各自认领任务：
+认领时写入租约到期时间，运行期间定时续约；进程崩溃或失联时租约过期，
+任务会被其他进程重新认领。程序退出时未完成的任务留在表中，重启后继续。
+"""
+import os
+import socket
+import uuid
+from typing import Dict, List, Optional
+from models.database import db
+from config import config
+from utils.logger import get_logger
+from .events import Signal, Timer
+from .manager import CrawlerManager, CrawlHandle
+from .worker_pool import PRIORITY_MONITOR
+
+
+def make_owner_id() -> str:
+    """工作进程标识：主机名:进程号:随机后缀"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def enqueue(targets: List[Dict], max_posts: Optional[int] = None, priority: int = 0) -> int:
+    """
+    把用户加入任务队列
+
+    Args:
+        targets: [{platform, user_id}]
+        max_posts: 每个任务最多爬取的帖子数，默认使用平台配置
+
+    Returns:
+        新加入的任务数（已有未完成任务的用户跳过）
+    """
+    jobs = [{
+        'platform': target['platform'],
+        'user_id': target['user_id'],
+        'max_posts': max_posts or config.get(f"{target['platform']}.max_posts", 50),
+        'priority': priority,
+    } for target in targets]
+    return db.enqueue_jobs(jobs, config.get('job_queue.max_attempts', 3))
+
+
+class JobWorker:
+    """
+    任务队列工作者
+
+    在事件循环上定时认领任务，交给 CrawlerManager 的线程池执行，
+    同时在运行的任务数不超过 concurrency。
+    """
+
+    def __init__(self, crawler_manager: CrawlerManager, owner: Optional[str] = None,
+                 concurrency: Optional[int] = None, platforms: Optional[List[str]] = None):
+        self.crawler_manager = crawler_manager
+        self.loop = crawler_manager.loop
+        self.owner = owner or make_owner_id()
+        self.concurrency = concurrency or config.get('job_queue.concurrency', 4)
+        self.platforms = platforms
+        self.lease = config.get('job_queue.lease', 60)
+        self.retry_delay = config.get('job_queue.retry_delay', 60)
+        self.logger = get_logger('crawler.jobs')
+        # 信号
+        self.job_done = Signal(self.loop)  # job, ok, message
+        self.active: Dict[int, CrawlHandle] = {}
+        self._jobs: Dict[int, Dict] = {}
+        self._stats = {'claimed': 0, 'done': 0, 'failed': 0, 'lost': 0}
+        self.is_running = False
+        self.claim_timer = Timer(self.loop, self._claim)
+        self.heartbeat_timer = Timer(self.loop, self._heartbeat)
+
+    def start(self):
+        """开始认领任务"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.claim_timer.start(config.get('job_queue.poll', 5))
+        # 续约间隔取租约的三分之一，偶尔一次续约失败也不会丢失租约
+        self.heartbeat_timer.start(config.get('job_queue.heartbeat', self.lease / 3))
+        self.logger.info(f"任务队列工作者 {self.owner} 已启动，并发数: {self.concurrency}")
+        self.loop.post(self._claim)
+
+    def stop(self):
+        """停止认领，取消运行中的任务并交还租约"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.claim_timer.stop()
+        self.heartbeat_timer.stop()
+        job_ids = list(self.active)
+        for handle in self.active.values():
+            handle.stop()
+        self.active.clear()
+        self._jobs.clear()
+        released = self._call(db.release_jobs, self.owner, job_ids) or 0
+        self.logger.info(f"任务队列工作者 {self.owner} 已停止，交还 {released} 个任务")
+
+    def stats(self) -> Dict:
+        """本进程统计和队列各状态任务数"""
+        return dict(self._stats, active=len(self.active), queue=self._call(db.get_job_counts) or {})
+
+    def _claim(self):
+        """认领任务，直到并发数用满或队列为空"""
+        free = self.concurrency - len(self.active)
+        if not self.is_running or free <= 0:
+            return
+        jobs = self._call(db.claim_jobs, self.owner, free, self.lease, self.platforms) or []
+        for job in jobs:
+            self._stats['claimed'] += 1
+            handle = self.crawler_manager.start_crawler(
+                job['platform'], job['user_id'], job['max_posts'], priority=PRIORITY_MONITOR)
+            handle.finished.connect(lambda platform, count, job_id=job['id']:
+                                    self._on_finished(job_id, count))
+            handle.error.connect(lambda platform, message, job_id=job['id']:
+                                 self._on_error(job_id, message))
+            self.active[job['id']] = handle
+            self._jobs[job['id']] = job
+        if jobs:
+            self.logger.debug(f"认领 {len(jobs)} 个任务")
+
+    def _heartbeat(self):
+        """为运行中的任务续约，丢失租约的任务停止执行"""
+        if not self.active:
+            return
+        held = self._call(db.heartbeat_jobs, self.owner, list(self.active), self.lease)
+        if held is None:
+            # 数据库暂时不可用，下次再续约
+            return
+        for job_id in set(self.active) - set(held):
+            self.logger.warning(f"任务 {job_id} 的租约已被其他进程接管，停止执行")
+            self._stats['lost'] += 1
+            self._pop(job_id)[0].stop()
+
+    def _on_finished(self, job_id: int, count: int):
+        """任务完成"""
+        if job_id not in self.active:
+            return
+        _, job = self._pop(job_id)
+        if self._call(db.complete_job, job_id, self.owner, count):
+            self._stats['done'] += 1
+            self.job_done.emit(job, True, f"获取 {count} 条帖子")
+        self.loop.post(self._claim)
+
+    def _on_error(self, job_id: int, message: str):
+        """任务失败，按重试策略重新排队"""
+        if job_id not in self.active:
+            return
+        _, job = self._pop(job_id)
+        retry = self._call(db.fail_job, job_id, self.owner, message, self.retry_delay)
+        if not retry:
+            self._stats['failed'] += 1
+        self.logger.warning(f"任务 {job['platform']}_{job['user_id']} 失败"
+                            f"{'，稍后重试' if retry else ''}: {message}")
+        self.job_done.emit(job, False, message)
+        self.loop.post(self._claim)
+
+    def _pop(self, job_id: int):
+        """移除运行中的任务，返回 (句柄, 任务)"""
+        return self.active.pop(job_id), self._jobs.pop(job_id)
+
+    def _call(self, func, *args):
+        """访问数据库，异常只记录（共享数据库暂时锁定或不可达时继续运行）"""
+        try:
+            return func(*args)
+        except Exception as e:
+            self.logger.error(f"任务队列访问失败 {func.__name__}: {e}")
+            return None
@@ -0,0 +1,117 @@
+"""
+关键词补匹配 - 规则变化后在已存储的帖子上执行新规则
+
+新增或修改的规则在后台按帖子行 ID 分段扫描 posts.content_normalized，
+所有待补的规则共用一次多模式扫描；每段的匹配记录和进度在同一事务中写入，
+中断后从上次的位置继续。修改过的规则开始补匹配前先删除同名的旧匹配记录。
+"""
+import json
+import time
+from typing import Callable, Dict, List, Optional
+from models.database import db
+from utils.logger import get_logger
+from utils.text import normalize
+from .events import EventLoop, Signal
+from .rules import Rule, RuleSet
+
+# 肯定词不超过该数量时在 SQL 中预先过滤（全文索引或 instr），词太多时逐条扫描更快
+PREFILTER_MAX_TERMS = 32
+
+
+class KeywordBackfill:
+    """
+    一次补匹配
+
+    Args:
+        rules: 需要补匹配的规则（已完成的由调用方排除）
+        chunk_size: 每段扫描的帖子数
+    """
+
+    def __init__(self, loop: EventLoop, rules: List[Rule], chunk_size: int = 2000):
+        self.rules = rules
+        self.chunk_size = chunk_size
+        self.rule_set = RuleSet(rules)
+        # 信号
+        self.progress = Signal(loop)  # {scanned, total, matched, rate}
+        self.finished = Signal(loop)  # {scanned, matched, elapsed, cancelled}
+        self.logger = get_logger('keyword_backfill')
+        self._terms = self._prefilter_terms()
+
+    def _prefilter_terms(self) -> Optional[List[str]]:
+        """SQL 预过滤用的词；有规则不命中任何词也能成立（如只有 NOT）时不能预过滤"""
+        if any(rule.matches_empty for rule in self.rules):
+            return None
+        terms = {normalize(term) for rule in self.rules for term in rule.positive_terms}
+        return sorted(terms) if len(terms) <= PREFILTER_MAX_TERMS else None
+
+    def run(self, cancelled: Callable[[], bool] = lambda: False) -> int:
+        """执行补匹配，返回匹配数"""
+        signatures = {rule.signature: rule for rule in self.rules}
+        db.start_rule_backfills([(sig, rule.name) for sig, rule in signatures.items()])
+        saved = db.get_rule_backfills(list(signatures))
+        last_ids = {sig: saved.get(sig, {}).get('last_id', 0) for sig in signatures}
+        position = min(last_ids.values())
+        max_id = db.get_max_post_id()
+        total = max(max_id - position, 0)
+        start_position = position
+        matched_total = 0
+        started = time.perf_counter()
+        self.logger.info(f"开始补匹配 {len(self.rules)} 条规则，帖子行 {position + 1}-{max_id}")
+
+        while not cancelled():
+            posts, chunk_end = db.get_posts_for_match(position, self.chunk_size, max_id, self._terms)
+            if chunk_end is None:
+                break
+            matches = []
+            counts: Dict[str, int] = dict.fromkeys(signatures, 0)
+            for post in posts:
+                for rule, hits in self.rule_set.match(post['content'], post['platform'],
+                                                      str(post['user_id']),
+                                                      post['content_normalized']):
+                    # 该规则之前已经处理过这一行
+                    if post['id'] <= last_ids[rule.signature]:
+                        continue
+                    counts[rule.signature] += 1
+                    matches.append({
+                        'platform': post['platform'],
+                        'post_id': post['post_id'],
+                        'rule': rule.name,
+                        'keywords': json.dumps(list(dict.fromkeys(hit[2] for hit in hits)),
+                                               ensure_ascii=False),
+                        'spans': json.dumps([(start, end) for start, end, _ in hits]),
+                    })
+            db.save_rule_backfills([(sig, rule.name, chunk_end, counts[sig])
+                                    for sig, rule in signatures.items()], matches)
+            position = chunk_end
+            matched_total += len(matches)
+            elapsed = time.perf_counter() - started
+            scanned = position - start_position
+            self.progress.emit({
+                'scanned': scanned,
+                'total': total,
+                'matched': matched_total,
+                'rate': scanned / elapsed if elapsed else 0.0,
+            })
+
+        elapsed = time.perf_counter() - started
+        scanned = position - start_position
+        is_cancelled = cancelled()
+        if not is_cancelled:
+            db.save_rule_backfills([(sig, rule.name, position, 0)
+                                    for sig, rule in signatures.items()], status='done')
+        self.logger.info(f"补匹配{'已暂停' if is_cancelled else '完成'}: 扫描 {scanned} 条，"
+                         f"匹配 {matched_total} 条，耗时 {elapsed:.1f} 秒 "
+                         f"({scanned / elapsed if elapsed else 0:,.0f} 条/秒)")
+        self.finished.emit({
+            'scanned': scanned,
+            'matched': matched_total,
+            'elapsed': elapsed,
+            'cancelled': is_cancelled,
+        })
+        return matched_total
+
+
+def pending_rules(rules: List[Rule]) -> List[Rule]:
+    """还没有完成补匹配的规则"""
+    saved = db.get_rule_backfills([rule.signature for rule in rules])
+    return [rule for rule in rules if saved.get(rule.signature, {}).get('status') != 'done']
@@ -1,32 +1,76 @@
 """
-爬虫管理器
+爬虫管理器（不依赖 Qt，回调通过 EventLoop 投递）
 """
-from typing import Dict, List
-from PyQt5.QtCore import QThread, pyqtSignal
+import time
+from collections import deque
+from functools import partial
+from typing import Dict, Optional
+from .events import EventLoop, Signal
 from .weibo_crawler import WeiboCrawler
 from .douyin_crawler import DouyinMockCrawler
+from .keyword_backfill import KeywordBackfill, pending_rules
+from .metrics_refresh import MetricsRefresher
+from .rules import rules_from_config
+from .parser import to_datetime
+from .resilience import CrawlerRequestError, get_rate_limiter
+from .worker_pool import (CrawlJob, WorkerPool, JOB_PENDING, JOB_RUNNING, PRIORITY_INTERACTIVE,
+                          PRIORITY_BACKFILL, PRIORITY_METRICS)
 from models.database import db
+from config import config
 from utils.logger import get_logger
+from utils.simhash import simhash
+from utils.text import normalize
 
-class CrawlerThread(QThread):
-    """爬虫线程"""
-    
-    # 信号
-    progress = pyqtSignal(str, str)  # platform, message
-    new_post = pyqtSignal(dict)  # post_data
-    error = pyqtSignal(str, str)  # platform, error_message
-    finished = pyqtSignal(str, int)  # platform, post_count
+# 可以转发给调用方的结果信号
+RESULT_SIGNALS = ('progress', 'new_post', 'error', 'finished')
+
+# 平台对应的爬虫类
+CRAWLER_CLASSES = {
+    'weibo': WeiboCrawler,
+    'douyin': DouyinMockCrawler,  # 使用模拟爬虫
+}
+
+class CrawlTask:
+    """爬虫任务（在线程池的工作线程中执行，通过信号回传结果）"""
     
-    def __init__(self, platform: str, user_id: str, max_posts: int = 50):
-        super().__init__()
+    def __init__(self, loop: EventLoop, platform: str, user_id: str, max_posts: int = 50,
+                 probe: bool = False, priority: str = PRIORITY_INTERACTIVE, store=None):
+        # 信号
+        self.progress = Signal(loop)  # platform, message
+        self.new_post = Signal(loop)  # post_data
+        self.error = Signal(loop)  # platform, error_message
+        self.finished = Signal(loop)  # platform, post_count
+        self.done = Signal(loop)  # task，无论成功失败都会发出
+        self.loop = loop
+        # 用户和帖子的写入目标，分片进程中换成转发给写入进程的 store
+        self.store = store if store is not None else db
         self.platform = platform
         self.user_id = user_id
         self.max_posts = max_posts
+        self.probe = probe  # 先轻量探测，有新帖才完整爬取
         self.logger = get_logger('crawler.thread')
-        self._is_running = True
+        # 排队中被取消时不会执行 run，同样发出 done，让管理器清理、等待者继续
+        self.job = CrawlJob(platform, user_id, target=self.run, max_posts=max_posts,
+                            priority=priority, on_skipped=lambda: self.done.emit(self))
+        self.key = self.job.key
+        # 在循环线程中记录已发出的结果信号，供后加入的请求回放
+        self.history = []
+        self._handles = set()
+        self.succeeded = False
+        self.finished_at: Optional[float] = None
+        for name in RESULT_SIGNALS:
+            getattr(self, name).connect(partial(self._record, name))
+    
+    def _record(self, name: str, *args):
+        """记录结果信号（在循环线程执行）"""
+        self.history.append((name, args))
+        if name == 'finished':
+            self.succeeded = not self.job.is_cancelled()
+            self.finished_at = time.monotonic()
     
     def run(self):
         """运行爬虫"""
+        crawler = None
         try:
             # 创建爬虫实例
             if self.platform == 'weibo':
@@ -36,6 +80,12 @@ class CrawlerThread(QThread):
             else:
                 self.error.emit(self.platform, f"不支持的平台: {self.platform}")
                 return
+            crawler.set_account(self.user_id)
+            
+            if self.probe and self._probe_unchanged(crawler):
+                self.progress.emit(self.platform, "没有新帖子")
+                self.finished.emit(self.platform, 0)
+                return
             
             # 获取用户信息
             self.progress.emit(self.platform, f"正在获取用户信息...")
@@ -46,7 +96,7 @@ class CrawlerThread(QThread):
                 return
             
             # 保存用户信息
-            db.add_user(
+            self.store.add_user(
                 platform=self.platform,
                 user_id=user_info['user_id'],
                 username=user_info['username'],
@@ -64,32 +114,45 @@ class CrawlerThread(QThread):
                 self.finished.emit(self.platform, 0)
                 return
             
-            # 保存帖子
-            new_count = 0
+            # 保存帖子（一批写入，一个事务）
+            if self.job.is_cancelled():
+                posts = []
+            rows = []
             for post in posts:
-                if not self._is_running:
-                    break
-                
-                db.add_post(
-                    platform=self.platform,
-                    post_id=post['post_id'],
-                    user_id=user_info['user_id'],
-                    username=user_info['username'],
-                    content=post.get('content'),
-                    images=post.get('images'),
-                    videos=post.get('videos'),
-                    likes=post.get('likes', 0),
-                    comments=post.get('comments', 0),
-                    shares=post.get('shares', 0),
-                    post_url=post.get('post_url'),
-                    published_at=post.get('published_at')
-                )
-                
+                # 归一化内容和指纹入库时算一次，写入、关键词匹配和重复检测共用
+                post['content_normalized'] = normalize(post.get('content'))
+                post['fingerprint'] = simhash(post['content_normalized'])
+                rows.append({
+                    'platform': self.platform,
+                    'post_id': post['post_id'],
+                    'user_id': user_info['user_id'],
+                    'username': user_info['username'],
+                    'content': post.get('content'),
+                    'images': post.get('images'),
+                    'videos': post.get('videos'),
+                    'likes': post.get('likes', 0),
+                    'comments': post.get('comments', 0),
+                    'shares': post.get('shares', 0),
+                    'post_url': post.get('post_url'),
+                    'published_at': post.get('published_at'),
+                    'content_normalized': post['content_normalized'],
+                    'fingerprint': post['fingerprint'],
+                })
+            previous_list = self.store.upsert_posts(rows)
+            
+            new_count = 0
+            for post, previous in zip(posts, previous_list):
                 # 发送新帖子信号
+                # is_new 为数据库写入结果：首次插入（previous 为 None）为 True，已存在为 False；
+                # 拿不到写入结果的来源不带 is_new，由监控的已见过滤判断
+                # previous 为写入前的互动数据（新帖子为 None），用于互动数据提醒
                 post_data = {
                     'platform': self.platform,
+                    'user_id': user_info['user_id'],
                     'username': user_info['username'],
-                    **post
+                    **post,
+                    'is_new': previous is None,
+                    'previous': previous
                 }
                 self.new_post.emit(post_data)
                 new_count += 1
@@ -97,59 +160,436 @@ class CrawlerThread(QThread):
             self.progress.emit(self.platform, f"完成，获取 {new_count} 条帖子")
             self.finished.emit(self.platform, new_count)
             
-            # 关闭爬虫
-            crawler.close()
-            
         except Exception as e:
             self.logger.error(f"爬虫异常: {e}")
             self.error.emit(self.platform, str(e))
+        finally:
+            # 提前返回（探测无变化、没有帖子等）时同样关闭爬虫
+            if crawler is not None:
+                crawler.close()
+            self.done.emit(self)
+    
+    def _probe_unchanged(self, crawler) -> bool:
+        """轻量探测：最新帖子不比已存储的新时返回 True，无法判断时返回 False"""
+        # 用户名需要先换成 UID，直接走完整爬取
+        if not crawler.supports_probe or not self.user_id.isdigit():
+            return False
+        stored = db.get_latest_post(self.platform, self.user_id)
+        if not stored:
+            return False
+        try:
+            latest = crawler.probe_latest(self.user_id)
+        except Exception as e:
+            self.logger.warning(f"探测失败，改为完整爬取 {self.key}: {e}")
+            return False
+        if latest is None:
+            return True
+        return not _is_newer(latest, stored)
+    
+    def attach(self) -> 'CrawlHandle':
+        """加入一个请求，返回其句柄"""
+        handle = CrawlHandle(self)
+        self._handles.add(handle)
+        return handle
+    
+    def release(self, handle: 'CrawlHandle'):
+        """请求退出，最后一个请求退出时取消任务"""
+        self._handles.discard(handle)
+        if not self._handles and self.isRunning():
+            self.stop()
     
     def stop(self):
         """停止爬虫"""
-        self._is_running = False
+        self.job.cancel()
+    
+    def isRunning(self) -> bool:
+        """排队中或运行中"""
+        return self.job.is_active
+
+
+class BackfillTask(CrawlTask):
+    """
+    历史回填任务
+    
+    按游标逐页爬取账号全部历史，每页的帖子和下一页游标在同一事务中写入，
+    中断（停止、重启、崩溃）后从保存的游标继续，已写入的页不会再请求。
+    以 backfill 低优先级运行，并受平台共享的令牌桶限速。
+    """
+    
+    def __init__(self, loop: EventLoop, platform: str, user_id: str):
+        super().__init__(loop, platform, user_id, max_posts=0, priority=PRIORITY_BACKFILL)
+        self.key = self.job.key = f"backfill_{platform}_{user_id}"
+        self.retry_later = False  # 出错暂停，稍后自动重试
+    
+    def run(self):
+        """运行回填"""
+        crawler = None
+        try:
+            crawler_cls = CRAWLER_CLASSES.get(self.platform)
+            if crawler_cls is None or not crawler_cls.supports_backfill:
+                self.error.emit(self.platform, f"{self.platform} 不支持历史回填")
+                return
+            crawler = crawler_cls()
+            crawler.set_account(self.user_id)
+            
+            user_info = crawler.get_user_info(self.user_id)
+            if not user_info:
+                self.retry_later = True
+                self.error.emit(self.platform, f"获取用户信息失败: {self.user_id}")
+                return
+            db.add_user(
+                platform=self.platform,
+                user_id=user_info['user_id'],
+                username=user_info['username'],
+                avatar=user_info.get('avatar'),
+                description=user_info.get('description'),
+                followers=user_info.get('followers', 0)
+            )
+            uid = user_info['user_id']
+            
+            checkpoint = db.get_checkpoint(self.platform, uid) or {}
+            if checkpoint.get('status') == 'done':
+                self.progress.emit(self.platform, f"历史回填已完成，共 {checkpoint['posts']} 条帖子")
+                self.finished.emit(self.platform, 0)
+                return
+            cursor = checkpoint.get('cursor')
+            pages = checkpoint.get('pages', 0)
+            total = checkpoint.get('posts', 0)
+            if cursor:
+                self.progress.emit(self.platform, f"从第 {pages + 1} 页继续回填")
+            db.save_checkpoint(self.platform, uid, cursor, status='running')
+            
+            limiter = get_rate_limiter(f'backfill.{self.platform}',
+                                       config.get('backfill.rate', 0.2),
+                                       config.get('backfill.burst', 1))
+            new_count = 0
+            while True:
+                if not limiter.acquire(cancelled=self.job.is_cancelled) or self.job.is_cancelled():
+                    db.save_checkpoint(self.platform, uid, status='paused')
+                    self.progress.emit(self.platform, f"历史回填已暂停（第 {pages} 页）")
+                    break
+                
+                try:
+                    posts, next_cursor = crawler.get_posts_page(uid, cursor)
+                except CrawlerRequestError as e:
+                    db.save_checkpoint(self.platform, uid, status='error', error=str(e))
+                    self.retry_later = True
+                    self.error.emit(self.platform, f"历史回填出错，稍后从第 {pages + 1} 页重试: {e}")
+                    return
+                
+                for post in posts:
+                    post['platform'] = self.platform
+                    post['user_id'] = uid
+                    post['username'] = user_info['username']
+                db.save_checkpoint(self.platform, uid, next_cursor,
+                                   status='running' if next_cursor else 'done', posts=posts)
+                pages += 1
+                total += len(posts)
+                new_count += len(posts)
+                self.progress.emit(self.platform, f"回填第 {pages} 页，累计 {total} 条帖子")
+                
+                if not next_cursor:
+                    self.progress.emit(self.platform, f"历史回填完成，共 {total} 条帖子")
+                    break
+                cursor = next_cursor
+            
+            self.finished.emit(self.platform, new_count)
+            
+        except Exception as e:
+            self.logger.error(f"历史回填异常: {e}")
+            self.error.emit(self.platform, str(e))
+        finally:
+            if crawler is not None:
+                crawler.close()
+            self.done.emit(self)
+
+
+def _is_newer(post: Dict, stored: Dict) -> bool:
+    """post 是否比已存储的最新帖子新（数字 ID 按大小比较，否则比较发布时间）"""
+    post_id, stored_id = str(post.get('post_id', '')), str(stored.get('post_id', ''))
+    if post_id == stored_id:
+        return False
+    if post_id.isdigit() and stored_id.isdigit():
+        return int(post_id) > int(stored_id)
+    # 两边都换算成不带时区的本地时间（旧数据库中可能存有带时区的时间）
+    published = to_datetime(post.get('published_at'))
+    stored_at = to_datetime(stored.get('published_at'))
+    if published and stored_at:
+        return published > stored_at
+    return True
+
+
+class CrawlHandle:
+    """
+    爬取请求句柄
+    
+    同一用户的多个请求共享同一个任务：每个请求拿到自己的句柄，句柄先回放任务
+    已经发出的信号，再转发之后的信号，所以后加入的请求也能拿到完整结果。
+    """
+    
+    def __init__(self, task: CrawlTask):
+        self.progress = Signal(task.loop)  # platform, message
+        self.new_post = Signal(task.loop)  # post_data
+        self.error = Signal(task.loop)  # platform, error_message
+        self.finished = Signal(task.loop)  # platform, post_count
+        self.task = task
+        self.key = task.key
+        self.detached = False
+        # 回放完成前到达的信号先缓存，保证顺序
+        self._pending = list(task.history)
+        self._replaying = True
+        for name in RESULT_SIGNALS:
+            getattr(task, name).connect(partial(self._forward, name))
+        # 下一轮事件循环再回放，保证调用方先连接好信号
+        task.loop.post(self._replay)
+    
+    def _forward(self, name: str, *args):
+        """转发任务信号"""
+        if self.detached:
+            return
+        if self._replaying:
+            self._pending.append((name, args))
+        else:
+            getattr(self, name).emit(*args)
+    
+    def _replay(self):
+        """回放加入前的信号"""
+        pending, self._pending = self._pending, []
+        self._replaying = False
+        if self.detached:
+            return
+        for name, args in pending:
+            getattr(self, name).emit(*args)
+    
+    def stop(self):
+        """不再接收结果；没有其他请求在等时取消任务"""
+        self.detached = True
+        self.task.release(self)
+    
+    def isRunning(self) -> bool:
+        """排队中或运行中"""
+        return self.task.isRunning()
 
 
 class CrawlerManager:
     """爬虫管理器"""
     
-    def __init__(self):
-        self.threads: Dict[str, CrawlerThread] = {}
+    # 保留最近完成的任务引用，保证排队中的信号投递完成前对象不被回收
+    FINISHED_HISTORY = 64
+    
+    def __init__(self, loop: EventLoop, store=None):
+        self.loop = loop
+        self.store = store  # 爬取结果的写入目标，None 时直接写数据库
+        # 信号
+        # 互动数据刷新写入 [{platform, post_id, user_id, username, post_url, previous, current}]
+        self.metrics_updated = Signal(loop)
+        self.tasks: Dict[str, CrawlTask] = {}
+        self._finished = deque(maxlen=self.FINISHED_HISTORY)
         self.logger = get_logger('crawler.manager')
+        self.pool = WorkerPool(
+            size=config.get('worker_pool.size', 4),
+            platform_limits=config.get('worker_pool.platform_limits', {}),
+            weights=config.get('worker_pool.weights', {}),
+            reserved=config.get('worker_pool.reserved', 1),
+        )
+        self._metrics_job = None
+        # 最近完成的任务结果，短时间内的重复请求直接回放
+        self.result_ttl = config.get('worker_pool.result_ttl', 15)
+        self._results: Dict[str, CrawlTask] = {}
+        self._keyword_job = None
+        if config.get('backfill.auto_resume', True):
+            loop.post(self.resume_backfills)
+        if config.get('keyword_backfill.enabled', True):
+            loop.post(self.start_keyword_backfill)
     
-    def start_crawler(self, platform: str, user_id: str, max_posts: int = 50) -> CrawlerThread:
-        """启动爬虫"""
-        # 如果已有该平台的爬虫在运行，先停止
+    def start_crawler(self, platform: str, user_id: str, max_posts: int = 50,
+                      probe: bool = False, priority: str = PRIORITY_INTERACTIVE) -> CrawlHandle:
+        """
+        提交爬虫请求，返回句柄（信号与任务相同）
+        
+        同一用户同时只会有一个任务在爬取：
+        - 已有任务在排队或运行时直接加入该任务，交互请求会把排队中的任务提升为
+          交互优先级并改为完整爬取；
+        - 刚完成的任务结果在 result_ttl 秒内可以满足本次请求时直接回放；
+        - 已取消但仍在运行的任务结束后，新任务才开始执行。
+        
+        Args:
+            probe: 先只请求第一页探测，没有新帖时不做完整爬取（监控检查用）
+            priority: 优先级类别，手动发起的为 interactive，监控为 monitor
+        """
         key = f"{platform}_{user_id}"
-        if key in self.threads and self.threads[key].isRunning():
-            self.threads[key].stop()
-            self.threads[key].wait()
+        existing = self.tasks.get(key)
+        if existing and existing.isRunning() and not existing.job.is_cancelled():
+            if priority == PRIORITY_INTERACTIVE and existing.job.status == JOB_PENDING:
+                existing.probe = existing.probe and probe
+                existing.max_posts = max(existing.max_posts, max_posts)
+                self.pool.promote(existing.job, priority)
+            self.logger.debug(f"{key} 已在爬取，合并请求")
+            return existing.attach()
         
-        # 创建新线程
-        thread = CrawlerThread(platform, user_id, max_posts)
-        self.threads[key] = thread
-        thread.start()
+        cached = self._cached_result(key, max_posts, probe)
+        if cached:
+            self.logger.debug(f"{key} 使用 {self.result_ttl} 秒内的爬取结果")
+            return cached.attach()
         
-        return thread
+        return self._launch(CrawlTask(self.loop, platform, user_id, max_posts, probe=probe,
+                                      priority=priority, store=self.store), existing)
+    
+    def start_backfill(self, platform: str, user_id: str, restart: bool = False) -> CrawlHandle:
+        """
+        开始或继续历史回填
+        
+        Args:
+            restart: 丢弃已保存的进度，从第一页重新回填
+        """
+        # 进度按用户 ID 保存，传入已存储用户的用户名时换成用户 ID
+        user_id = db.resolve_user_id(platform, user_id) or user_id
+        key = f"backfill_{platform}_{user_id}"
+        existing = self.tasks.get(key)
+        if existing and existing.isRunning() and not existing.job.is_cancelled():
+            return existing.attach()
+        if restart:
+            db.delete_checkpoint(platform, user_id)
+        return self._launch(BackfillTask(self.loop, platform, user_id), existing)
+    
+    def stop_backfill(self, platform: str, user_id: str):
+        """暂停历史回填（进度已保存，可随时继续）"""
+        # 按用户名启动时还没存储该用户，任务以用户名为键，两个都停止
+        self._stop(f"backfill_{platform}_{user_id}")
+        uid = db.resolve_user_id(platform, user_id)
+        if uid and uid != user_id:
+            user_id = uid
+            self._stop(f"backfill_{platform}_{user_id}")
+        # 排队中被取消的任务不会自己更新状态，避免下次启动时又自动继续
+        checkpoint = db.get_checkpoint(platform, user_id)
+        if checkpoint and checkpoint['status'] != 'done':
+            db.save_checkpoint(platform, user_id, status='paused')
+    
+    def resume_backfills(self) -> int:
+        """继续上次未完成（运行中退出或出错）的回填"""
+        resumed = 0
+        for checkpoint in db.get_checkpoints():
+            if checkpoint['status'] in ('running', 'error'):
+                self.start_backfill(checkpoint['platform'], checkpoint['user_id'])
+                resumed += 1
+        if resumed:
+            self.logger.info(f"继续 {resumed} 个未完成的历史回填")
+        return resumed
+    
+    def _retry_backfill(self, platform: str, user_id: str):
+        """出错的回填到时重试（期间被手动暂停的不再继续）"""
+        checkpoint = db.get_checkpoint(platform, user_id)
+        if checkpoint is None or checkpoint['status'] == 'error':
+            self.start_backfill(platform, user_id)
+    
+    def _launch(self, task: CrawlTask, existing: Optional[CrawlTask]) -> CrawlHandle:
+        """登记并提交新任务"""
+        task.done.connect(self._on_task_done)
+        self.tasks[task.key] = task
+        handle = task.attach()
+        if existing and existing.job.status == JOB_RUNNING:
+            # 被取消的旧任务还没退出，等它结束再开始，避免同一账号并发爬取
+            existing.done.connect(lambda _: self._submit(task))
+        else:
+            # 下一轮事件循环再入队，保证调用方先连接好信号
+            self.loop.post(self._submit, task)
+        return handle
     
     def stop_crawler(self, platform: str, user_id: str):
         """停止爬虫"""
-        key = f"{platform}_{user_id}"
-        if key in self.threads:
-            self.threads[key].stop()
-            self.threads[key].wait()
-            del self.threads[key]
+        self._stop(f"{platform}_{user_id}")
     
-    def stop_all(self):
-        """停止所有爬虫"""
-        for thread in self.threads.values():
-            thread.stop()
+    def _stop(self, key: str):
+        """停止任务"""
+        self._results.pop(key, None)
+        task = self.tasks.get(key)
+        if task:
+            task.stop()
+            self.pool.cancel_pending(key)
+            # 排队中的任务取消后发出 done，记录由 _on_task_done 完成；运行中的任务结束后再清理
+            if task.job.status != JOB_RUNNING:
+                del self.tasks[key]
+    
+    def refresh_metrics(self) -> bool:
+        """提交一轮互动数据刷新，上一轮未结束时跳过"""
+        if self._metrics_job is not None and self._metrics_job.is_active:
+            return False
+        refresher = MetricsRefresher.from_config(CRAWLER_CLASSES, self.metrics_updated.emit)
+        job = CrawlJob('metrics', 'refresh', target=lambda: refresher.run_once(job.is_cancelled),
+                       priority=PRIORITY_METRICS)
+        self._metrics_job = job
+        self.pool.submit(job)
+        return True
+    
+    def start_keyword_backfill(self) -> Optional[KeywordBackfill]:
+        """
+        对当前配置中还没有补匹配过的规则，在已存储的帖子上补匹配
         
-        for thread in self.threads.values():
-            thread.wait()
+        规则变化时调用。上一次补匹配未结束时先停止（进度已保存，新的一次会接着处理）。
         
-        self.threads.clear()
+        Returns:
+            补匹配对象（连接其 progress/finished 信号），没有需要补匹配的规则时为 None
+        """
+        if self._keyword_job is not None and self._keyword_job.is_active:
+            self._keyword_job.cancel()
+        rules = pending_rules(rules_from_config(self.logger))
+        if not rules:
+            return None
+        backfill = KeywordBackfill(self.loop, rules, config.get('keyword_backfill.chunk', 2000))
+        job = CrawlJob('keywords', 'backfill', target=lambda: backfill.run(job.is_cancelled),
+                       priority=PRIORITY_BACKFILL)
+        self._keyword_job = job
+        self.pool.submit(job)
+        return backfill
+    
+    def stop_all(self, timeout: float = 5.0):
+        """停止所有爬虫"""
+        for task in self.tasks.values():
+            task.stop()
+        if self._metrics_job is not None:
+            self._metrics_job.cancel()
+        if self._keyword_job is not None:
+            self._keyword_job.cancel()
+        self.pool.shutdown(timeout)
+        self.tasks.clear()
+        self._results.clear()
     
     def is_running(self, platform: str, user_id: str) -> bool:
-        """检查爬虫是否在运行"""
+        """检查爬虫是否在排队或运行"""
         key = f"{platform}_{user_id}"
-        return key in self.threads and self.threads[key].isRunning()
+        return key in self.tasks and self.tasks[key].isRunning()
+    
+    def stats(self) -> Dict:
+        """线程池统计：队列长度、活跃线程、等待时间"""
+        return self.pool.stats()
+    
+    def _submit(self, task: CrawlTask):
+        """提交到线程池（已取消的任务不再提交）"""
+        if task.job.is_cancelled():
+            self._on_task_done(task)
+            return
+        self.pool.submit(task.job)
+    
+    def _on_task_done(self, task: CrawlTask):
+        """任务结束，清理引用并缓存结果"""
+        if self.tasks.get(task.key) is task:
+            del self.tasks[task.key]
+        self._finished.append(task)
+        if isinstance(task, BackfillTask):
+            if task.retry_later and not task.job.is_cancelled():
+                delay = config.get('backfill.retry_delay', 300)
+                self.loop.call_later(delay, self._retry_backfill, task.platform, task.user_id)
+            return
+        if task.succeeded and self.result_ttl > 0:
+            self._results[task.key] = task
+    
+    def _cached_result(self, key: str, max_posts: int, probe: bool) -> Optional[CrawlTask]:
+        """未过期且能满足本次请求的已完成任务"""
+        now = time.monotonic()
+        for cached_key in [k for k, t in self._results.items()
+                           if now - t.finished_at > self.result_ttl]:
+            del self._results[cached_key]
+        task = self._results.get(key)
+        if task is None or task.max_posts < max_posts or (task.probe and not probe):
+            return None
+        return task
@@ -0,0 +1,120 @@
+"""
+关键词匹配器 - 多模式自动机（Aho-Corasick）
+
+关键词集合变化时编译一次，之后每条帖子只需扫描一遍正文，
+耗时与关键词数量基本无关。关键词和正文都按 utils.text.normalize 归一化后匹配
+（大小写、全角/半角、繁简、标点和空白等差异都会忽略）。
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils.text import normalize, normalize_with_offsets, original_span
+
+# 匹配结果：(起始位置, 结束位置, 关键词)
+Hit = Tuple[int, int, str]
+
+
+class KeywordMatcher:
+    """
+    编译后的关键词匹配器
+
+    状态转移预先展开（不含根节点的转移单独查），扫描时每个字符只做一两次字典查找，
+    不需要沿失败指针回溯。
+    """
+
+    def __init__(self, keywords: Sequence[str]):
+        self.keywords: Tuple[str, ...] = tuple(keywords)
+        self._lengths: List[int] = []
+        # 每个节点的转移表，_outputs[node] 为在该节点结束的关键词下标（含后缀链上的）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._outputs: List[Optional[List[int]]] = [None]
+        # 有效（非空、去重）关键词数，全部匹配模式使用
+        self._required = len({k for k in self.keywords if normalize(k)})
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def _build(self):
+        """构建字典树、失败指针和展开的转移表"""
+        goto, outputs = self._goto, self._outputs
+        for index, keyword in enumerate(self.keywords):
+            pattern = normalize(keyword)
+            self._lengths.append(len(pattern))
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                nxt = goto[node].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][char] = nxt
+                    goto.append({})
+                    outputs.append(None)
+                node = nxt
+            outputs[node] = (outputs[node] or []) + [index]
+
+        # 按层遍历计算失败指针，并把失败节点的转移（根节点除外）合并进来
+        fail = [0] * len(goto)
+        order = list(goto[0].values())
+        children = [dict(edges) for edges in goto]
+        head = 0
+        while head < len(order):
+            node = order[head]
+            head += 1
+            for char, child in children[node].items():
+                target = fail[node]
+                while target and char not in children[target]:
+                    target = fail[target]
+                fail[child] = children[target].get(char, 0) if node else 0
+                if outputs[fail[child]]:
+                    outputs[child] = (outputs[child] or []) + outputs[fail[child]]
+                order.append(child)
+        for node in order:
+            inherited = goto[fail[node]] if fail[node] else None
+            if inherited:
+                for char, target in inherited.items():
+                    goto[node].setdefault(char, target)
+
+    def scan(self, normalized: str) -> List[Hit]:
+        """
+        扫描已归一化的文本（如 posts.content_normalized），返回全部命中
+
+        位置对应归一化文本，按结束位置排序，重叠的命中都会返回。
+        """
+        if not normalized or not self._required:
+            return []
+        goto, outputs, lengths, keywords = self._goto, self._outputs, self._lengths, self.keywords
+        root = goto[0]
+        hits = []
+        node = 0
+        for end, char in enumerate(normalized, 1):
+            node = goto[node].get(char) or root.get(char, 0)
+            found = outputs[node]
+            if found:
+                for index in found:
+                    hits.append((end - lengths[index], end, keywords[index]))
+        return hits
+
+    def find_all(self, text: str) -> List[Hit]:
+        """扫描原文，返回全部命中，位置对应原文，text[start:end] 即命中的原文"""
+        if not text or not self._required:
+            return []
+        normalized, offsets = normalize_with_offsets(text)
+        return [original_span(offsets, start, end) + (keyword,)
+                for start, end, keyword in self.scan(normalized)]
+
+    def match(self, text: str, mode: str = 'any') -> List[Hit]:
+        """
+        按匹配模式返回命中
+
+        Args:
+            mode: any 命中任意关键词即可；all 要求所有关键词都命中，否则返回空列表
+        """
+        hits = self.find_all(text)
+        if mode == 'all' and hits and len({hit[2] for hit in hits}) < self._required:
+            return []
+        return hits
+
+    def matched_keywords(self, text: str, mode: str = 'any') -> List[str]:
+        """命中的关键词（去重，按关键词列表顺序）"""
+        found = {hit[2] for hit in self.match(text, mode)}
+        return [keyword for keyword in dict.fromkeys(self.keywords) if keyword in found]
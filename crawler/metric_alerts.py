@@ -0,0 +1,243 @@
+"""
+互动数据提醒 - 点赞/评论/转发超过阈值或短时间内增长过快时提醒
+
+规则按指标建索引，每次互动数据写入只检查变化了的指标对应的规则，
+不扫描已存储的帖子。写入前的数值由写库时一并取得（upsert_posts 写入时读出的
+原有数据、分片进程记下的数据、互动刷新挑选帖子时读出的数据），不需要额外查询。
+
+配置（monitor.metric_rules）:
+    {"name": "评论破千", "metric": "comments", "above": 1000}
+    {"name": "点赞暴涨", "metric": "likes", "increase": 5000, "window": 3600}
+
+above 为阈值规则，数值从低于阈值变为不低于阈值时提醒一次；increase 为增长规则，
+window 秒内增长不少于 increase 时提醒，同一帖子在一个窗口内只提醒一次。
+platforms、users、groups 限定生效范围，写法与组合规则相同。
+"""
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import config
+from .parser import to_datetime
+from .rules import scope_users
+
+METRICS = ('likes', 'comments', 'shares')
+METRIC_NAMES = {'likes': '点赞', 'comments': '评论', 'shares': '转发'}
+
+
+class MetricRule:
+    """
+    一条互动数据规则（above 和 increase 二选一）
+
+    Args:
+        metric: likes / comments / shares
+        above: 阈值
+        increase: window 秒内的增长量
+    """
+
+    def __init__(self, name: str, metric: str, above: Optional[int] = None,
+                 increase: Optional[int] = None, window: float = 3600,
+                 platforms: Sequence[str] = (), users: Sequence[str] = ()):
+        if metric not in METRICS:
+            raise ValueError(f"不支持的指标: {metric}")
+        if (above is None) == (increase is None):
+            raise ValueError("above 和 increase 需要设置且只能设置一个")
+        self.name = name
+        self.metric = metric
+        self.above = above
+        self.increase = increase
+        self.window = window
+        self.platforms = frozenset(platforms)
+        self.users = frozenset(str(user) for user in users)
+
+    @classmethod
+    def from_config(cls, data: Dict, groups: Optional[Dict[str, List]] = None) -> 'MetricRule':
+        """由配置项 {name, metric, above | increase, window, platforms, users, groups} 创建"""
+        metric = data['metric']
+        if 'above' in data:
+            default_name = f"{METRIC_NAMES.get(metric, metric)}≥{data['above']}"
+        else:
+            default_name = f"{METRIC_NAMES.get(metric, metric)}增长≥{data.get('increase')}"
+        return cls(data.get('name') or default_name, metric,
+                   above=data.get('above'), increase=data.get('increase'),
+                   window=data.get('window', 3600),
+                   platforms=data.get('platforms') or (), users=scope_users(data, groups))
+
+    def applies_to(self, platform: str, user_id: str) -> bool:
+        """是否对该平台、用户生效"""
+        if self.platforms and platform not in self.platforms:
+            return False
+        if self.users and user_id not in self.users and f"{platform}:{user_id}" not in self.users:
+            return False
+        return True
+
+
+def metric_rules_from_config(logger=None) -> List[MetricRule]:
+    """按当前配置创建互动数据规则，无效的规则记录日志后跳过"""
+    rules = []
+    groups = config.get('monitor.groups', {})
+    for item in config.get('monitor.metric_rules', []):
+        if not item.get('enabled', True):
+            continue
+        try:
+            rules.append(MetricRule.from_config(item, groups))
+        except (ValueError, KeyError, TypeError) as e:
+            if logger:
+                logger.error(f"互动数据规则无效，已跳过 {item}: {e}")
+    return rules
+
+
+def _timestamp(value) -> Optional[float]:
+    """数据库中的时间转为 Unix 时间戳"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = to_datetime(value)
+    return parsed.timestamp() if parsed else None
+
+
+class MetricAlerts:
+    """
+    互动数据规则的增量检查（只在事件循环线程中调用）
+
+    增长规则需要窗口内的历史数值，只为有增长规则的指标在内存中保留最近的
+    采样（有上限，按最近更新淘汰）；第一次见到的帖子用写入前的数值和时间作起点。
+
+    Args:
+        max_posts: 保留采样的帖子指标数上限
+    """
+
+    def __init__(self, rules: List[MetricRule], max_posts: int = 20000):
+        self.rules = rules
+        self.max_posts = max_posts
+        # 指标 -> 该指标的规则
+        self._by_metric: Dict[str, List[MetricRule]] = {}
+        for rule in rules:
+            self._by_metric.setdefault(rule.metric, []).append(rule)
+        # 每个指标增长规则的最长窗口
+        self._windows = {metric: max((rule.window for rule in metric_rules
+                                      if rule.increase is not None), default=0)
+                         for metric, metric_rules in self._by_metric.items()}
+        self._history: 'OrderedDict[Tuple, deque]' = OrderedDict()
+        # (规则, 平台, 帖子) -> 上次提醒时间，增长规则窗口内不重复提醒
+        self._fired: 'OrderedDict[Tuple, float]' = OrderedDict()
+
+    def __bool__(self) -> bool:
+        return bool(self.rules)
+
+    def check(self, platform: str, post_id: str, user_id: str, previous: Optional[Dict],
+              current: Dict, now: Optional[float] = None) -> List[Dict]:
+        """
+        检查一次互动数据更新
+
+        Args:
+            previous: 写入前的 {likes, comments, shares, updated_at}，新帖子为 None
+            current: 写入的数值，为 None 的指标表示未更新
+
+        Returns:
+            触发的提醒 [{rule, metric, previous, value}]
+        """
+        now = time.time() if now is None else now
+        alerts = []
+        for metric, rules in self._by_metric.items():
+            value = current.get(metric)
+            if value is None:
+                continue
+            before = (previous or {}).get(metric) or 0
+            if previous is not None and value == before:
+                continue
+            samples = None
+            if self._windows[metric]:
+                samples = self._samples(platform, post_id, metric, previous, before, now)
+            for rule in rules:
+                if not rule.applies_to(platform, user_id):
+                    continue
+                if rule.above is not None:
+                    if before < rule.above <= value:
+                        alerts.append(self._alert(rule, before, value))
+                else:
+                    # 窗口内没有更早的数值时无法判断增长速度，不提醒
+                    baseline = min((v for t, v in samples if now - t <= rule.window), default=value)
+                    if value - baseline >= rule.increase and self._may_fire(rule, platform,
+                                                                            post_id, now):
+                        alerts.append(self._alert(rule, baseline, value))
+            if samples is not None:
+                samples.append((now, value))
+        return alerts
+
+    @staticmethod
+    def _alert(rule: MetricRule, previous: int, value: int) -> Dict:
+        return {'rule': rule.name, 'metric': rule.metric, 'previous': previous, 'value': value}
+
+    def _samples(self, platform: str, post_id: str, metric: str, previous: Optional[Dict],
+                 before: int, now: float) -> deque:
+        """帖子该指标窗口内的采样 [(时间, 数值)]"""
+        key = (platform, post_id, metric)
+        samples = self._history.get(key)
+        if samples is None:
+            samples = self._history[key] = deque()
+            since = _timestamp(previous.get('updated_at')) if previous else None
+            if since is not None:
+                samples.append((since, before))
+            if len(self._history) > self.max_posts:
+                self._history.popitem(last=False)
+        else:
+            self._history.move_to_end(key)
+        window = self._windows[metric]
+        while samples and now - samples[0][0] > window:
+            samples.popleft()
+        return samples
+
+    def _may_fire(self, rule: MetricRule, platform: str, post_id: str, now: float) -> bool:
+        """增长规则同一帖子一个窗口内只提醒一次"""
+        key = (rule.name, platform, post_id)
+        fired_at = self._fired.get(key)
+        if fired_at is not None and now - fired_at < rule.window:
+            return False
+        self._fired[key] = now
+        self._fired.move_to_end(key)
+        if len(self._fired) > self.max_posts:
+            self._fired.popitem(last=False)
+        return True
+
+
+class MetricWatcher:
+    """
+    按当前配置检查互动数据提醒（只在事件循环线程中调用）
+
+    规则配置（monitor.metric_rules、monitor.groups）变化时重新创建 MetricAlerts，
+    监控服务和分片监控的主进程共用。
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self._alerts: Optional[MetricAlerts] = None
+        self._source = None
+
+    def current(self) -> MetricAlerts:
+        """当前配置的互动数据规则"""
+        source = (config.get('monitor.metric_rules', []), config.get('monitor.groups', {}))
+        if self._alerts is None or source != self._source:
+            self._alerts = MetricAlerts(metric_rules_from_config(self.logger),
+                                        config.get('monitor.metric_history', 20000))
+            self._source = ([dict(item) for item in source[0]],
+                            {name: list(users) for name, users in source[1].items()})
+        return self._alerts
+
+    def check(self, post_data: Dict, previous: Optional[Dict]) -> List[Dict]:
+        """
+        按写入前后的互动数据检查（只检查变化了的指标对应的规则）
+
+        Returns:
+            [{rule, metric, previous, value, post}]
+        """
+        alerts = self.current()
+        if not alerts:
+            return []
+        current = {metric: post_data.get(metric) for metric in METRICS}
+        results = alerts.check(post_data.get('platform', ''), post_data.get('post_id', ''),
+                               str(post_data.get('user_id', '')), previous, current)
+        return [dict(alert, post=post_data) for alert in results]
+
+    def check_updates(self, updates: List[Dict]) -> List[Dict]:
+        """检查互动数据刷新的写入结果 [{platform, post_id, ..., previous, current}]"""
+        return [alert for update in updates
+                for alert in self.check(dict(update, **update['current']), update['previous'])]
@@ -0,0 +1,158 @@
+"""
+互动数据刷新 - 按帖子年龄衰减的频率单独刷新点赞/评论/转发
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from models.database import db
+from config import config
+from utils.logger import get_logger
+from .parser import to_datetime
+from .resilience import CircuitOpenError
+
+# (帖子年龄上限秒数, 刷新间隔秒数)：越新的帖子刷新越频繁，超过最后一档不再刷新
+DEFAULT_SCHEDULE: List[Tuple[float, float]] = [
+    (3600, 300),              # 1小时内：每5分钟
+    (6 * 3600, 900),          # 6小时内：每15分钟
+    (24 * 3600, 3600),        # 1天内：每小时
+    (3 * 86400, 6 * 3600),    # 3天内：每6小时
+    (7 * 86400, 86400),       # 7天内：每天
+]
+
+
+def refresh_interval(age: float, schedule: Sequence[Tuple[float, float]] = DEFAULT_SCHEDULE,
+                     hot: bool = False) -> Optional[float]:
+    """
+    按帖子年龄计算刷新间隔
+
+    Args:
+        age: 帖子年龄(秒)
+        hot: 热门帖子间隔减半
+
+    Returns:
+        刷新间隔(秒)，帖子太旧不再刷新时返回 None
+    """
+    for max_age, interval in schedule:
+        if age < max_age:
+            return interval / 2 if hot else interval
+    return None
+
+
+class MetricsRefresher:
+    """
+    互动数据刷新
+
+    每轮从数据库挑出各平台最该刷新的帖子（超期比例最大的优先），
+    用单帖接口逐条获取互动数据，最后一次性批量写回，只更新互动字段。
+    写回后把每条帖子写入前后的数值交给 on_updated（写入前的数值即挑选帖子时读出的）。
+    """
+
+    def __init__(self, crawler_factories: Dict[str, Callable], batch_size: int = 50,
+                 hot_threshold: int = 1000,
+                 schedule: Sequence[Tuple[float, float]] = DEFAULT_SCHEDULE,
+                 on_updated: Optional[Callable[[List[Dict]], None]] = None):
+        # 只保留支持单帖刷新的平台
+        self.crawler_factories = {platform: factory
+                                  for platform, factory in crawler_factories.items()
+                                  if getattr(factory, 'supports_metrics', False)}
+        self.batch_size = batch_size
+        self.hot_threshold = hot_threshold
+        self.schedule = list(schedule)
+        self.on_updated = on_updated
+        self.logger = get_logger('crawler.metrics')
+
+    @classmethod
+    def from_config(cls, crawler_factories: Dict[str, Callable],
+                    on_updated: Optional[Callable[[List[Dict]], None]] = None) -> 'MetricsRefresher':
+        """从配置创建"""
+        return cls(crawler_factories,
+                   batch_size=config.get('metrics.batch', 50),
+                   hot_threshold=config.get('metrics.hot_threshold', 1000),
+                   on_updated=on_updated)
+
+    def due_posts(self, platform: str, now: Optional[datetime] = None) -> List[Dict]:
+        """到期需要刷新的帖子，最多 batch_size 条"""
+        now = now or datetime.now()
+        since = now - timedelta(seconds=self.schedule[-1][0])
+        due = []
+        for post in db.get_metrics_candidates(platform, since):
+            published = to_datetime(post['published_at'])
+            refreshed = to_datetime(post['updated_at'])
+            if published is None or refreshed is None:
+                continue
+            engagement = (post['likes'] or 0) + (post['comments'] or 0) + (post['shares'] or 0)
+            interval = refresh_interval((now - published).total_seconds(), self.schedule,
+                                        hot=engagement >= self.hot_threshold)
+            if interval is None:
+                continue
+            overdue = (now - refreshed).total_seconds() / interval
+            if overdue >= 1:
+                due.append((overdue, post))
+        due.sort(key=lambda item: item[0], reverse=True)
+        return [post for _, post in due[:self.batch_size]]
+
+    def refresh_platform(self, platform: str, cancelled: Callable[[], bool] = lambda: False) -> int:
+        """刷新一个平台到期的帖子，返回更新条数"""
+        posts = self.due_posts(platform)
+        if not posts:
+            return 0
+
+        crawler = self.crawler_factories[platform]()
+        metrics = []
+        refreshed = []
+        try:
+            for post in posts:
+                if cancelled():
+                    break
+                try:
+                    result = crawler.get_post_metrics(post['post_id'])
+                except CircuitOpenError:
+                    # 平台熔断中，剩下的留到下一轮
+                    break
+                except Exception as e:
+                    # 单条失败（请求、解析等）只跳过这条，并记下刷新时间，按间隔推迟后再试，
+                    # 不让它中断整批或一直排在最前面
+                    self.logger.warning(f"刷新互动数据失败 {platform}/{post['post_id']}: {e}")
+                    metrics.append((post['post_id'], None, None, None))
+                    continue
+                if result is None:
+                    metrics.append((post['post_id'], None, None, None))
+                else:
+                    metrics.append((post['post_id'], result.get('likes'),
+                                    result.get('comments'), result.get('shares')))
+                    refreshed.append(post)
+                crawler.sleep(0.5)
+        finally:
+            crawler.close()
+            # 批量写回，中途退出也保留已刷新的部分
+            written = db.update_post_metrics(platform, metrics)
+        if self.on_updated and refreshed:
+            values = {post_id: (likes, comments, shares)
+                      for post_id, likes, comments, shares in metrics}
+            self.on_updated([{
+                'platform': platform,
+                'post_id': post['post_id'],
+                'user_id': post.get('user_id'),
+                'username': post.get('username'),
+                'post_url': post.get('post_url'),
+                'previous': {key: post[key]
+                             for key in ('likes', 'comments', 'shares', 'updated_at')},
+                'current': dict(zip(('likes', 'comments', 'shares'), values[post['post_id']])),
+            } for post in refreshed])
+        return written
+
+    def run_once(self, cancelled: Callable[[], bool] = lambda: False) -> Dict[str, int]:
+        """执行一轮刷新，返回各平台更新条数"""
+        started = time.monotonic()
+        results = {}
+        for platform in self.crawler_factories:
+            if cancelled():
+                break
+            try:
+                results[platform] = self.refresh_platform(platform, cancelled)
+            except Exception as e:
+                self.logger.error(f"互动数据刷新异常 {platform}: {e}")
+        total = sum(results.values())
+        if total:
+            self.logger.info(f"互动数据刷新 {total} 条，耗时 {time.monotonic() - started:.1f} 秒")
+        return results
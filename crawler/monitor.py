@@ -1,29 +1,64 @@
 """
-监控模块 - 轮询爬取和关键词过滤
+监控模块 - 轮询爬取和关键词过滤（不依赖 Qt，定时和回调都走 crawler_manager 的 EventLoop）
 """
-from typing import List, Dict, Set
-from PyQt5.QtCore import QTimer, QObject, pyqtSignal
+import json
+from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from models.database import db
+from .resilience import get_breaker, STATE_HALF_OPEN, STATE_OPEN
+from .events import Signal, Timer
+from .metric_alerts import MetricWatcher
+from .rules import RuleSet, rules_from_config
+from .session_pool import session_pool
+from .scheduler import PollScheduler
+from .seen import SeenFilter
+from .worker_pool import PRIORITY_MONITOR
 from config import config
 from utils.logger import get_logger
+from utils.simhash import SimHashIndex
 
-class MonitorService(QObject):
+class MonitorService:
     """监控服务"""
     
-    # 信号
-    keyword_matched = pyqtSignal(dict)  # 关键词匹配信号 {post, keywords}
-    monitor_status = pyqtSignal(str)  # 监控状态信号
+    # 调度定时器最长等待时间(秒)，到时重新同步用户配置
+    RESYNC_SECONDS = 30
     
-    def __init__(self, crawler_manager):
-        super().__init__()
+    def __init__(self, crawler_manager, user_filter=None):
         self.crawler_manager = crawler_manager
+        # 可选，user_filter(platform, user_id) 为假的用户不由本实例监控（多进程分片用）
+        self.user_filter = user_filter
+        loop = crawler_manager.loop
+        # 信号
+        self.keyword_matched = Signal(loop)  # 关键词匹配信号 {post, keywords, spans, rules}
+        self.monitor_status = Signal(loop)  # 监控状态信号
+        self.matches_saved = Signal(loop)  # 匹配记录已写入（本批条数）
+        self.metric_alert = Signal(loop)  # 互动数据提醒 {post, rule, metric, previous, value}
         self.logger = get_logger('monitor')
-        self.timer = QTimer()
-        self.timer.timeout.connect(self._check_updates)
+        # 调度定时器：每次只定到下一个到期用户
+        self.timer = Timer(loop, self._check_updates, single_shot=True)
+        self.scheduler = PollScheduler()
+        self._new_post_times: Dict[tuple, List[datetime]] = {}  # 本次检查发现的新帖发布时间
+        # 轮询前预热连接
+        self.prewarm_timer = Timer(loop, self._prewarm_connections, single_shot=True)
+        # 互动数据刷新定时器
+        self.metrics_timer = Timer(loop, self._refresh_metrics)
         self.is_running = False
         self.last_check_time = {}  # 记录每个用户的最后检查时间
-        self.seen_posts: Set[str] = set()  # 已经看过的帖子ID
+        # 最近见过的帖子（有界），是否新帖以数据库写入结果为准
+        self.seen_posts = SeenFilter(config.get('monitor.seen_max', 100000),
+                                     config.get('monitor.seen_ttl', 7 * 86400))
+        # 最近通知过的帖子指纹，近似重复的匹配合并
+        self._recent_alerts = SimHashIndex(config.get('monitor.dedup_max', 10000),
+                                           config.get('monitor.dedup_window', 86400))
+        # 待写入的匹配记录，攒够一批或到时间后一次写入
+        self._pending_matches: List[Dict] = []
+        self.match_flush_timer = Timer(loop, self._flush_matches, single_shot=True)
+        # 按当前关键词和组合规则编译的规则集，及编译时的配置
+        self._rule_set: Optional[RuleSet] = None
+        self._rule_source = None
+        # 互动数据规则（按指标索引，配置变化时重新创建）
+        self._metric_watcher = MetricWatcher(self.logger)
+        crawler_manager.metrics_updated.connect(self._on_metrics_updated)
         
     def start(self):
         """启动监控"""
@@ -31,51 +66,105 @@ class MonitorService(QObject):
             self.logger.warning("监控已在运行中")
             return
         
-        interval = config.get('monitor.interval', 60) * 1000  # 转换为毫秒
-        self.timer.start(interval)
+        self._configure_scheduler()
         self.is_running = True
-        self.logger.info(f"监控已启动，间隔: {interval/1000}秒")
+        self.logger.info(f"监控已启动，最短间隔: {self.scheduler.min_interval}秒")
         self.monitor_status.emit("监控运行中...")
         
-        # 初始化已见帖子集合
-        self._load_existing_posts()
+        self._sync_users()
+        self._arm_timer()
+        self.metrics_timer.start(config.get('metrics.interval', 60))
     
     def stop(self):
         """停止监控"""
+        self._flush_matches()
         if not self.is_running:
             return
         
         self.timer.stop()
+        self.prewarm_timer.stop()
+        self.metrics_timer.stop()
         self.is_running = False
         self.logger.info("监控已停止")
         self.monitor_status.emit("监控已停止")
     
-    def _load_existing_posts(self):
-        """加载现有帖子，避免重复通知"""
-        posts = db.get_posts(limit=1000)
-        for post in posts:
-            post_key = f"{post['platform']}_{post['post_id']}"
-            self.seen_posts.add(post_key)
-        self.logger.info(f"已加载 {len(self.seen_posts)} 条历史帖子")
+    def _configure_scheduler(self):
+        """从配置更新调度参数"""
+        self.scheduler.min_interval = config.get('monitor.interval', 60)
+        self.scheduler.max_interval = max(self.scheduler.min_interval,
+                                          config.get('monitor.max_interval', 3600))
+        self.scheduler.jitter = config.get('monitor.jitter', 0.1)
     
-    def _check_updates(self):
-        """检查更新"""
-        if not config.get('monitor.enabled', False):
-            return
-        
-        # 获取要监控的用户
-        users = self._get_monitor_users()
-        if not users:
-            self.logger.debug("没有配置监控用户")
+    def _sync_users(self):
+        """同步监控用户到调度器，新用户按历史发帖时间估算初始间隔"""
+        base_intervals = {
+            'weibo': config.get('weibo.interval', 300),
+            'douyin': config.get('douyin.interval', 300),
+        }
+        self.scheduler.sync(self._get_monitor_users(), base_intervals,
+                            history=db.get_recent_publish_times)
+    
+    def _arm_timer(self):
+        """定时到下一个到期用户，最长 RESYNC_SECONDS 后重新同步配置"""
+        if not self.is_running:
             return
+        wait = self.scheduler.next_due_in()
+        wait = self.RESYNC_SECONDS if wait is None else min(wait, self.RESYNC_SECONDS)
+        self.timer.start(wait)
         
-        self.logger.info(f"开始检查更新，共 {len(users)} 个用户")
-        
-        for platform, user_id in users:
-            self._check_user_updates(platform, user_id)
+        # 到期前预热连接
+        lead = config.get('http.prewarm_lead', 5)
+        if config.get('http.prewarm', True) and wait > lead:
+            self.prewarm_timer.start(wait - lead)
+    
+    def _check_updates(self):
+        """检查到期用户的更新"""
+        try:
+            if not config.get('monitor.enabled', False):
+                return
+            
+            self._sync_users()
+            due = self.scheduler.pop_due()
+            if not due:
+                return
+            
+            self.logger.info(f"开始检查更新，本轮 {len(due)} 个用户，共 {len(self.scheduler)} 个")
+            
+            paused = set()
+            for platform, user_id in due:
+                # 熔断中的平台不再创建注定失败的任务
+                if platform in paused or not get_breaker(platform).can_schedule():
+                    paused.add(platform)
+                    continue
+                self._check_user_updates(platform, user_id)
+            
+            for platform in paused:
+                breaker = get_breaker(platform)
+                if breaker.state == STATE_HALF_OPEN:
+                    self.logger.info(f"{platform} 熔断器探测中，其余用户本轮跳过")
+                else:
+                    self.logger.warning(f"{platform} 熔断中，暂停调度 (约 {breaker.retry_after():.0f} 秒后探测)")
+                    self.monitor_status.emit(f"{platform} 请求异常过多，暂停监控")
+        finally:
+            self._arm_timer()
+    
+    def _prewarm_connections(self):
+        """按各平台即将到期的用户数预热连接"""
+        lead = config.get('http.prewarm_lead', 5)
+        counts = {}
+        for platform, _ in self.scheduler.due_within(lead * 2):
+            counts[platform] = counts.get(platform, 0) + 1
+        for platform, count in counts.items():
+            if get_breaker(platform).state != STATE_OPEN:
+                session_pool.prewarm(platform, count)
+    
+    def _refresh_metrics(self):
+        """提交一轮互动数据刷新（与新帖检查分开，按帖子年龄决定刷新哪些）"""
+        if config.get('metrics.enabled', True) and config.get('monitor.enabled', False):
+            self.crawler_manager.refresh_metrics()
     
     def _get_monitor_users(self) -> List[tuple]:
-        """获取要监控的用户列表"""
+        """获取要监控的用户列表 [(platform, user_id, priority)]"""
         users = []
         
         # 微博用户
@@ -83,25 +172,27 @@ class MonitorService(QObject):
             weibo_users = config.get('weibo.users', [])
             for user in weibo_users:
                 if isinstance(user, dict):
-                    users.append(('weibo', user.get('user_id')))
+                    users.append(('weibo', user.get('user_id'), user.get('priority', 1.0)))
                 else:
-                    users.append(('weibo', user))
+                    users.append(('weibo', user, 1.0))
         
         # 抖音用户
         if config.get('douyin.enabled', False):
             douyin_users = config.get('douyin.users', [])
             for user in douyin_users:
                 if isinstance(user, dict):
-                    users.append(('douyin', user.get('user_id')))
+                    users.append(('douyin', user.get('user_id'), user.get('priority', 1.0)))
                 else:
-                    users.append(('douyin', user))
+                    users.append(('douyin', user, 1.0))
         
         # 如果配置中没有，从数据库获取
         if not users:
             db_users = db.get_users()
             for user in db_users:
-                users.append((user['platform'], user['user_id']))
+                users.append((user['platform'], user['user_id'], 1.0))
         
+        if self.user_filter:
+            users = [user for user in users if self.user_filter(user[0], user[1])]
         return users
     
     def _check_user_updates(self, platform: str, user_id: str):
@@ -113,10 +204,14 @@ class MonitorService(QObject):
                 return
             
             # 创建爬虫线程
-            thread = self.crawler_manager.start_crawler(platform, user_id, max_posts=20)
+            thread = self.crawler_manager.start_crawler(
+                platform, user_id, max_posts=20, probe=config.get('monitor.probe', True),
+                priority=PRIORITY_MONITOR)
             
             # 连接信号，检测新帖子
-            thread.new_post.connect(self._on_new_post)
+            key = (platform, user_id)
+            self._new_post_times[key] = []
+            thread.new_post.connect(lambda post: self._on_new_post(post, key))
             thread.finished.connect(lambda p, c: self._on_check_finished(platform, user_id, c))
             
             self.logger.debug(f"检查 {platform}/{user_id} 的更新")
@@ -124,66 +219,137 @@ class MonitorService(QObject):
         except Exception as e:
             self.logger.error(f"检查用户更新失败 {platform}/{user_id}: {e}")
     
-    def _on_new_post(self, post_data: dict):
+    def _on_new_post(self, post_data: dict, user_key: tuple = None):
         """处理新帖子"""
-        platform = post_data.get('platform', '')
-        post_id = post_data.get('post_id', '')
-        post_key = f"{platform}_{post_id}"
+        # 互动数据提醒：已存储的帖子也要检查，previous 为写入前的数值
+        self._check_metrics(post_data, post_data.get('previous'))
         
-        # 检查是否是新帖子
-        if post_key in self.seen_posts:
+        # 检查是否是新帖子：数据库中已存在的不算新帖，重复送达的只处理一次
+        seen = self.seen_posts.check_and_add(post_data.get('platform', ''),
+                                             post_data.get('post_id', ''))
+        if seen or post_data.get('is_new') is False:
             return
         
-        self.seen_posts.add(post_key)
+        if user_key in self._new_post_times:
+            self._new_post_times[user_key].append(post_data.get('published_at'))
         
         # 检查关键词匹配
-        matched_keywords = self._check_keywords(post_data)
-        if matched_keywords:
-            self.logger.info(f"关键词匹配: {post_data.get('username')} - {matched_keywords}")
+        matched = self._check_keywords(post_data)
+        if matched:
+            hits = sorted({hit for _, rule_hits in matched for hit in rule_hits})
+            matched_keywords = list(dict.fromkeys(keyword for _, _, keyword in hits))
+            rule_names = [rule.name for rule, _ in matched]
+            self._record_matches(post_data, matched)
             
-            # 发送匹配信号
+            # 和最近通知过的帖子近似重复（转发、复制粘贴）时不再单独通知
+            fingerprint = post_data.get('fingerprint')
+            if fingerprint is not None:
+                post_key = f"{post_data.get('platform', '')}_{post_data.get('post_id', '')}"
+                original = self._recent_alerts.find(fingerprint)
+                if original is not None:
+                    self.logger.info(f"关键词匹配（与 {original} 近似重复，不再通知）: "
+                                     f"{post_data.get('username')} - {rule_names}")
+                    return
+                self._recent_alerts.add(post_key, fingerprint)
+            self.logger.info(f"关键词匹配: {post_data.get('username')} - {rule_names} {matched_keywords}")
+            
+            # 发送匹配信号，spans 为命中位置 (start, end)，对应 post['content']
             self.keyword_matched.emit({
                 'post': post_data,
-                'keywords': matched_keywords
+                'keywords': matched_keywords,
+                'spans': [(start, end) for start, end, _ in hits],
+                'rules': rule_names
             })
     
-    def _check_keywords(self, post_data: dict) -> List[str]:
-        """检查关键词匹配"""
-        keywords = config.get('monitor.keywords', [])
-        if not keywords:
-            return []
-        
-        content = post_data.get('content', '').lower()
+    def _record_matches(self, post_data: dict, matched: list):
+        """匹配记录加入待写队列（近似重复不通知的也记录）"""
+        matched_at = datetime.now()
+        for rule, hits in matched:
+            self._pending_matches.append({
+                'platform': post_data.get('platform', ''),
+                'post_id': post_data.get('post_id', ''),
+                'rule': rule.name,
+                'keywords': json.dumps(list(dict.fromkeys(hit[2] for hit in hits)),
+                                       ensure_ascii=False),
+                'spans': json.dumps([(start, end) for start, end, _ in hits]),
+                'matched_at': matched_at,
+            })
+        if len(self._pending_matches) >= config.get('monitor.match_batch', 100):
+            self._flush_matches()
+        elif not self.match_flush_timer.is_active():
+            self.match_flush_timer.start(config.get('monitor.match_flush', 2))
+    
+    def _flush_matches(self):
+        """写入待写的匹配记录"""
+        self.match_flush_timer.stop()
+        if not self._pending_matches:
+            return
+        matches, self._pending_matches = self._pending_matches, []
+        try:
+            # 分片进程中由写入进程统一写库
+            (self.crawler_manager.store or db).save_keyword_matches(matches)
+        except Exception as e:
+            self.logger.error(f"保存匹配记录失败: {e}")
+            return
+        self.matches_saved.emit(len(matches))
+    
+    def _on_metrics_updated(self, updates: list):
+        """互动数据刷新写入后检查提醒"""
+        self._emit_metric_alerts(self._metric_watcher.check_updates(updates))
+    
+    def _check_metrics(self, post_data: dict, previous: Optional[dict]):
+        """按写入前后的互动数据检查提醒规则（只检查变化了的指标对应的规则）"""
+        self._emit_metric_alerts(self._metric_watcher.check(post_data, previous))
+    
+    def _emit_metric_alerts(self, alerts: list):
+        """记录日志并发出互动数据提醒"""
+        for alert in alerts:
+            self.logger.info(f"互动数据提醒: {alert['post'].get('username')} - {alert['rule']} "
+                             f"{alert['metric']} {alert['previous']} -> {alert['value']}")
+            self.metric_alert.emit(alert)
+    
+    def _check_keywords(self, post_data: dict) -> list:
+        """检查关键词和组合规则，返回 [(命中的规则, 命中列表)]"""
+        content = post_data.get('content') or ''
         if not content:
             return []
-        
-        match_mode = config.get('monitor.match_mode', 'any')
-        matched = []
-        
-        for keyword in keywords:
-            keyword_lower = keyword.lower().strip()
-            if keyword_lower and keyword_lower in content:
-                matched.append(keyword)
-        
-        # 根据匹配模式返回结果
-        if match_mode == 'all':
-            # 全部匹配模式：所有关键词都要匹配
-            return matched if len(matched) == len(keywords) else []
-        else:
-            # 任意匹配模式：匹配任意一个即可
-            return matched
+        rule_set = self._get_rule_set()
+        if not rule_set:
+            return []
+        return rule_set.match(content, post_data.get('platform', ''),
+                              str(post_data.get('user_id', '')),
+                              post_data.get('content_normalized'))
+    
+    def _get_rule_set(self) -> RuleSet:
+        """当前配置的规则集（关键词和组合规则共用一次扫描），配置变化时重新编译"""
+        source = (config.get('monitor.keywords', []), config.get('monitor.match_mode', 'any'),
+                  config.get('monitor.rules', []), config.get('monitor.groups', {}))
+        if self._rule_set is not None and source == self._rule_source:
+            return self._rule_set
+        keywords, mode, rule_configs, groups = source
+        rules = rules_from_config(self.logger)
+        self._rule_set = RuleSet(rules)
+        self._rule_source = (list(keywords), mode, [dict(item) for item in rule_configs],
+                             {name: list(users) for name, users in groups.items()})
+        self.logger.debug(f"规则集已编译：{len(keywords)} 个关键词，{len(rules)} 条规则")
+        return self._rule_set
     
     def _on_check_finished(self, platform: str, user_id: str, count: int):
         """检查完成"""
         self.last_check_time[f"{platform}_{user_id}"] = datetime.now()
+        published = self._new_post_times.pop((platform, user_id), [])
+        self.scheduler.record_result(platform, user_id, len(published), published)
+        self._arm_timer()
         if count > 0:
-            self.logger.debug(f"检查完成 {platform}/{user_id}: 发现 {count} 条帖子")
+            self.logger.debug(f"检查完成 {platform}/{user_id}: 获取 {count} 条帖子，新帖 {len(published)} 条")
     
     def set_interval(self, seconds: int):
-        """设置监控间隔"""
+        """设置最短监控间隔（实际间隔由调度器按发帖频率计算）"""
         if self.is_running:
-            self.timer.setInterval(seconds * 1000)
-            self.logger.info(f"监控间隔已更新为 {seconds} 秒")
+            self._configure_scheduler()
+            self.scheduler.min_interval = seconds
+            self._arm_timer()
+            self.logger.info(f"最短监控间隔已更新为 {seconds} 秒")
     
     def add_keyword(self, keyword: str):
         """添加关键词"""
@@ -0,0 +1,121 @@
+"""
+匹配通知队列 - 有界队列、按关键词和用户限流、按时间窗口汇总
+
+匹配结果先进入队列，不直接弹窗：安静一段时间后的第一条马上通知，
+之后 window 秒内到达的汇总成一条摘要在窗口结束时通知。超过限流的匹配
+只计数不通知，队列满时丢弃最早的。通知通过 notify 信号发出，由界面决定怎么显示。
+"""
+from collections import OrderedDict, deque
+from typing import Dict, List
+from .events import EventLoop, Signal, Timer
+from .resilience import TokenBucket
+
+
+class NotificationQueue:
+    """
+    通知队列（只在事件循环线程中调用）
+
+    Args:
+        max_size: 队列容量，满了丢弃最早的匹配
+        window: 汇总窗口(秒)
+        per_keyword: 每个关键词（或规则）每分钟最多通知的次数，0 为不限
+        per_user: 每个用户每分钟最多通知的次数，0 为不限
+    """
+
+    # 最多保留的限流桶数（按最近使用淘汰）
+    MAX_BUCKETS = 1000
+
+    def __init__(self, loop: EventLoop, max_size: int = 100, window: float = 10.0,
+                 per_keyword: int = 5, per_user: int = 5):
+        self.max_size = max_size
+        self.window = window
+        self.per_keyword = per_keyword
+        self.per_user = per_user
+        # 信号
+        self.notify = Signal(loop)  # {items, count, suppressed, dropped}
+        self._queue = deque()
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._suppressed = 0
+        self._dropped = 0
+        self._timer = Timer(loop, self._on_window_end, single_shot=True)
+
+    @classmethod
+    def from_config(cls, loop: EventLoop, config) -> 'NotificationQueue':
+        """按配置创建"""
+        return cls(loop,
+                   max_size=config.get('notification.queue_size', 100),
+                   window=config.get('notification.digest_window', 10),
+                   per_keyword=config.get('notification.per_keyword', 5),
+                   per_user=config.get('notification.per_user', 5))
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def submit(self, match: Dict):
+        """
+        加入一条匹配（keyword_matched 信号的数据）
+
+        不在汇总窗口内时马上通知并开始一个窗口，否则等窗口结束一起通知。
+        """
+        if not self._allow(match):
+            self._suppressed += 1
+            return
+        if len(self._queue) >= self.max_size:
+            self._queue.popleft()
+            self._dropped += 1
+        self._queue.append(match)
+        if not self._timer.is_active():
+            self._flush()
+            self._timer.start(self.window)
+
+    def _on_window_end(self):
+        """窗口结束：有积压时发出摘要并开始下一个窗口"""
+        if self._queue or self._suppressed or self._dropped:
+            self._flush()
+            self._timer.start(self.window)
+
+    def _flush(self):
+        """发出队列中的匹配"""
+        items: List[Dict] = list(self._queue)
+        self._queue.clear()
+        digest = {
+            'items': items,
+            'count': len(items),
+            'suppressed': self._suppressed,
+            'dropped': self._dropped,
+        }
+        self._suppressed = 0
+        self._dropped = 0
+        self.notify.emit(digest)
+
+    def _allow(self, match: Dict) -> bool:
+        """用户和关键词限流：用户未超限，且至少一个关键词未超限"""
+        post = match.get('post', {})
+        if self.per_user > 0:
+            user = f"user:{post.get('platform', '')}:{post.get('user_id') or post.get('username', '')}"
+            if self._bucket(user, self.per_user).try_acquire() > 0:
+                return False
+        if self.per_keyword > 0:
+            keys = match.get('keywords') or match.get('rules') or []
+            if keys and not any(self._bucket(f"keyword:{key}", self.per_keyword).try_acquire() == 0
+                                for key in keys):
+                return False
+        return True
+
+    def _bucket(self, key: str, per_minute: int) -> TokenBucket:
+        """限流桶（每分钟 per_minute 次，可以一次用完）"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(per_minute / 60.0, per_minute)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def clear(self):
+        """清空队列和计数，停止窗口"""
+        self._timer.stop()
+        self._queue.clear()
+        self._suppressed = 0
+        self._dropped = 0
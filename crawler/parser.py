@@ -0,0 +1,195 @@
+"""
+解析模块 - 微博/抖音响应的快速解析
+"""
+import html
+import json
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时回退到标准库
+    orjson = None
+
+# 预编译正则
+_TAG_RE = re.compile(r'<[^>]+>')
+_TIME_RE = re.compile(
+    r'^(?:(?P<now>刚刚)'
+    r'|(?P<minutes>\d+)分钟前'
+    r'|(?P<hours>\d+)小时前'
+    r'|(?P<day>今天|昨天)\s*(?P<hm>\d{1,2}:\d{2})'
+    r'|(?P<ymd>\d{4}-\d{1,2}-\d{1,2})'
+    r'|(?P<md>\d{1,2}-\d{1,2}))$'
+)
+_ABSOLUTE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+# 解析结果缓存上限（时间字符串高度重复，如"今天 12:30"）
+_TIME_CACHE_SIZE = 4096
+
+
+def loads(data: Union[bytes, str]):
+    """解析JSON，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_response(response) -> Dict:
+    """一次性解码响应体（直接解析 bytes，避免 requests 的编码探测和重复解析）"""
+    return loads(response.content)
+
+
+def strip_html(text: str) -> str:
+    """去除HTML标签并反转义实体"""
+    if not text:
+        return ''
+    if '<' in text:
+        text = _TAG_RE.sub('', text)
+    if '&' in text:
+        text = html.unescape(text)
+    return text
+
+
+@lru_cache(maxsize=_TIME_CACHE_SIZE)
+def _parse_time_spec(time_str: str) -> Tuple:
+    """
+    把时间字符串解析为与当前时间无关的描述，便于缓存
+
+    Returns:
+        ('now',) / ('delta', 秒) / ('day', 偏移天数, 时, 分) /
+        ('date', 月, 日) / ('absolute', datetime) / ('invalid',)
+    """
+    match = _TIME_RE.match(time_str.strip())
+    if match:
+        if match.group('now'):
+            return ('now',)
+        if match.group('minutes'):
+            return ('delta', int(match.group('minutes')) * 60)
+        if match.group('hours'):
+            return ('delta', int(match.group('hours')) * 3600)
+        if match.group('day'):
+            hour, minute = match.group('hm').split(':')
+            offset = 0 if match.group('day') == '今天' else 1
+            return ('day', offset, int(hour), int(minute))
+        if match.group('ymd'):
+            return ('absolute', datetime.strptime(match.group('ymd'), '%Y-%m-%d'))
+        month, day = match.group('md').split('-')
+        return ('date', int(month), int(day))
+
+    try:
+        # 完整时间带时区，统一转换为本地时间（不带时区），与其他分支保持一致
+        dt = datetime.strptime(time_str, _ABSOLUTE_FORMAT)
+        return ('absolute', dt.astimezone().replace(tzinfo=None))
+    except ValueError:
+        return ('invalid',)
+
+
+def parse_time(time_str: str, now: Optional[datetime] = None) -> datetime:
+    """解析微博时间字符串（相对时间按当前时间计算），无法解析时返回当前时间"""
+    now = now or datetime.now()
+    if not time_str:
+        return now
+    spec = _parse_time_spec(time_str)
+    kind = spec[0]
+    if kind == 'delta':
+        return now - timedelta(seconds=spec[1])
+    if kind == 'day':
+        day = now.date() - timedelta(days=spec[1])
+        return datetime(day.year, day.month, day.day, spec[2], spec[3])
+    if kind == 'date':
+        try:
+            result = datetime(now.year, spec[1], spec[2])
+        except ValueError:
+            return now
+        # 只有月日时指过去的日期，跨年时落在去年
+        return result if result <= now else result.replace(year=now.year - 1)
+    if kind == 'absolute':
+        return spec[1]
+    return now
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """
+    数据库中的时间字段转 datetime（本地时间，不带时区），无法解析时返回 None
+
+    旧版本按 %z 解析微博时间，数据库中可能存有 "+08:00" 结尾的时间，统一换算成
+    本地时间去掉时区，避免和不带时区的时间比较时报错。
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def iter_mblogs(cards: Iterable[Dict]) -> Iterator[Dict]:
+    """只取出微博卡片(card_type 9)的 mblog，其余卡片不做任何处理"""
+    for card in cards:
+        if card.get('card_type') != 9:
+            continue
+        mblog = card.get('mblog')
+        if mblog:
+            yield mblog
+
+
+def parse_mblog(mblog: Dict, now: Optional[datetime] = None) -> Dict:
+    """解析微博 mblog"""
+    images = []
+    for pic in mblog.get('pics') or ():
+        images.append(pic.get('large', {}).get('url', ''))
+
+    videos = []
+    page_info = mblog.get('page_info')
+    if page_info and page_info.get('type') == 'video':
+        media_info = page_info.get('media_info', {})
+        video_url = media_info.get('stream_url_hd') or media_info.get('stream_url')
+        if video_url:
+            videos.append(video_url)
+
+    mid = mblog.get('id')
+    return {
+        'post_id': str(mid or ''),
+        'content': strip_html(mblog.get('text', '')),
+        'images': json.dumps(images) if images else None,
+        'videos': json.dumps(videos) if videos else None,
+        'likes': mblog.get('attitudes_count', 0),
+        'comments': mblog.get('comments_count', 0),
+        'shares': mblog.get('reposts_count', 0),
+        'post_url': f'https://m.weibo.cn/detail/{mid}',
+        'published_at': parse_time(mblog.get('created_at', ''), now),
+    }
+
+
+def parse_aweme(aweme: Dict) -> Dict:
+    """解析抖音 aweme"""
+    images = []
+    video = aweme.get('video', {})
+    cover = video.get('origin_cover', {}).get('url_list', [])
+    if cover:
+        images.append(cover[0])
+
+    videos = []
+    play_addr = video.get('play_addr', {}).get('url_list', [])
+    if play_addr:
+        videos.append(play_addr[0])
+
+    statistics = aweme.get('statistics', {})
+    aweme_id = aweme.get('aweme_id')
+    return {
+        'post_id': str(aweme_id or ''),
+        'content': aweme.get('desc', ''),
+        'images': json.dumps(images) if images else None,
+        'videos': json.dumps(videos) if videos else None,
+        'likes': statistics.get('digg_count', 0),
+        'comments': statistics.get('comment_count', 0),
+        'shares': statistics.get('share_count', 0),
+        'post_url': f'https://www.douyin.com/video/{aweme_id}',
+        'published_at': datetime.fromtimestamp(aweme.get('create_time', 0)),
+    }
@@ -0,0 +1,184 @@
+"""
+代理池 - 按延迟和错误率打分的代理选择
+"""
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from config import config, BASE_DIR
+from utils.logger import get_logger
+from .resilience import RESULT_OK, RESULT_BLOCKED, RESULT_THROTTLED
+
+
+class ProxyState:
+    """单个代理的健康状态"""
+
+    # 指数滑动平均系数
+    ALPHA = 0.3
+
+    def __init__(self, url: str, proxies: Dict[str, str]):
+        self.url = url
+        self.proxies = proxies
+        self.latency = 1.0  # 平均延迟(秒)，初始值偏保守
+        self.error_rate = 0.0  # 平均错误率
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.quarantine_count = 0
+        self.quarantined_until = 0.0
+        self.requests = 0
+
+    def is_available(self, now: float) -> bool:
+        """是否可用（不在隔离期）"""
+        return now >= self.quarantined_until
+
+    def score(self) -> float:
+        """得分，越低越好；并发中的请求越多得分越高，从而分散负载"""
+        return self.latency * (1 + 4 * self.error_rate) * (1 + self.in_flight)
+
+    def to_dict(self) -> Dict:
+        """导出状态"""
+        return {
+            'url': self.url,
+            'latency': round(self.latency, 3),
+            'error_rate': round(self.error_rate, 3),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'quarantined': self.quarantined_until > time.monotonic(),
+        }
+
+
+class ProxyPool:
+    """
+    代理池
+
+    - 按账号粘性分配代理，同一账号的请求尽量走同一出口IP
+    - 新分配时在两个随机候选中选得分更低的（power of two choices），避免全部挤到最优代理
+    - 连续失败或被拦截的代理进入隔离期，隔离时间按次数指数增长
+    """
+
+    def __init__(self):
+        self.logger = get_logger('crawler.proxy_pool')
+        self._lock = threading.Lock()
+        self._proxies: Dict[str, ProxyState] = {}
+        self._sticky: Dict[str, str] = {}
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用代理池"""
+        self._ensure_loaded()
+        return config.get('proxy.enabled', False) and bool(self._proxies)
+
+    def reload(self):
+        """从配置重新加载代理列表，保留已有代理的健康数据"""
+        entries = self._load_entries()
+        with self._lock:
+            proxies = {}
+            for url, proxy_dict in entries.items():
+                proxies[url] = self._proxies.get(url) or ProxyState(url, proxy_dict)
+            self._proxies = proxies
+            self._sticky = {k: v for k, v in self._sticky.items() if v in proxies}
+            self._loaded = True
+        self.logger.info(f"代理池已加载 {len(entries)} 个代理")
+
+    def select(self, account: Optional[str] = None) -> Optional[ProxyState]:
+        """为一次请求选择代理"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if account:
+                url = self._sticky.get(account)
+                state = self._proxies.get(url) if url else None
+                if state and state.is_available(now):
+                    state.in_flight += 1
+                    return state
+
+            candidates = [p for p in self._proxies.values() if p.is_available(now)]
+            if not candidates:
+                # 全部隔离时选最早解除隔离的，避免完全停摆
+                candidates = [min(self._proxies.values(), key=lambda p: p.quarantined_until)]
+
+            if len(candidates) >= 2:
+                a, b = random.sample(candidates, 2)
+                state = a if a.score() <= b.score() else b
+            else:
+                state = candidates[0]
+
+            if account:
+                self._sticky[account] = state.url
+            state.in_flight += 1
+            return state
+
+    def report(self, state: ProxyState, latency: float, kind: str):
+        """上报请求结果"""
+        failed = kind != RESULT_OK
+        with self._lock:
+            state.in_flight = max(0, state.in_flight - 1)
+            state.requests += 1
+            state.latency += ProxyState.ALPHA * (latency - state.latency)
+            state.error_rate += ProxyState.ALPHA * ((1.0 if failed else 0.0) - state.error_rate)
+
+            if not failed:
+                state.consecutive_failures = 0
+                state.quarantine_count = 0
+                return
+
+            state.consecutive_failures += 1
+            threshold = config.get('proxy.max_failures', 3)
+            if kind in (RESULT_BLOCKED, RESULT_THROTTLED) or state.consecutive_failures >= threshold:
+                self._quarantine(state, kind)
+
+    def stats(self) -> List[Dict]:
+        """各代理状态"""
+        with self._lock:
+            return [p.to_dict() for p in self._proxies.values()]
+
+    def _quarantine(self, state: ProxyState, kind: str):
+        """隔离代理（调用方持有锁）"""
+        base = config.get('proxy.quarantine', 120)
+        duration = min(base * (2 ** state.quarantine_count), base * 32)
+        state.quarantine_count += 1
+        state.consecutive_failures = 0
+        state.quarantined_until = time.monotonic() + duration
+        # 解除隔离后以中等错误率重新试用
+        state.error_rate = 0.5
+        # 解除粘性分配，让这些账号换到其他代理
+        self._sticky = {k: v for k, v in self._sticky.items() if v != state.url}
+        self.logger.warning(f"代理 {state.url} 隔离 {duration:.0f} 秒 ({kind})")
+
+    def _ensure_loaded(self):
+        """首次使用时加载"""
+        if not self._loaded:
+            self.reload()
+
+    def _load_entries(self) -> Dict[str, Dict[str, str]]:
+        """读取配置中的代理：单个 http/https、pool 列表和 pool_file 文件"""
+        entries = {}
+
+        http = config.get('proxy.http', '').strip()
+        https = config.get('proxy.https', '').strip()
+        if http or https:
+            entries[https or http] = {'http': http or https, 'https': https or http}
+
+        urls = list(config.get('proxy.pool', []))
+        pool_file = config.get('proxy.pool_file', '')
+        if pool_file:
+            path = Path(pool_file)
+            if not path.is_absolute():
+                path = BASE_DIR / path
+            try:
+                urls.extend(path.read_text(encoding='utf-8').splitlines())
+            except OSError as e:
+                self.logger.error(f"读取代理文件失败: {e}")
+
+        for url in urls:
+            url = url.strip()
+            if url and not url.startswith('#'):
+                entries[url] = {'http': url, 'https': url}
+        return entries
+
+
+# 全局代理池实例
+proxy_pool = ProxyPool()
@@ -0,0 +1,307 @@
+"""
+容错模块 - 分类重试、指数退避、熔断器与令牌桶限速
+"""
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+from config import config
+from utils.logger import get_logger
+
+# 请求结果分类
+RESULT_OK = 'ok'                      # 成功（或无需重试的客户端错误）
+RESULT_TIMEOUT = 'timeout'            # 超时 / 连接异常
+RESULT_SERVER_ERROR = 'server_error'  # 5xx
+RESULT_THROTTLED = 'throttled'        # 429 请求过于频繁
+RESULT_BLOCKED = 'blocked'            # 418 被反爬拦截
+
+# 熔断器状态
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CrawlerRequestError(Exception):
+    """请求失败（重试耗尽或不可重试）"""
+
+    def __init__(self, message: str, kind: str = RESULT_TIMEOUT):
+        super().__init__(message)
+        self.kind = kind
+
+
+class CircuitOpenError(CrawlerRequestError):
+    """熔断器打开，请求被拒绝"""
+
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(f"{platform} 熔断中，{retry_after:.0f} 秒后重试", RESULT_BLOCKED)
+        self.platform = platform
+        self.retry_after = retry_after
+
+
+def classify_status(status_code: int) -> str:
+    """按HTTP状态码分类"""
+    if status_code == 418:
+        return RESULT_BLOCKED
+    if status_code == 429:
+        return RESULT_THROTTLED
+    if status_code >= 500:
+        return RESULT_SERVER_ERROR
+    return RESULT_OK
+
+
+class RetryPolicy:
+    """重试策略：带抖动的指数退避"""
+
+    # 不同错误类型的退避倍数
+    KIND_FACTORS = {
+        RESULT_TIMEOUT: 1.0,
+        RESULT_SERVER_ERROR: 2.0,
+        RESULT_THROTTLED: 4.0,
+    }
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_config(cls) -> 'RetryPolicy':
+        """从配置创建"""
+        return cls(
+            max_retries=config.get('retry.max_retries', 3),
+            base_delay=config.get('retry.base_delay', 1.0),
+            max_delay=config.get('retry.max_delay', 60.0),
+        )
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        """是否应该重试（418表示被封禁，重试只会加重）"""
+        return kind in self.KIND_FACTORS and attempt < self.max_retries
+
+    def backoff(self, kind: str, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算退避时间（full jitter）
+
+        Args:
+            kind: 错误类型
+            attempt: 已重试次数，从0开始
+            retry_after: 服务端返回的 Retry-After 秒数
+        """
+        ceiling = min(self.max_delay,
+                      self.base_delay * self.KIND_FACTORS.get(kind, 1.0) * (2 ** attempt))
+        delay = random.uniform(ceiling / 2, ceiling)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    在滑动窗口内错误率过高时打开，冷却期过后进入半开状态，
+    只放行一个探测请求，成功则关闭，失败则加倍冷却时间后重新打开。
+    """
+
+    def __init__(self, platform: str, window: int = 20, min_requests: int = 5,
+                 failure_rate: float = 0.5, cooldown: float = 60.0,
+                 max_cooldown: float = 900.0):
+        self.platform = platform
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.logger = get_logger('crawler.breaker')
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # True 表示失败
+        self._state = STATE_CLOSED
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_scheduled_at = 0.0
+
+    @classmethod
+    def from_config(cls, platform: str) -> 'CircuitBreaker':
+        """从配置创建"""
+        return cls(
+            platform,
+            window=config.get('circuit_breaker.window', 20),
+            min_requests=config.get('circuit_breaker.min_requests', 5),
+            failure_rate=config.get('circuit_breaker.failure_rate', 0.5),
+            cooldown=config.get('circuit_breaker.cooldown', 60),
+            max_cooldown=config.get('circuit_breaker.max_cooldown', 900),
+        )
+
+    @property
+    def state(self) -> str:
+        """当前状态（冷却结束的打开状态视为半开）"""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def retry_after(self) -> float:
+        """距离允许探测的剩余秒数"""
+        with self._lock:
+            if self._state != STATE_OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._cooldown - time.monotonic())
+
+    def can_schedule(self) -> bool:
+        """
+        供调度器判断是否值得创建爬取任务
+
+        半开状态下只放行一个任务用于探测，避免冷却结束瞬间涌入大量任务。
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN:
+                return False
+            # 半开：探测任务未完成前不再放行（探测任务迟迟未发请求时允许重新安排）
+            now = time.monotonic()
+            if self._probe_in_flight or now - self._probe_scheduled_at < self.base_cooldown:
+                return False
+            self._probe_scheduled_at = now
+            return True
+
+    def allow_request(self) -> bool:
+        """请求发出前调用，判断是否放行"""
+        with self._lock:
+            self._refresh_state()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_OPEN or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """记录成功"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self.logger.info(f"{self.platform} 探测成功，熔断器关闭")
+                self._state = STATE_CLOSED
+                self._cooldown = self.base_cooldown
+                self._outcomes.clear()
+                self._probe_in_flight = False
+            self._outcomes.append(False)
+
+    def record_failure(self, kind: str = RESULT_TIMEOUT):
+        """记录失败，418 直接熔断"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                self._open(f"探测失败({kind})")
+                return
+            self._outcomes.append(True)
+            if kind == RESULT_BLOCKED:
+                self._open("被反爬拦截(418)")
+                return
+            total = len(self._outcomes)
+            failures = sum(self._outcomes)
+            if total >= self.min_requests and failures / total >= self.failure_rate:
+                self._open(f"错误率 {failures}/{total}")
+
+    def release_probe(self):
+        """请求没有得到结果（非网络原因的异常）时释放探测名额，下次请求可以重新探测"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        """重置为关闭状态"""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._cooldown = self.base_cooldown
+            self._outcomes.clear()
+            self._probe_in_flight = False
+
+    def _open(self, reason: str):
+        """打开熔断器（调用方持有锁）"""
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.logger.warning(f"{self.platform} 熔断器打开: {reason}，冷却 {self._cooldown:.0f} 秒")
+
+    def _refresh_state(self):
+        """冷却结束后转为半开（调用方持有锁）"""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self._cooldown:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+            self._probe_scheduled_at = 0.0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(platform: str) -> CircuitBreaker:
+    """获取平台熔断器（进程内共享）"""
+    with _breakers_lock:
+        breaker = _breakers.get(platform)
+        if breaker is None:
+            breaker = CircuitBreaker.from_config(platform)
+            _breakers[platform] = breaker
+        return breaker
+
+
+class TokenBucket:
+    """
+    令牌桶限速器（线程安全）
+
+    按 rate 个/秒补充令牌，最多攒 burst 个；acquire 取不到令牌时等待。
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = max(rate, 1e-6)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """补充令牌（调用方持有锁）"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """尝试取令牌，成功返回 0，否则返回还需等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0,
+                cancelled: Callable[[], bool] = lambda: False) -> bool:
+        """等待直到取到令牌，cancelled() 为真时放弃并返回 False"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return True
+            if cancelled():
+                return False
+            # 分段等待，便于及时响应取消
+            time.sleep(min(wait, 1.0))
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, rate: float, burst: float = 1.0) -> TokenBucket:
+    """获取命名限速器（进程内共享，同名的调用方共用一个速率预算）"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = TokenBucket(rate, burst)
+            _limiters[name] = limiter
+        else:
+            limiter.rate, limiter.burst = max(rate, 1e-6), max(burst, 1.0)
+        return limiter
@@ -0,0 +1,474 @@
+"""
+组合关键词规则 - 布尔查询语法，所有规则共用一次多模式扫描
+
+语法（运算符需大写，优先级从高到低）:
+    "短语"             引号内按原样匹配（可包含空格和运算符）
+    A NEAR/n B         A、B 都出现且间隔不超过 n 个字符（只能连接词语或短语，
+                       按归一化后的文本计算，不含标点和空白）
+    NOT A              不包含 A
+    A AND B / A B      同时满足（相邻的词默认 AND）
+    A OR B             满足其一
+    ( ... )            分组
+例如: 新品 AND (优惠 OR 折扣) NOT 转发
+
+每条规则可以限定平台、用户和账号分组（monitor.groups 中定义的用户列表）。
+规则集按 (平台, 用户) 建分派索引，每条帖子只处理对其生效的规则：生效规则相同的
+账号共用一个按需编译的 KeywordMatcher（只含这些规则用到的词），每条帖子只扫描一遍；
+之后只计算至少命中一个肯定词的规则（以及只含否定条件、不命中任何词也能成立的规则），
+每帖开销取决于对该账号生效的规则，与规则总数无关。
+"""
+import json
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from config import config
+from utils.text import normalize, normalize_with_offsets, original_span
+from .matcher import Hit, KeywordMatcher
+
+# 词 -> 该词在正文中的命中位置 [(start, end)]
+Hits = Dict[str, List[Tuple[int, int]]]
+Evaluator = Callable[[Hits], bool]
+
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|(NEAR/\d+)|([^\s()"]+))')
+_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+class RuleSyntaxError(ValueError):
+    """规则语法错误"""
+
+
+class _Term:
+    """词语或短语"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def compile(self) -> Evaluator:
+        text = self.text
+        return lambda hits: text in hits
+
+    def positive_terms(self) -> Set[str]:
+        return {self.text}
+
+    def terms(self) -> Set[str]:
+        return {self.text}
+
+
+class _Not:
+    """NOT"""
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def compile(self) -> Evaluator:
+        operand = self.operand.compile()
+        return lambda hits: not operand(hits)
+
+    def positive_terms(self) -> Set[str]:
+        return set()
+
+    def terms(self) -> Set[str]:
+        return self.operand.terms()
+
+
+class _And:
+    """AND"""
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def compile(self) -> Evaluator:
+        operands = [operand.compile() for operand in self.operands]
+        return lambda hits: all(operand(hits) for operand in operands)
+
+    def positive_terms(self) -> Set[str]:
+        return set().union(*(operand.positive_terms() for operand in self.operands))
+
+    def terms(self) -> Set[str]:
+        return set().union(*(operand.terms() for operand in self.operands))
+
+
+class _Or(_And):
+    """OR"""
+
+    def compile(self) -> Evaluator:
+        operands = [operand.compile() for operand in self.operands]
+        return lambda hits: any(operand(hits) for operand in operands)
+
+
+class _Near:
+    """两个词在 distance 个字符以内同时出现"""
+
+    def __init__(self, left: _Term, right: _Term, distance: int):
+        self.left = left
+        self.right = right
+        self.distance = distance
+
+    def compile(self) -> Evaluator:
+        left, right, distance = self.left.text, self.right.text, self.distance
+
+        def near(hits: Hits) -> bool:
+            if left not in hits or right not in hits:
+                return False
+            for a_start, a_end in hits[left]:
+                for b_start, b_end in hits[right]:
+                    if max(b_start - a_end, a_start - b_end) <= distance:
+                        return True
+            return False
+        return near
+
+    def positive_terms(self) -> Set[str]:
+        return {self.left.text, self.right.text}
+
+    def terms(self) -> Set[str]:
+        return {self.left.text, self.right.text}
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    """切分为 (类型, 值)，类型为 ( ) term op near"""
+    tokens = []
+    pos = 0
+    query = query.strip()
+    while pos < len(query):
+        m = _TOKEN_RE.match(query, pos)
+        if not m or m.end() == pos:
+            raise RuleSyntaxError(f"无法解析: {query[pos:]}")
+        pos = m.end()
+        lparen, rparen, phrase, near, word = m.groups()
+        if lparen:
+            tokens.append(('(', lparen))
+        elif rparen:
+            tokens.append((')', rparen))
+        elif phrase is not None:
+            text = re.sub(r'\\(.)', r'\1', phrase)
+            if not normalize(text):
+                raise RuleSyntaxError(f"短语不含可匹配的文字: \"{text}\"")
+            tokens.append(('term', text))
+        elif near:
+            tokens.append(('near', near))
+        elif word in _OPERATORS:
+            tokens.append(('op', word))
+        elif not normalize(word):
+            raise RuleSyntaxError(f"词语不含可匹配的文字: {word}")
+        else:
+            tokens.append(('term', word))
+    return tokens
+
+
+class _Parser:
+    """递归下降解析: or := and (OR and)*; and := unary (AND? unary)*; unary := NOT unary | near"""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = _tokenize(query)
+        self.pos = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleSyntaxError("规则为空")
+        node = self._or()
+        if self.pos < len(self.tokens):
+            raise RuleSyntaxError(f"多余的内容: {self.tokens[self.pos][1]}")
+        return node
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise RuleSyntaxError(f"规则不完整: {self.query}")
+        self.pos += 1
+        return token
+
+    def _or(self):
+        operands = [self._and()]
+        while self._peek() == ('op', 'OR'):
+            self.pos += 1
+            operands.append(self._and())
+        return operands[0] if len(operands) == 1 else _Or(operands)
+
+    def _and(self):
+        operands = [self._unary()]
+        while True:
+            token = self._peek()
+            if token == ('op', 'AND'):
+                self.pos += 1
+            elif token is None or token[0] == ')' or token == ('op', 'OR'):
+                break
+            operands.append(self._unary())
+        return operands[0] if len(operands) == 1 else _And(operands)
+
+    def _unary(self):
+        if self._peek() == ('op', 'NOT'):
+            self.pos += 1
+            return _Not(self._unary())
+        return self._near()
+
+    def _near(self):
+        node = self._primary()
+        while self._peek() and self._peek()[0] == 'near':
+            distance = int(self._next()[1][5:])
+            right = self._primary()
+            if not isinstance(node, _Term) or not isinstance(right, _Term):
+                raise RuleSyntaxError("NEAR 只能连接词语或短语")
+            node = _Near(node, right, distance)
+        return node
+
+    def _primary(self):
+        kind, value = self._next()
+        if kind == '(':
+            node = self._or()
+            if self._next()[0] != ')':
+                raise RuleSyntaxError("括号不匹配")
+            return node
+        if kind == 'term':
+            return _Term(value)
+        raise RuleSyntaxError(f"此处不能出现 {value}")
+
+
+def parse_query(query: str):
+    """解析查询，语法错误时抛出 RuleSyntaxError"""
+    return _Parser(query).parse()
+
+
+class Rule:
+    """
+    一条规则
+
+    Args:
+        query: 查询语句
+        platforms: 只对这些平台生效，空为全部
+        users: 只对这些用户生效，元素为 "platform:user_id" 或 user_id，空为全部
+    """
+
+    def __init__(self, name: str, query: str, platforms: Iterable[str] = (),
+                 users: Iterable[str] = ()):
+        self.name = name
+        self.query = query
+        self.platforms = set(platforms or ())
+        self.users = set(users or ())
+        self.tree = parse_query(query)
+        self.evaluate = self.tree.compile()
+        self.positive_terms = self.tree.positive_terms()
+        # 一个词都没命中也能成立（如只有 NOT），每条帖子都要计算
+        self.matches_empty = self.evaluate({})
+
+    @classmethod
+    def from_config(cls, data: Dict, groups: Optional[Dict[str, List]] = None) -> 'Rule':
+        """
+        由配置项 {name, query | keywords, mode, platforms, users, groups} 创建
+
+        keywords 为关键词列表（按 mode 组合，同 monitor.keywords），和 query 二选一；
+        groups 为账号分组名，按 groups 参数（monitor.groups）展开为用户。
+        """
+        query = data.get('query')
+        if query is None:
+            query = keywords_query(data['keywords'], data.get('mode', 'any'))
+            if query is None:
+                raise RuleSyntaxError("关键词为空")
+        return cls(data.get('name') or query, query, data.get('platforms') or (),
+                   scope_users(data, groups))
+
+    @classmethod
+    def from_keywords(cls, keywords: List[str], mode: str = 'any',
+                      name: str = '关键词') -> Optional['Rule']:
+        """把关键词列表和匹配模式转换为规则（每个关键词作为短语，不解析运算符）"""
+        query = keywords_query(keywords, mode)
+        return cls(name, query) if query else None
+
+    @property
+    def signature(self) -> str:
+        """规则内容的标识（名称、查询和生效范围），任一项变化即视为新规则"""
+        return json.dumps([self.name, self.query, sorted(self.platforms), sorted(self.users)],
+                          ensure_ascii=False)
+
+    def applies_to(self, platform: str, user_id: str) -> bool:
+        """是否对该平台、用户生效"""
+        if self.platforms and platform not in self.platforms:
+            return False
+        if self.users and user_id not in self.users and f"{platform}:{user_id}" not in self.users:
+            return False
+        return True
+
+
+def keywords_query(keywords: List[str], mode: str = 'any') -> Optional[str]:
+    """关键词列表按匹配模式组合成查询（每个关键词作为短语），没有有效关键词时为 None"""
+    phrases = ['"' + keyword.strip().replace('\\', '\\\\').replace('"', '\\"') + '"'
+               for keyword in dict.fromkeys(keywords) if normalize(keyword)]
+    if not phrases:
+        return None
+    return (' AND ' if mode == 'all' else ' OR ').join(phrases)
+
+
+def scope_users(data: Dict, groups: Optional[Dict[str, List]] = None) -> List[str]:
+    """
+    配置项的生效用户：users 加上 groups 中各分组的成员
+
+    分组不存在时抛出 KeyError（规则限定了范围，不能因为分组写错而对所有用户生效）。
+    """
+    users = [str(user) for user in data.get('users') or ()]
+    for name in data.get('groups') or ():
+        if name not in (groups or {}):
+            raise KeyError(f"账号分组不存在: {name}")
+        users.extend(str(user) for user in groups[name])
+    return users
+
+
+def rules_from_config(logger=None) -> List[Rule]:
+    """
+    按当前配置创建规则：关键词列表按匹配模式（any/all）转换为一条规则，
+    加上 monitor.rules 中启用的组合规则（分组按 monitor.groups 展开）。
+    无效的规则记录日志后跳过。
+    """
+    rules = []
+    keyword_rule = Rule.from_keywords(config.get('monitor.keywords', []),
+                                      config.get('monitor.match_mode', 'any'))
+    if keyword_rule:
+        rules.append(keyword_rule)
+    groups = config.get('monitor.groups', {})
+    for item in config.get('monitor.rules', []):
+        if not item.get('enabled', True):
+            continue
+        try:
+            rules.append(Rule.from_config(item, groups))
+        except (RuleSyntaxError, KeyError) as e:
+            if logger:
+                logger.error(f"规则无效，已跳过 {item}: {e}")
+    return rules
+
+
+class _Compiled:
+    """一组规则编译后的扫描器（rules 为 (规则下标, 规则)）"""
+
+    def __init__(self, rules: List[Tuple[int, Rule]]):
+        self.rules = rules
+        terms = set()
+        for _, rule in rules:
+            terms |= rule.tree.terms()
+        self.matcher = KeywordMatcher(sorted(terms))
+        # 肯定词 -> 含该词的规则位置，只有命中了的词对应的规则需要计算
+        self.by_term: Dict[str, List[int]] = {}
+        for position, (_, rule) in enumerate(rules):
+            for term in rule.positive_terms:
+                self.by_term.setdefault(term, []).append(position)
+        self.always = [position for position, (_, rule) in enumerate(rules) if rule.matches_empty]
+
+    def match(self, normalized: str) -> List[Tuple[int, Rule, List[Hit]]]:
+        """扫描一遍，返回 [(规则下标, 命中的规则, 本次扫描的全部命中)]"""
+        found = self.matcher.scan(normalized)
+        hits: Hits = {}
+        for start, end, term in found:
+            hits.setdefault(term, []).append((start, end))
+        candidates = set(self.always)
+        for term in hits:
+            candidates.update(self.by_term.get(term, ()))
+        return [self.rules[position] + (found,) for position in sorted(candidates)
+                if self.rules[position][1].evaluate(hits)]
+
+
+class RuleSet:
+    """
+    编译后的规则集
+
+    规则按生效范围建分派索引：不限范围的、按平台的、按 (平台, 用户) 的。
+    帖子按 (平台, 用户) 取出生效的规则，分两层扫描：不限用户的规则每个平台编译一次，
+    限定用户（账号、分组）的规则按生效的规则组合编译一次、相同组合的账号共用。
+    """
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self._global: List[int] = []
+        self._by_platform: Dict[str, List[int]] = {}
+        # (平台, 用户) -> 规则下标，平台为空表示不带平台前缀的用户（任意平台）
+        self._by_user: Dict[Tuple[str, str], List[int]] = {}
+        for index, rule in enumerate(rules):
+            if rule.users:
+                for user in rule.users:
+                    self._by_user.setdefault(('', user), []).append(index)
+                    platform, sep, user_id = user.partition(':')
+                    if sep:
+                        self._by_user.setdefault((platform, user_id), []).append(index)
+            elif rule.platforms:
+                for platform in rule.platforms:
+                    self._by_platform.setdefault(platform, []).append(index)
+            else:
+                self._global.append(index)
+        # 平台 -> 不限用户的生效规则；(平台, 用户) -> 限定用户的生效规则（结果缓存）
+        self._platform_dispatch: Dict[str, Tuple[int, ...]] = {}
+        self._user_dispatch: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        # 规则下标组合 -> 编译结果
+        self._compiled: Dict[Tuple[int, ...], _Compiled] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def rules_for(self, platform: str, user_id: str) -> List[Rule]:
+        """对该平台、用户生效的规则（按规则顺序）"""
+        indexes = self._platform_indexes(platform) + self._user_indexes(platform, user_id)
+        return [self.rules[index] for index in sorted(indexes)]
+
+    def _platform_indexes(self, platform: str) -> Tuple[int, ...]:
+        """该平台不限用户的生效规则"""
+        indexes = self._platform_dispatch.get(platform)
+        if indexes is None:
+            indexes = tuple(sorted(self._global + self._by_platform.get(platform, [])))
+            self._platform_dispatch[platform] = indexes
+        return indexes
+
+    def _user_indexes(self, platform: str, user_id: str) -> Tuple[int, ...]:
+        """限定了该用户的生效规则"""
+        key = (platform, user_id)
+        indexes = self._user_dispatch.get(key)
+        if indexes is None:
+            candidates = set(self._by_user.get(key, ()))
+            candidates.update(self._by_user.get(('', user_id), ()))
+            # 同时限定了平台的再按平台过滤
+            indexes = tuple(sorted(index for index in candidates
+                                   if self.rules[index].applies_to(platform, user_id)))
+            self._user_dispatch[key] = indexes
+        return indexes
+
+    def _layers(self, platform: str, user_id: str) -> List[_Compiled]:
+        """该帖子需要扫描的编译结果"""
+        layers = []
+        for indexes in (self._platform_indexes(platform), self._user_indexes(platform, user_id)):
+            if not indexes:
+                continue
+            compiled = self._compiled.get(indexes)
+            if compiled is None:
+                compiled = self._compiled[indexes] = _Compiled(
+                    [(index, self.rules[index]) for index in indexes])
+            layers.append(compiled)
+        return layers
+
+    def match(self, content: str, platform: str = '', user_id: str = '',
+              normalized: Optional[str] = None) -> List[Tuple[Rule, List[Hit]]]:
+        """
+        匹配一条帖子
+
+        Args:
+            normalized: 入库时预先计算的 normalize(content)，为 None 时现算
+
+        Returns:
+            [(命中的规则, 该规则肯定词的命中列表)]，按规则顺序，命中位置对应原文
+        """
+        layers = self._layers(platform, user_id)
+        if not layers:
+            return []
+        offsets = None
+        if normalized is None:
+            normalized, offsets = normalize_with_offsets(content or '')
+        matched = []
+        for compiled in layers:
+            matched.extend(compiled.match(normalized))
+        if not matched:
+            return []
+        if offsets is None:
+            # 命中才需要换算原文位置；预先计算的文本和当前归一化结果不一致时重新匹配
+            fresh, offsets = normalize_with_offsets(content or '')
+            if fresh != normalized:
+                return self.match(content, platform, user_id, fresh)
+        matched.sort(key=lambda item: item[0])
+        return [(rule, [original_span(offsets, start, end) + (term,)
+                        for start, end, term in found if term in rule.positive_terms])
+                for _, rule, found in matched]
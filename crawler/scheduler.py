@@ -0,0 +1,206 @@
+"""
+自适应轮询调度 - 根据发帖频率为每个用户计算下次检查时间
+"""
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from utils.logger import get_logger
+
+
+class UserSchedule:
+    """单个用户的调度状态"""
+
+    def __init__(self, platform: str, user_id: str, base_interval: float, priority: float = 1.0):
+        self.platform = platform
+        self.user_id = user_id
+        self.priority = priority
+        self.interval = base_interval
+        self.avg_gap: Optional[float] = None  # 平均发帖间隔(秒)
+        self.last_post_at: Optional[datetime] = None
+        self.empty_checks = 0  # 连续没有新帖的检查次数
+        self.next_due = 0.0
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.platform, self.user_id)
+
+
+class PollScheduler:
+    """
+    轮询调度器（最小堆）
+
+    每个用户的检查间隔 = 平均发帖间隔 × gap_factor，再按最近活跃情况调整：
+    刚发现新帖时缩短，连续空检查时指数放宽；最后除以优先级并加随机抖动，
+    使检查时间分散开而不是集中在同一时刻。
+    """
+
+    # 检查间隔占平均发帖间隔的比例
+    GAP_FACTOR = 0.25
+    # 发帖间隔的滑动平均系数
+    GAP_ALPHA = 0.3
+    # 发现新帖后间隔缩短的比例
+    ACTIVE_FACTOR = 0.5
+    # 连续空检查时每次放宽的倍数
+    BACKOFF_FACTOR = 1.5
+
+    def __init__(self, min_interval: float = 60, max_interval: float = 3600,
+                 jitter: float = 0.1):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.logger = get_logger('monitor.scheduler')
+        self._users: Dict[Tuple[str, str], UserSchedule] = {}
+        self._heap: List[Tuple[float, int, Tuple[str, str]]] = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._users)
+
+    def sync(self, users: Iterable[Tuple[str, str, float]], base_intervals: Dict[str, float],
+             history=None):
+        """
+        同步监控用户列表
+
+        Args:
+            users: (platform, user_id, priority) 列表
+            base_intervals: 各平台没有历史数据时的默认间隔
+            history: 可选，history(platform, user_id) 返回最近发帖时间列表，用于估算初始频率
+        """
+        now = time.time()
+        wanted = set()
+        for platform, user_id, priority in users:
+            key = (platform, user_id)
+            wanted.add(key)
+            schedule = self._users.get(key)
+            if schedule:
+                schedule.priority = priority
+                continue
+            schedule = UserSchedule(platform, user_id,
+                                    base_intervals.get(platform, self.min_interval), priority)
+            if history:
+                self._seed(schedule, history(platform, user_id))
+            self._users[key] = schedule
+            # 新用户在一个间隔内随机分布，避免启动时同时发起
+            self._push(schedule, now + random.uniform(0, min(schedule.interval, self.min_interval)))
+
+        for key in list(self._users):
+            if key not in wanted:
+                del self._users[key]
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """
+        取出到期的用户
+
+        取出时按当前间隔预先安排下一次，即使本次检查失败也不会丢失调度。
+        """
+        now = now or time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, key = heapq.heappop(self._heap)
+            schedule = self._users.get(key)
+            if schedule is None or schedule.next_due != due_at:
+                continue  # 已删除或已重新安排的旧条目
+            due.append(key)
+            self._push(schedule, now + self._jittered(schedule.interval))
+        return due
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """距离下一个到期用户的秒数，没有用户时返回 None"""
+        now = now or time.time()
+        while self._heap:
+            due_at, _, key = self._heap[0]
+            schedule = self._users.get(key)
+            if schedule is None or schedule.next_due != due_at:
+                heapq.heappop(self._heap)
+                continue
+            return max(0.0, due_at - now)
+        return None
+
+    def due_within(self, seconds: float, now: Optional[float] = None) -> List[Tuple[str, str]]:
+        """未来 seconds 秒内到期的用户"""
+        deadline = (now or time.time()) + seconds
+        return [s.key for s in self._users.values() if s.next_due <= deadline]
+
+    def record_result(self, platform: str, user_id: str, new_count: int,
+                      published: Sequence[datetime] = ()):
+        """
+        根据检查结果重新计算间隔
+
+        Args:
+            new_count: 新帖数量
+            published: 新帖的发布时间
+        """
+        schedule = self._users.get((platform, user_id))
+        if schedule is None:
+            return
+
+        if new_count > 0:
+            schedule.empty_checks = 0
+            self._observe_posts(schedule, published)
+        else:
+            schedule.empty_checks += 1
+
+        schedule.interval = self._compute_interval(schedule)
+        self._push(schedule, time.time() + self._jittered(schedule.interval))
+        self.logger.debug(f"{platform}/{user_id} 下次检查间隔 {schedule.interval:.0f} 秒")
+
+    def stats(self) -> Dict:
+        """调度统计"""
+        intervals = [s.interval for s in self._users.values()]
+        return {
+            'users': len(intervals),
+            'min_interval': min(intervals, default=0),
+            'max_interval': max(intervals, default=0),
+            # 每小时预计请求的用户检查次数
+            'checks_per_hour': sum(3600 / i for i in intervals if i > 0),
+        }
+
+    def _compute_interval(self, schedule: UserSchedule) -> float:
+        """计算检查间隔"""
+        if schedule.avg_gap:
+            interval = schedule.avg_gap * self.GAP_FACTOR
+        else:
+            interval = schedule.interval
+        if schedule.empty_checks == 0:
+            interval *= self.ACTIVE_FACTOR
+        else:
+            interval *= self.BACKOFF_FACTOR ** min(schedule.empty_checks, 10)
+        interval /= max(schedule.priority, 0.1)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _observe_posts(self, schedule: UserSchedule, published: Sequence[datetime]):
+        """用新帖发布时间更新平均发帖间隔"""
+        times = sorted(t for t in published if isinstance(t, datetime))
+        if schedule.last_post_at:
+            times = [t for t in times if t > schedule.last_post_at]
+            times.insert(0, schedule.last_post_at)
+        for earlier, later in zip(times, times[1:]):
+            gap = (later - earlier).total_seconds()
+            if gap <= 0:
+                continue
+            if schedule.avg_gap is None:
+                schedule.avg_gap = gap
+            else:
+                schedule.avg_gap += self.GAP_ALPHA * (gap - schedule.avg_gap)
+        if times:
+            schedule.last_post_at = times[-1]
+
+    def _seed(self, schedule: UserSchedule, published: Sequence[datetime]):
+        """用历史发帖时间估算初始间隔"""
+        if len(published) < 2:
+            return
+        self._observe_posts(schedule, published)
+        schedule.empty_checks = 1
+        schedule.interval = self._compute_interval(schedule)
+
+    def _jittered(self, interval: float) -> float:
+        """加随机抖动"""
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, schedule: UserSchedule, due_at: float):
+        """安排下一次检查（旧的堆条目在取出时丢弃）"""
+        schedule.next_due = due_at
+        heapq.heappush(self._heap, (due_at, next(self._counter), schedule.key))
@@ -0,0 +1,61 @@
+"""
+已见帖子过滤 - 有界、按时间淘汰的整数键集合
+
+帖子是否为新以数据库写入结果为准（首次插入才算新帖，重启后同样正确），
+这里只在内存中记住最近见过的帖子，挡住同一次运行中重复送达的帖子，
+以及写入目标无法给出插入结果时的重复。
+"""
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class SeenFilter:
+    """
+    最近见过的帖子
+
+    键为 "platform_post_id" 的哈希值（整数），值为最后见到的时间。
+    超过 max_size 条或超过 ttl 秒未再见到的记录按最久未见先淘汰，内存有上限。
+
+    Args:
+        max_size: 最多记录的帖子数
+        ttl: 记录保留时间(秒)
+    """
+
+    def __init__(self, max_size: int = 100000, ttl: float = 7 * 86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[int, float]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(platform: str, post_id: str) -> int:
+        return hash(f"{platform}_{post_id}")
+
+    def check_and_add(self, platform: str, post_id: str, now: Optional[float] = None) -> bool:
+        """记录帖子，返回之前是否见过（未过期）"""
+        now = time.monotonic() if now is None else now
+        key = self._key(platform, post_id)
+        seen_at = self._entries.get(key)
+        seen = seen_at is not None and now - seen_at <= self.ttl
+        self._entries[key] = now
+        self._entries.move_to_end(key)
+        self._evict(now)
+        return seen
+
+    def _evict(self, now: float):
+        """淘汰超出容量和过期的记录（按最后见到时间从旧到新）"""
+        entries = self._entries
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        while entries:
+            key, seen_at = next(iter(entries.items()))
+            if now - seen_at <= self.ttl:
+                break
+            entries.popitem(last=False)
+
+    def clear(self):
+        """清空"""
+        self._entries.clear()
@@ -0,0 +1,128 @@
+"""
+HTTP会话池 - 按平台共享 requests.Session 及其连接池
+"""
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from config import config
+from utils.logger import get_logger
+
+
+class SessionPool:
+    """
+    进程级会话池
+
+    每个平台一个 Session，所有爬取任务共用，TCP连接和TLS会话在任务之间复用。
+    爬虫在创建时取得会话后会一直持有，因此使用时间在每次收到响应时更新，
+    而不只是在 get_session 时，正在使用的会话不会被当作空闲关闭。
+    """
+
+    def __init__(self):
+        self.logger = get_logger('crawler.session_pool')
+        self._lock = threading.Lock()
+        self._profiles: Dict[str, Dict] = {}
+        self._sessions: Dict[str, requests.Session] = {}
+        self._last_used: Dict[str, float] = {}
+        self._prewarming: Dict[str, threading.Thread] = {}
+
+    def register(self, platform: str, headers: Dict, prewarm_url: Optional[str] = None):
+        """注册平台默认请求头和预热地址"""
+        with self._lock:
+            self._profiles[platform] = {
+                'headers': dict(headers),
+                'prewarm_url': prewarm_url,
+            }
+
+    def get_session(self, platform: str) -> requests.Session:
+        """获取平台共享会话"""
+        idle_timeout = config.get('http.idle_timeout', 300)
+        with self._lock:
+            session = self._sessions.get(platform)
+            now = time.monotonic()
+            # 空闲过久的连接大概率已被服务端断开，直接重建
+            if session and idle_timeout and now - self._last_used.get(platform, now) > idle_timeout:
+                self.logger.debug(f"{platform} 会话空闲超时，重建连接池")
+                session.close()
+                session = None
+            if session is None:
+                session = self._create_session(platform)
+                self._sessions[platform] = session
+            self._last_used[platform] = now
+            return session
+
+    def prewarm(self, platform: str, connections: int = 1):
+        """
+        后台预热连接
+
+        并发发送 HEAD 请求，让连接池中提前建立好指定数量的 keep-alive 连接。
+        """
+        if not config.get('http.prewarm', True):
+            return
+        profile = self._profiles.get(platform)
+        if not profile or not profile['prewarm_url']:
+            return
+        with self._lock:
+            running = self._prewarming.get(platform)
+            if running and running.is_alive():
+                return
+            thread = threading.Thread(target=self._do_prewarm,
+                                      args=(platform, profile['prewarm_url'], connections),
+                                      name=f'prewarm-{platform}', daemon=True)
+            self._prewarming[platform] = thread
+        thread.start()
+
+    def close_all(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._last_used.clear()
+
+    def _create_session(self, platform: str) -> requests.Session:
+        """创建带连接池的会话（调用方持有锁）"""
+        pool_size = config.get('http.pool_size', 10)
+        session = requests.Session()
+        session.hooks['response'].append(lambda response, **kwargs: self._touch(platform, session))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+        profile = self._profiles.get(platform)
+        if profile:
+            session.headers.update(profile['headers'])
+        if not config.get('http.keep_alive', True):
+            session.headers['Connection'] = 'close'
+        return session
+
+    def _touch(self, platform: str, session: requests.Session):
+        """会话收到响应，记录使用时间（已被替换的旧会话不计）"""
+        with self._lock:
+            if self._sessions.get(platform) is session:
+                self._last_used[platform] = time.monotonic()
+
+    def _do_prewarm(self, platform: str, url: str, connections: int):
+        """执行预热"""
+        session = self.get_session(platform)
+        pool_size = config.get('http.pool_size', 10)
+        count = max(1, min(connections, pool_size))
+        started = time.monotonic()
+
+        def warm():
+            try:
+                session.head(url, timeout=config.get('retry.timeout', 10))
+            except requests.RequestException as e:
+                self.logger.debug(f"{platform} 预热失败: {e}")
+
+        workers = [threading.Thread(target=warm, daemon=True) for _ in range(count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.logger.debug(f"{platform} 预热 {count} 个连接，耗时 {time.monotonic() - started:.2f} 秒")
+
+
+# 全局会话池实例
+session_pool = SessionPool()
@@ -0,0 +1,343 @@
+"""
+多进程分片监控 - 按一致性哈希把监控用户分到多个进程，结果汇总到单个写入线程
+"""
+import bisect
+import hashlib
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from models.database import db
+from config import config
+from utils.logger import get_logger, setup_logger
+from .archive import raw_archive
+from .events import EventLoop, Signal, ThreadEventLoop, Timer
+from .manager import CrawlerManager
+from .metric_alerts import MetricWatcher
+from .monitor import MonitorService
+
+# 分片只负责发现新帖，互动刷新和历史回填留给主进程（互动刷新由 ShardedMonitor 在主进程定时提交）
+SHARD_OVERRIDES = {
+    'metrics.enabled': False,
+    'backfill.auto_resume': False,
+    'keyword_backfill.enabled': False,
+}
+
+
+def _hash(key: str) -> int:
+    """稳定的哈希（内置 hash() 每个进程的种子不同，不能用于分片）"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    一致性哈希环
+
+    每个节点在环上放 replicas 个虚拟点，增减节点时只有相邻区间的用户换分片。
+    """
+
+    def __init__(self, nodes: List[int], replicas: int = 64):
+        self._points = sorted((_hash(f'{node}#{i}'), node)
+                              for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in self._points]
+
+    def node_for(self, key: str) -> int:
+        """key 所属的节点"""
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._points[index][1]
+
+
+def shard_key(platform: str, user_id: str) -> str:
+    """用户的分片键"""
+    return f"{platform}_{user_id}"
+
+
+class QueueStore:
+    """
+    分片进程中代替 db 的写入目标
+
+    用户信息直接转发，帖子攒成批次再发给写入线程，减少进程间消息数。
+
+    写入是异步的，是否新帖和写入前的互动数据由本进程判断：每个用户只属于一个分片，
+    本进程写过的帖子以内存中记下的数据为准（包括还在批次或队列中没写入的），
+    其余的按批从数据库读取。
+
+    Args:
+        max_known: 内存中记下的帖子数上限，超过时淘汰最早的
+    """
+
+    def __init__(self, out_queue, batch_size: int = 200, max_known: int = 50000):
+        self.out_queue = out_queue
+        self.batch_size = batch_size
+        self.max_known = max_known
+        self._posts: List[Dict] = []
+        # (平台, 帖子ID) -> 本进程最近写入的互动数据
+        self._known: 'OrderedDict[tuple, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_user(self, **user):
+        """转发用户信息"""
+        self.out_queue.put(('user', user))
+
+    def add_post(self, **post) -> bool:
+        """缓存帖子，满一批时发送，返回是否新帖"""
+        return self.upsert_posts([post])[0] is None
+
+    def upsert_post(self, **post) -> Optional[Dict]:
+        """缓存帖子，满一批时发送，返回写入前的互动数据（新帖子为 None）"""
+        return self.upsert_posts([post])[0]
+
+    def upsert_posts(self, posts: List[Dict]) -> List[Optional[Dict]]:
+        """
+        缓存一批帖子，满一批时发送
+
+        Returns:
+            每条帖子写入前的互动数据，新帖子为 None（同一批中重复的帖子以前一条为准）
+        """
+        with self._lock:
+            missing = {}
+            for post in posts:
+                if (post['platform'], post['post_id']) not in self._known:
+                    missing.setdefault(post['platform'], []).append(post['post_id'])
+        stored = {(platform, post_id): metrics
+                  for platform, post_ids in missing.items()
+                  for post_id, metrics in db.get_post_metrics(platform, post_ids).items()}
+        now = datetime.now()
+        results = []
+        with self._lock:
+            for post in posts:
+                key = (post['platform'], post['post_id'])
+                previous = self._known.pop(key, None) or stored.pop(key, None)
+                results.append(previous)
+                self._known[key] = {'likes': post.get('likes', 0),
+                                    'comments': post.get('comments', 0),
+                                    'shares': post.get('shares', 0), 'updated_at': now}
+                self._posts.append(post)
+            while len(self._known) > self.max_known:
+                self._known.popitem(last=False)
+            full = len(self._posts) >= self.batch_size
+        if full:
+            self.flush()
+        return results
+
+    def save_keyword_matches(self, matches: List[Dict], source: str = 'live'):
+        """转发匹配记录（先发送缓存的帖子，写入顺序与发现顺序一致）"""
+        self.flush()
+        self.out_queue.put(('matches', matches))
+
+    def flush(self):
+        """发送缓存的帖子"""
+        with self._lock:
+            batch, self._posts = self._posts, []
+        if batch:
+            self.out_queue.put(('posts', batch))
+
+
+def _apply_overrides(overrides: Dict[str, Any]):
+    """在本进程配置上应用覆盖项"""
+    for key, value in dict(overrides, **SHARD_OVERRIDES).items():
+        config.set(key, value)
+
+
+def _shard_main(shard_id: int, shards: int, out_queue, stop_event, replicas: int,
+                overrides: Dict[str, Any]):
+    """分片进程入口：运行自己的事件循环、爬取线程池和监控调度"""
+    logger = setup_logger('')
+    logger.info(f"分片 {shard_id}/{shards} 启动")
+    _apply_overrides(overrides)
+
+    ring = HashRing(list(range(shards)), replicas)
+    loop = ThreadEventLoop()
+    store = QueueStore(out_queue, config.get('monitor.shard_batch', 200),
+                       config.get('monitor.shard_known', 50000))
+    manager = CrawlerManager(loop, store=store)
+    monitor = MonitorService(
+        manager, user_filter=lambda platform, user_id:
+        ring.node_for(shard_key(platform, user_id)) == shard_id)
+    monitor.keyword_matched.connect(lambda result: out_queue.put(('match', result)))
+    monitor.metric_alert.connect(lambda alert: out_queue.put(('metric', alert)))
+    monitor.monitor_status.connect(
+        lambda status: out_queue.put(('status', f"[分片{shard_id}] {status}")))
+
+    def tick():
+        store.flush()
+        if stop_event.is_set():
+            loop.stop()
+
+    def reload_config():
+        # 界面保存的配置（用户、关键词）定期重新读取
+        config.config = config.load_config()
+        _apply_overrides(overrides)
+
+    Timer(loop, tick).start(0.5)
+    Timer(loop, reload_config).start(monitor.RESYNC_SECONDS)
+    monitor.start()
+    try:
+        loop.run_forever()
+    finally:
+        monitor.stop()
+        manager.stop_all()
+        store.flush()
+        raw_archive.close()
+        out_queue.put(('exit', shard_id))
+        logger.info(f"分片 {shard_id} 已退出")
+
+
+class ShardedMonitor:
+    """
+    多进程分片监控（接口与 MonitorService 相同）
+
+    N 个子进程各自按一致性哈希认领一部分监控用户，独立完成请求、解析、
+    关键词匹配；结果通过一个进程队列发回主进程，由单个写入线程批量写库，
+    匹配结果在主进程的事件循环中发出 keyword_matched。
+
+    分片进程不刷新互动数据：传入主进程的 crawler_manager 时，互动刷新在主进程定时提交，
+    刷新结果同样检查互动数据提醒。
+    """
+
+    def __init__(self, loop: EventLoop, processes: int = 2, replicas: int = 64,
+                 overrides: Optional[Dict[str, Any]] = None, crawler_manager=None):
+        self.loop = loop
+        self.crawler_manager = crawler_manager
+        self.processes = max(1, processes)
+        self.replicas = replicas
+        # 子进程从配置文件读取配置，本进程内临时修改的配置项需要显式传入
+        self.overrides = dict(overrides or {})
+        self.logger = get_logger('monitor.shard')
+        # 信号
+        self.keyword_matched = Signal(loop)  # 关键词匹配信号 {post, keywords}
+        self.monitor_status = Signal(loop)  # 监控状态信号
+        self.matches_saved = Signal(loop)  # 匹配记录已写入（本批条数）
+        self.metric_alert = Signal(loop)  # 互动数据提醒 {post, rule, metric, previous, value}
+        self.is_running = False
+        self._ctx = multiprocessing.get_context('spawn')
+        self._queue = None
+        self._stop_event = None
+        self._workers: List = []
+        self._writer: Optional[threading.Thread] = None
+        self._stats = {'posts': 0, 'users': 0, 'matches': 0}
+        # 互动数据刷新（主进程）
+        self.metrics_timer = Timer(loop, self._refresh_metrics)
+        self._metric_watcher = MetricWatcher(self.logger)
+        if crawler_manager is not None:
+            crawler_manager.metrics_updated.connect(self._on_metrics_updated)
+
+    def start(self):
+        """启动分片进程和写入线程"""
+        if self.is_running:
+            self.logger.warning("监控已在运行中")
+            return
+        self._queue = self._ctx.Queue()
+        self._stop_event = self._ctx.Event()
+        self._workers = [
+            self._ctx.Process(target=_shard_main, name=f'monitor-shard-{i}', daemon=True,
+                              args=(i, self.processes, self._queue, self._stop_event,
+                                    self.replicas, self.overrides))
+            for i in range(self.processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._writer = threading.Thread(target=self._write_loop, name='monitor-writer',
+                                        daemon=True)
+        self._writer.start()
+        if self.crawler_manager is not None:
+            self.metrics_timer.start(config.get('metrics.interval', 60))
+        self.is_running = True
+        self.logger.info(f"分片监控已启动，进程数: {self.processes}")
+        self.monitor_status.emit(f"监控运行中（{self.processes} 个进程）...")
+
+    def stop(self, timeout: float = 10.0):
+        """停止分片进程，写完剩余结果后返回"""
+        if not self.is_running:
+            return
+        self.metrics_timer.stop()
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                self.logger.warning(f"{worker.name} 未按时退出，强制结束")
+                worker.terminate()
+        self._queue.put(None)
+        self._writer.join(timeout)
+        self.is_running = False
+        self.logger.info(f"分片监控已停止，写入 {self._stats['posts']} 条帖子")
+        self.monitor_status.emit("监控已停止")
+
+    def set_interval(self, seconds: int):
+        """设置最短监控间隔（分片进程重新读取配置后生效）"""
+        config.set('monitor.interval', seconds)
+        config.save_config()
+
+    def stats(self) -> Dict:
+        """写入统计"""
+        return dict(self._stats, processes=self.processes,
+                    alive=sum(1 for worker in self._workers if worker.is_alive()))
+
+    def _refresh_metrics(self):
+        """提交一轮互动数据刷新"""
+        if config.get('metrics.enabled', True) and config.get('monitor.enabled', False):
+            self.crawler_manager.refresh_metrics()
+
+    def _on_metrics_updated(self, updates: list):
+        """互动数据刷新写入后检查提醒"""
+        for alert in self._metric_watcher.check_updates(updates):
+            self.logger.info(f"互动数据提醒: {alert['post'].get('username')} - {alert['rule']} "
+                             f"{alert['metric']} {alert['previous']} -> {alert['value']}")
+            self.metric_alert.emit(alert)
+
+    def _write_loop(self):
+        """单写入线程：合并队列中的消息后批量写库"""
+        while True:
+            messages = [self._queue.get()]
+            # 把已经到达的消息一起取出，合并成一次事务
+            while len(messages) < 100:
+                try:
+                    messages.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._handle(messages):
+                return
+
+    def _handle(self, messages: List) -> bool:
+        """处理一批消息，收到结束标记时返回 False"""
+        posts = []
+        matches = []
+        running = True
+        for message in messages:
+            if message is None:
+                running = False
+                continue
+            kind, payload = message
+            if kind == 'posts':
+                posts.extend(payload)
+            elif kind == 'user':
+                self._write(db.add_user, **payload)
+                self._stats['users'] += 1
+            elif kind == 'matches':
+                matches.extend(payload)
+            elif kind == 'match':
+                self._stats['matches'] += 1
+                self.keyword_matched.emit(payload)
+            elif kind == 'metric':
+                self.metric_alert.emit(payload)
+            elif kind == 'status':
+                self.logger.debug(payload)
+            elif kind == 'exit':
+                self.logger.info(f"分片 {payload} 已退出")
+        if posts:
+            self._stats['posts'] += self._write(db.add_posts, posts) or 0
+        if matches:
+            saved = self._write(db.save_keyword_matches, matches)
+            if saved:
+                self.matches_saved.emit(saved)
+        return running
+
+    def _write(self, func: Callable, *args, **kwargs):
+        """写库，异常只记录，不中断写入线程"""
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            self.logger.error(f"写入失败: {e}")
+            return None
@@ -2,26 +2,36 @@
 微博爬虫
 使用微博移动端API进行爬取
 """
-import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-import json
-import re
 from .base import BaseCrawler
+from .archive import raw_archive
+from .parser import decode_response, iter_mblogs, parse_mblog, parse_time
+from .resilience import CrawlerRequestError
+from .session_pool import session_pool
+
+# 注册共享会话的请求头和预热地址
+session_pool.register('weibo', headers={
+    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15',
+    'Referer': 'https://m.weibo.cn/',
+    'Accept': 'application/json',
+}, prewarm_url='https://m.weibo.cn/')
 
 class WeiboCrawler(BaseCrawler):
     """微博爬虫"""
     
+    supports_probe = True
+    supports_metrics = True
+    supports_backfill = True
+    
+    # uid -> 微博列表 containerid（进程内共享，避免每次爬取都多一次请求）
+    _container_ids: Dict[str, str] = {}
+    
     def __init__(self):
         super().__init__('weibo')
         self.base_url = 'https://m.weibo.cn'
         self.api_url = 'https://m.weibo.cn/api'
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15',
-            'Referer': 'https://m.weibo.cn/',
-            'Accept': 'application/json',
-        })
+        self.session = session_pool.get_session(self.platform)
     
     def get_user_info(self, user_id: str) -> Optional[Dict]:
         """获取用户信息"""
@@ -40,12 +50,11 @@ class WeiboCrawler(BaseCrawler):
                 'value': user_id,
             }
             
-            response = self.session.get(url, params=params, timeout=10)
-            self.logger.info(f"获取用户信息: {response.json()}")
-            self.logger.info(f"获取状态码为: {response.status_code}")
-            
-            data = response.json()
-            self.logger.info(f"获取数据为: {data}")
+            response = self.get(url, params=params)
+            self.logger.debug(f"获取用户信息 {user_id}: HTTP {response.status_code}, {len(response.content)} 字节")
+            data = decode_response(response)
+            raw_archive.append(self.platform, 'user_info', user_id, response.content)
+            self._remember_container_id(user_id, data)
             
             user_info = data['data']['userInfo']
             return {
@@ -81,34 +90,16 @@ class WeiboCrawler(BaseCrawler):
             page = 1
             
             while len(posts) < max_count:
-                url = f'{self.api_url}/container/getIndex'
-                params = {
-                    'type': 'uid',
-                    'value': user_id,
-                    'containerid': container_id,
-                    'page': page,
-                }
-                
-                response = self.session.get(url, params=params, timeout=10)
-                if response.status_code != 200:
-                    break
-                
-                data = response.json()
-                if data.get('ok') != 1:
+                try:
+                    mblogs = self._fetch_page(user_id, container_id, page)
+                except CrawlerRequestError as e:
+                    # 翻页中途失败时保留已获取的帖子
+                    self.logger.error(f"获取第 {page} 页失败: {e}")
                     break
-                
-                cards = data['data'].get('cards', [])
-                if not cards:
+                if not mblogs:
                     break
                 
-                for card in cards:
-                    if card.get('card_type') != 9:  # 9是微博卡片
-                        continue
-                    
-                    mblog = card.get('mblog')
-                    if not mblog:
-                        continue
-                    
+                for mblog in mblogs:
                     post = self._parse_post(mblog)
                     if post:
                         posts.append(post)
@@ -125,6 +116,121 @@ class WeiboCrawler(BaseCrawler):
             self.logger.error(f"获取用户帖子异常: {e}")
             return []
     
+    def probe_latest(self, user_id: str) -> Optional[Dict]:
+        """
+        轻量探测：只请求第一页，返回最新一条非置顶帖子
+        
+        containerid 已缓存时只需一次请求。
+        
+        Raises:
+            CrawlerRequestError: 请求失败
+        """
+        container_id = self._get_container_id(user_id)
+        if not container_id:
+            raise CrawlerRequestError(f"获取containerid失败: {user_id}")
+        
+        mblogs = self._fetch_page(user_id, container_id, 1)
+        if mblogs is None:
+            raise CrawlerRequestError(f"探测失败: {user_id}")
+        
+        for mblog in mblogs:
+            # 置顶帖不代表最新发布
+            if mblog.get('isTop') == 1 or mblog.get('mblogtype') == 2:
+                continue
+            return self._parse_post(mblog)
+        return None
+    
+    def get_posts_page(self, user_id: str, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按游标获取一页帖子（历史回填用）
+        
+        游标优先用接口返回的 since_id，新帖插入不会让后面的页错位；没有时退回页码。
+        
+        Raises:
+            CrawlerRequestError: 请求失败
+        """
+        container_id = self._get_container_id(user_id)
+        if not container_id:
+            raise CrawlerRequestError(f"获取containerid失败: {user_id}")
+        
+        page = None
+        if cursor and cursor.startswith('since_id:'):
+            params = {'since_id': cursor[len('since_id:'):]}
+        else:
+            page = int(cursor[len('page:'):]) if cursor else 1
+            params = {'page': page}
+        
+        data = self._fetch_index(user_id, container_id, end_ok=bool(cursor), **params)
+        if data is None:
+            raise CrawlerRequestError(f"获取帖子页失败: {user_id} {cursor or 'page:1'}")
+        
+        cards = data.get('cards', [])
+        posts = [post for post in map(self._parse_post, iter_mblogs(cards)) if post]
+        if not cards:
+            return posts, None
+        
+        since_id = (data.get('cardlistInfo') or {}).get('since_id')
+        if since_id:
+            return posts, f'since_id:{since_id}'
+        return posts, (f'page:{page + 1}' if page is not None else None)
+    
+    def _fetch_page(self, user_id: str, container_id: str, page: int) -> Optional[List[Dict]]:
+        """获取一页微博的 mblog 列表，失败或没有更多时返回 None / 空列表"""
+        data = self._fetch_index(user_id, container_id, page=page)
+        if data is None:
+            return None
+        return list(iter_mblogs(data.get('cards', [])))
+    
+    def _fetch_index(self, user_id: str, container_id: str, end_ok: bool = False,
+                     **params) -> Optional[Dict]:
+        """
+        请求微博列表接口，返回 data 部分，失败时返回 None
+
+        Args:
+            end_ok: 翻页请求（不是第一页）时为 True，ok: 0 且没有卡片视为没有更多帖子
+        """
+        url = f'{self.api_url}/container/getIndex'
+        params.update({
+            'type': 'uid',
+            'value': user_id,
+            'containerid': container_id,
+        })
+        
+        response = self.get(url, params=params)
+        if response.status_code != 200:
+            return None
+        
+        data = decode_response(response)
+        if data.get('ok') != 1:
+            # 翻过最后一页时接口返回 ok: 0 且没有卡片，视为没有更多帖子（历史回填到此完成）；
+            # 第一页的 ok: 0 可能只是暂时出错，不能当作没有帖子
+            if end_ok and data.get('ok') == 0 and not (data.get('data') or {}).get('cards'):
+                return {}
+            self.logger.warning(f"微博列表接口返回错误: {user_id} {params} {data.get('msg')}")
+            return None
+        raw_archive.append(self.platform, 'posts_page', user_id, response.content)
+        return data.get('data') or {}
+    
+    def get_post_metrics(self, post_id: str) -> Optional[Dict]:
+        """
+        获取单条微博的互动数据（statuses/show 只返回一条微博，比翻列表页小得多）
+        
+        Raises:
+            CrawlerRequestError: 请求失败
+        """
+        response = self.get(f'{self.base_url}/statuses/show', params={'id': post_id})
+        if response.status_code != 200:
+            return None
+        data = decode_response(response)
+        mblog = data.get('data') if data.get('ok') == 1 else None
+        if not mblog:
+            return None
+        return {
+            'likes': mblog.get('attitudes_count', 0),
+            'comments': mblog.get('comments_count', 0),
+            'shares': mblog.get('reposts_count', 0),
+        }
+    
     def _get_uid_by_name(self, username: str) -> Optional[str]:
         """通过用户名获取UID"""
         try:
@@ -134,11 +240,11 @@ class WeiboCrawler(BaseCrawler):
                 'containerid': '100103type=3&q=' + username,
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.get(url, params=params)
             if response.status_code != 200:
                 return None
             
-            data = response.json()
+            data = decode_response(response)
             cards = data.get('data', {}).get('cards', [])
             
             for card in cards:
@@ -157,6 +263,9 @@ class WeiboCrawler(BaseCrawler):
     
     def _get_container_id(self, user_id: str) -> Optional[str]:
         """获取containerid"""
+        cached = self._container_ids.get(user_id)
+        if cached:
+            return cached
         try:
             url = f'{self.api_url}/container/getIndex'
             params = {
@@ -164,89 +273,34 @@ class WeiboCrawler(BaseCrawler):
                 'value': user_id,
             }
             
-            response = self.session.get(url, params=params, timeout=10)
+            response = self.get(url, params=params)
             if response.status_code != 200:
                 return None
             
-            data = response.json()
-            tabs = data.get('data', {}).get('tabsInfo', {}).get('tabs', [])
-            
-            for tab in tabs:
-                if tab.get('tab_type') == 'weibo':
-                    return tab.get('containerid')
-            
-            return None
+            data = decode_response(response)
+            return self._remember_container_id(user_id, data)
             
         except Exception as e:
             self.logger.error(f"获取containerid异常: {e}")
             return None
     
+    def _remember_container_id(self, user_id: str, data: Dict) -> Optional[str]:
+        """从用户主页响应中取出微博列表 containerid 并缓存"""
+        tabs = (data.get('data') or {}).get('tabsInfo', {}).get('tabs', [])
+        for tab in tabs:
+            if tab.get('tab_type') == 'weibo' and tab.get('containerid'):
+                self._container_ids[user_id] = tab['containerid']
+                return tab['containerid']
+        return None
+    
     def _parse_post(self, mblog: Dict) -> Optional[Dict]:
         """解析帖子"""
         try:
-            # 提取文本内容
-            text = mblog.get('text', '')
-            # 移除HTML标签
-            text = re.sub(r'<[^>]+>', '', text)
-            
-            # 提取图片
-            images = []
-            pics = mblog.get('pics', [])
-            for pic in pics:
-                images.append(pic.get('large', {}).get('url', ''))
-            
-            # 提取视频
-            videos = []
-            page_info = mblog.get('page_info')
-            if page_info and page_info.get('type') == 'video':
-                media_info = page_info.get('media_info', {})
-                video_url = media_info.get('stream_url_hd') or media_info.get('stream_url')
-                if video_url:
-                    videos.append(video_url)
-            
-            # 发布时间
-            created_at = mblog.get('created_at', '')
-            published_at = self._parse_time(created_at)
-            
-            return {
-                'post_id': str(mblog.get('id', '')),
-                'content': text,
-                'images': json.dumps(images) if images else None,
-                'videos': json.dumps(videos) if videos else None,
-                'likes': mblog.get('attitudes_count', 0),
-                'comments': mblog.get('comments_count', 0),
-                'shares': mblog.get('reposts_count', 0),
-                'post_url': f'https://m.weibo.cn/detail/{mblog.get("id")}',
-                'published_at': published_at,
-            }
-            
+            return parse_mblog(mblog)
         except Exception as e:
             self.logger.error(f"解析帖子异常: {e}")
             return None
     
     def _parse_time(self, time_str: str) -> datetime:
         """解析时间"""
-        try:
-            # 处理相对时间
-            if '刚刚' in time_str:
-                return datetime.now()
-            elif '分钟前' in time_str:
-                minutes = int(re.search(r'(\d+)', time_str).group(1))
-                return datetime.now() - timedelta(minutes=minutes)
-            elif '小时前' in time_str:
-                hours = int(re.search(r'(\d+)', time_str).group(1))
-                return datetime.now() - timedelta(hours=hours)
-            elif '今天' in time_str:
-                time_part = re.search(r'(\d{2}:\d{2})', time_str).group(1)
-                return datetime.strptime(f'{datetime.now().date()} {time_part}', '%Y-%m-%d %H:%M')
-            elif '昨天' in time_str:
-                time_part = re.search(r'(\d{2}:\d{2})', time_str).group(1)
-                yesterday = datetime.now().date() - timedelta(days=1)
-                return datetime.strptime(f'{yesterday} {time_part}', '%Y-%m-%d %H:%M')
-            else:
-                # 尝试解析完整日期
-                return datetime.strptime(time_str, '%a %b %d %H:%M:%S %z %Y')
-        except:
-            return datetime.now()
-
-from datetime import timedelta
+        return parse_time(time_str)
@@ -0,0 +1,263 @@
+"""
+工作线程池 - 固定大小、可复用的爬取任务执行器
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from utils.logger import get_logger
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+
+# 任务优先级类别
+PRIORITY_INTERACTIVE = 'interactive'  # 用户手动发起
+PRIORITY_MONITOR = 'monitor'  # 监控轮询
+PRIORITY_BACKFILL = 'backfill'  # 历史回填
+PRIORITY_METRICS = 'metrics'  # 互动数据刷新
+
+# 后台类别的默认调度权重（交互任务总是优先，不参与加权）
+DEFAULT_WEIGHTS = {
+    PRIORITY_MONITOR: 4,
+    PRIORITY_BACKFILL: 1,
+    PRIORITY_METRICS: 1,
+}
+
+
+class CrawlJob:
+    """
+    爬取任务
+
+    Args:
+        on_skipped: 任务在排队中被取消、没有执行 target 就丢弃时调用（在线程池的锁内调用，
+            应当很快返回），便于任务的所有者做收尾
+    """
+
+    def __init__(self, platform: str, user_id: str, target: Callable[[], None],
+                 max_posts: int = 50, priority: str = PRIORITY_MONITOR,
+                 on_skipped: Optional[Callable[[], None]] = None):
+        self.platform = platform
+        self.user_id = user_id
+        self.max_posts = max_posts
+        self.priority = priority
+        self.key = f"{platform}_{user_id}"
+        self.target = target
+        self.on_skipped = on_skipped
+        self.status = JOB_PENDING
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """取消任务（排队中的直接丢弃，运行中的由任务自行检查后退出）"""
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        """是否已取消"""
+        return self._cancelled.is_set()
+
+    def _skip(self):
+        """排队中被取消，不执行 target 直接结束"""
+        self.status = JOB_CANCELLED
+        if self.on_skipped is not None:
+            self.on_skipped()
+
+    @property
+    def is_active(self) -> bool:
+        """排队中或运行中"""
+        return self.status in (JOB_PENDING, JOB_RUNNING)
+
+    @property
+    def wait_time(self) -> float:
+        """排队等待时间(秒)"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.created_at
+
+
+class WorkerPool:
+    """
+    固定大小的工作线程池（带优先级类别）
+
+    每个优先级类别一个队列，由 size 个常驻线程取出执行：
+    - 交互任务总是最先执行，并为其预留 reserved 个线程，后台任务最多占用
+      size - reserved 个线程，因此后台队列再满，手动任务也能马上开始；
+    - 后台类别之间按权重做加权公平调度（stride 调度），低权重的类别也不会饿死；
+    - 每个平台同时运行的任务数不超过 platform_limits，交互任务可额外多用 reserved 个，
+      受限平台的任务留在队列中，不会阻塞其他平台。
+    """
+
+    def __init__(self, size: int = 4, platform_limits: Optional[Dict[str, int]] = None,
+                 name: str = 'crawler', weights: Optional[Dict[str, float]] = None,
+                 reserved: int = 1):
+        self.size = max(1, size)
+        self.platform_limits = dict(platform_limits or {})
+        self.name = name
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.reserved = min(max(0, reserved), self.size - 1)
+        self.logger = get_logger('crawler.pool')
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, deque] = {PRIORITY_INTERACTIVE: deque()}
+        self._queues.update((priority, deque()) for priority in self.weights)
+        # 各后台类别的虚拟时间，每执行一个任务前进 1/权重，取最小者执行
+        self._pass: Dict[str, float] = {priority: 0.0 for priority in self.weights}
+        self._vtime = 0.0
+        self._running: Dict[str, int] = {}
+        self._active = 0
+        self._active_by_priority: Dict[str, int] = {priority: 0 for priority in self._queues}
+        self._workers: List[threading.Thread] = []
+        self._shutdown = False
+        # 最近完成任务的等待时间，用于统计
+        self._recent_waits = deque(maxlen=100)
+
+    def submit(self, job: CrawlJob):
+        """提交任务"""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("线程池已关闭")
+            self._ensure_workers()
+            self._enqueue(job)
+            self._cond.notify_all()
+
+    def promote(self, job: CrawlJob, priority: str) -> bool:
+        """提升排队中任务的优先级，任务已开始或不在队列中时只修改属性"""
+        with self._cond:
+            queue = self._queues.get(job.priority)
+            if queue is not None and job in queue:
+                queue.remove(job)
+                job.priority = priority
+                self._enqueue(job)
+                self._cond.notify_all()
+                return True
+            job.priority = priority
+            return False
+
+    def cancel_pending(self, key: Optional[str] = None) -> int:
+        """取消排队中的任务，key 为空时取消全部"""
+        with self._cond:
+            removed = 0
+            for queue in self._queues.values():
+                for job in [job for job in queue if key is None or job.key == key]:
+                    queue.remove(job)
+                    job.cancel()
+                    job._skip()
+                    removed += 1
+            return removed
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """关闭线程池，等待运行中的任务结束"""
+        self.cancel_pending()
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in workers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            worker.join(remaining)
+
+    def stats(self) -> Dict:
+        """队列长度、活跃线程数、等待时间"""
+        with self._cond:
+            now = time.monotonic()
+            pending_waits = [now - job.created_at
+                             for queue in self._queues.values() for job in queue]
+            recent = list(self._recent_waits)
+            return {
+                'queued': len(pending_waits),
+                'queued_by_priority': {p: len(q) for p, q in self._queues.items()},
+                'active': self._active,
+                'active_by_priority': dict(self._active_by_priority),
+                'workers': self.size,
+                'running_by_platform': dict(self._running),
+                'max_wait': max(pending_waits, default=0.0),
+                'avg_wait': sum(recent) / len(recent) if recent else 0.0,
+            }
+
+    def _ensure_workers(self):
+        """按需启动常驻线程（调用方持有锁）"""
+        while len(self._workers) < self.size:
+            worker = threading.Thread(target=self._worker_loop,
+                                      name=f'{self.name}-worker-{len(self._workers) + 1}',
+                                      daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _enqueue(self, job: CrawlJob):
+        """按优先级入队（调用方持有锁）"""
+        if job.priority not in self._queues:
+            job.priority = PRIORITY_MONITOR
+        queue = self._queues[job.priority]
+        # 空闲后重新有任务的类别从当前虚拟时间开始，不能用攒下的额度插队
+        if not queue and job.priority in self._pass:
+            self._pass[job.priority] = max(self._pass[job.priority], self._vtime)
+        queue.append(job)
+
+    def _take(self, priority: str, extra: int = 0) -> Optional[CrawlJob]:
+        """取出该类别中第一个所属平台未达并发上限的任务（调用方持有锁）"""
+        queue = self._queues[priority]
+        for job in queue:
+            limit = self.platform_limits.get(job.platform)
+            if limit is None or self._running.get(job.platform, 0) < limit + extra:
+                queue.remove(job)
+                return job
+        return None
+
+    def _next_job(self) -> Optional[CrawlJob]:
+        """按优先级选出下一个任务（调用方持有锁）"""
+        job = self._take(PRIORITY_INTERACTIVE, extra=self.reserved)
+        if job is not None:
+            return job
+
+        background = self._active - self._active_by_priority[PRIORITY_INTERACTIVE]
+        if background >= self.size - self.reserved:
+            return None
+        for priority in sorted((p for p in self._pass if self._queues[p]),
+                               key=lambda p: self._pass[p]):
+            job = self._take(priority)
+            if job is not None:
+                self._vtime = self._pass[priority]
+                self._pass[priority] += 1.0 / max(self.weights[priority], 0.01)
+                return job
+        return None
+
+    def _worker_loop(self):
+        """工作线程主循环"""
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if job is None:
+                    return
+                if job.is_cancelled():
+                    job._skip()
+                    continue
+                priority = job.priority
+                self._running[job.platform] = self._running.get(job.platform, 0) + 1
+                self._active += 1
+                self._active_by_priority[priority] += 1
+                job.status = JOB_RUNNING
+                job.started_at = time.monotonic()
+                self._recent_waits.append(job.wait_time)
+
+            try:
+                job.target()
+            except Exception as e:
+                self.logger.error(f"任务异常 {job.key}: {e}")
+            finally:
+                with self._cond:
+                    self._running[job.platform] -= 1
+                    self._active -= 1
+                    self._active_by_priority[priority] -= 1
+                    job.finished_at = time.monotonic()
+                    job.status = JOB_CANCELLED if job.is_cancelled() else JOB_DONE
+                    # 名额释放后，可能有受限的任务可以执行了
+                    self._cond.notify_all()
@@ -0,0 +1,124 @@
+"""
+无界面守护进程
+不依赖 PyQt，直接运行爬取/调度/关键词匹配核心，适合在没有显示器的服务器上跑多个监控进程
+
+用法: python -m daemon [--interval 60] [--processes 4] [--output matches.jsonl] [--duration 3600]
+      python -m daemon --enqueue weibo:1234567890 douyin:abc   # 加入持久化任务队列
+      python -m daemon --worker   # 从任务队列认领并执行，可在多台机器上同时运行
+监控用户、关键词等配置与图形界面共用 config/user_config.json
+"""
+import sys
+import os
+import json
+import signal
+import logging
+import argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawler.archive import raw_archive
+from crawler.events import ThreadEventLoop
+from crawler.manager import CrawlerManager
+from crawler.job_queue import JobWorker, enqueue
+from crawler.monitor import MonitorService
+from crawler.sharding import ShardedMonitor
+from config import config
+from utils.logger import setup_logger
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='无界面监控守护进程')
+    parser.add_argument('--interval', type=int, help='最短监控间隔(秒)，默认使用配置')
+    parser.add_argument('--processes', type=int, help='监控进程数，大于1时按用户分片，默认使用配置')
+    parser.add_argument('--worker', action='store_true', help='作为任务队列工作进程运行，不做监控')
+    parser.add_argument('--enqueue', nargs='+', metavar='PLATFORM:USER_ID',
+                        help='把用户加入任务队列后退出')
+    parser.add_argument('--output', help='匹配结果追加写入的 JSONL 文件')
+    parser.add_argument('--duration', type=float, help='运行指定秒数后退出，默认一直运行')
+    parser.add_argument('--no-metrics', action='store_true', help='不刷新已有帖子的互动数据')
+    parser.add_argument('--no-backfill', action='store_true', help='不继续未完成的历史回填')
+    parser.add_argument('--log-level', default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='日志级别')
+    args = parser.parse_args()
+
+    logger = setup_logger('', getattr(logging, args.log_level))
+
+    if args.enqueue:
+        targets = []
+        for item in args.enqueue:
+            platform, _, user_id = item.partition(':')
+            if not user_id:
+                parser.error(f"格式应为 PLATFORM:USER_ID: {item}")
+            targets.append({'platform': platform, 'user_id': user_id})
+        logger.info(f"加入 {enqueue(targets)} 个任务，{len(targets)} 个用户")
+        return 0
+
+    # 只修改本进程内的配置，不写回配置文件
+    overrides = {'monitor.enabled': True}
+    if args.interval:
+        overrides['monitor.interval'] = args.interval
+    if args.no_metrics:
+        overrides['metrics.enabled'] = False
+    if args.no_backfill or args.worker:
+        # 多个工作进程共用数据库时，回填由图形界面或单独的守护进程负责
+        overrides['backfill.auto_resume'] = False
+    if args.worker:
+        overrides['keyword_backfill.enabled'] = False
+    for key, value in overrides.items():
+        config.set(key, value)
+
+    loop = ThreadEventLoop()
+    manager = CrawlerManager(loop)
+    processes = args.processes or config.get('monitor.processes', 1)
+    if args.worker:
+        monitor = JobWorker(manager)
+    elif processes > 1:
+        monitor = ShardedMonitor(loop, processes, overrides=overrides, crawler_manager=manager)
+    else:
+        monitor = MonitorService(manager)
+
+    output = open(args.output, 'a', encoding='utf-8') if args.output else None
+
+    def on_match(result):
+        post = result['post']
+        logger.info(f"关键词匹配 [{post.get('platform')}] {post.get('username')}: "
+                    f"{result['keywords']} {post.get('post_url', '')}")
+        if output:
+            output.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+            output.flush()
+
+    def on_metric_alert(alert):
+        post = alert['post']
+        logger.info(f"互动数据提醒 [{post.get('platform')}] {post.get('username')}: "
+                    f"{alert['rule']} {alert['metric']} {alert['previous']} -> {alert['value']} "
+                    f"{post.get('post_url', '')}")
+        if output:
+            output.write(json.dumps(alert, ensure_ascii=False, default=str) + '\n')
+            output.flush()
+
+    if args.worker:
+        monitor.job_done.connect(lambda job, ok, message: logger.info(
+            f"任务 {job['platform']}:{job['user_id']} {'完成' if ok else '失败'}: {message}"))
+    else:
+        monitor.keyword_matched.connect(on_match)
+        monitor.metric_alert.connect(on_metric_alert)
+        monitor.monitor_status.connect(logger.info)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: loop.stop())
+
+    monitor.start()
+    try:
+        loop.run_forever(timeout=args.duration)
+    finally:
+        monitor.stop()
+        manager.stop_all()
+        raw_archive.close()
+        if output:
+            output.close()
+        logger.info("守护进程已退出")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
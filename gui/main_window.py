@@ -4,15 +4,21 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QTabWidget, QStatusBar, QMessageBox, QDialog,
                              QLabel, QPushButton, QTextEdit, QDialogButtonBox,
-                             QSystemTrayIcon, QMenu, QAction)
+                             QSystemTrayIcon, QMenu, QAction, QApplication, QStyle)
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
 from .post_list import PostListWidget
 from .config_panel import ConfigPanel
 from .task_panel import TaskPanel
 from .monitor_panel import MonitorPanel
+from .qt_loop import QtEventLoop
+from crawler.archive import raw_archive
 from crawler.manager import CrawlerManager
+from crawler.metric_alerts import METRIC_NAMES
 from crawler.monitor import MonitorService
+from crawler.notifier import NotificationQueue
+from crawler.sharding import ShardedMonitor
+from crawler.proxy_pool import proxy_pool
 from models.database import db
 from config import config
 from utils.logger import get_logger
@@ -24,9 +30,22 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.logger = get_logger('gui')
-        self.crawler_manager = CrawlerManager()
-        self.monitor_service = MonitorService(self.crawler_manager)
+        # 爬取/监控核心不依赖 Qt，回调经 QtEventLoop 在界面线程执行
+        self.event_loop = QtEventLoop()
+        self.crawler_manager = CrawlerManager(self.event_loop)
+        processes = config.get('monitor.processes', 1)
+        if processes > 1:
+            # 监控的请求、解析和匹配放到子进程，界面进程只负责写库和显示
+            self.monitor_service = ShardedMonitor(self.event_loop, processes,
+                                                  crawler_manager=self.crawler_manager)
+        else:
+            self.monitor_service = MonitorService(self.crawler_manager)
+        # 匹配通知先排队、限流和汇总，再以托盘消息显示，不阻塞界面
+        self.notifications = NotificationQueue.from_config(self.event_loop, config)
+        self._notification_dialog = None
+        self._last_notification = None
         self.init_ui()
+        self.init_tray()
         self.load_data()
         self.setup_monitor()
         
@@ -76,6 +95,20 @@ class MainWindow(QMainWindow):
         self.refresh_timer.timeout.connect(self.auto_refresh)
         self.refresh_timer.start(5000)  # 5秒刷新一次
     
+    def init_tray(self):
+        """初始化托盘图标（系统不支持托盘时为 None，通知改用非模态窗口）"""
+        self.tray_icon = None
+        if not QSystemTrayIcon.isSystemTrayAvailable():
+            return
+        icon = self.windowIcon()
+        if icon.isNull():
+            icon = self.style().standardIcon(QStyle.SP_MessageBoxInformation)
+        self.tray_icon = QSystemTrayIcon(icon, self)
+        self.tray_icon.setToolTip(self.windowTitle())
+        self.tray_icon.messageClicked.connect(self.show_last_notification)
+        self.tray_icon.activated.connect(lambda reason: self.showNormal() or self.activateWindow())
+        self.tray_icon.show()
+    
     def connect_signals(self):
         """连接信号"""
         # 任务面板信号
@@ -90,6 +123,7 @@ class MainWindow(QMainWindow):
         # 监控面板信号
         self.monitor_panel.monitor_started.connect(self.on_monitor_started)
         self.monitor_panel.monitor_stopped.connect(self.on_monitor_stopped)
+        self.monitor_panel.keywords_changed.connect(self.on_keywords_changed)
     
     def load_data(self):
         """加载数据"""
@@ -103,7 +137,10 @@ class MainWindow(QMainWindow):
         
         # 更新状态栏
         post_count = db.get_post_count()
-        self.status_bar.showMessage(f"共 {post_count} 条帖子")
+        stats = self.crawler_manager.stats()
+        self.status_bar.showMessage(
+            f"共 {post_count} 条帖子 | 爬取队列 {stats['queued']} | "
+            f"运行中 {stats['active']}/{stats['workers']} | 平均等待 {stats['avg_wait']:.1f} 秒")
     
     def on_crawler_started(self, platform: str, user_id: str):
         """爬虫启动"""
@@ -130,6 +167,7 @@ class MainWindow(QMainWindow):
     
     def on_config_saved(self):
         """配置已保存"""
+        proxy_pool.reload()
         self.status_bar.showMessage("配置已保存")
     
     def setup_monitor(self):
@@ -137,6 +175,9 @@ class MainWindow(QMainWindow):
         # 连接监控服务信号
         self.monitor_service.keyword_matched.connect(self.on_keyword_matched)
         self.monitor_service.monitor_status.connect(self.monitor_panel.update_status)
+        self.monitor_service.matches_saved.connect(self.monitor_panel.on_matches_saved)
+        self.monitor_service.metric_alert.connect(self.on_metric_alert)
+        self.notifications.notify.connect(self.on_notification)
     
     def on_monitor_started(self):
         """监控启动"""
@@ -150,6 +191,31 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("监控已停止")
         self.logger.info("监控服务已停止")
     
+    def on_keywords_changed(self):
+        """关键词或规则变化，在已存储的帖子上补匹配新规则"""
+        backfill = self.crawler_manager.start_keyword_backfill()
+        if backfill is None:
+            return
+        names = ', '.join(rule.name for rule in backfill.rules)
+        self.monitor_panel.log(f"开始在历史帖子中补匹配: {names}")
+        backfill.progress.connect(self.on_keyword_backfill_progress)
+        backfill.finished.connect(self.on_keyword_backfill_finished)
+    
+    def on_keyword_backfill_progress(self, progress: dict):
+        """补匹配进度"""
+        percent = progress['scanned'] / progress['total'] if progress['total'] else 1.0
+        self.status_bar.showMessage(
+            f"历史帖子补匹配 {percent:.0%} | 已匹配 {progress['matched']} 条 | "
+            f"{progress['rate']:,.0f} 条/秒")
+    
+    def on_keyword_backfill_finished(self, result: dict):
+        """补匹配结束"""
+        state = "已暂停" if result['cancelled'] else "完成"
+        self.monitor_panel.log(
+            f"历史帖子补匹配{state}: 扫描 {result['scanned']} 条，匹配 {result['matched']} 条，"
+            f"耗时 {result['elapsed']:.1f} 秒")
+        self.monitor_panel.load_matches()
+    
     def on_keyword_matched(self, data: dict):
         """关键词匹配通知"""
         post = data['post']
@@ -158,18 +224,68 @@ class MainWindow(QMainWindow):
         # 记录日志
         self.logger.info(f"关键词匹配: {post.get('username')} - {keywords}")
         
-        # 显示弹窗通知
+        # 交给通知队列，限流和汇总后再显示
         if config.get('monitor.notification', True):
-            self.show_keyword_notification(post, keywords)
+            self.notifications.submit(data)
         
         # 更新状态栏
         keyword_str = ', '.join(keywords)
         self.status_bar.showMessage(f"🔔 发现匹配: {post.get('username')} - 关键词: {keyword_str}")
     
-    def show_keyword_notification(self, post: dict, keywords: list):
-        """显示关键词匹配通知对话框"""
-        dialog = KeywordNotificationDialog(post, keywords, self)
-        dialog.exec_()
+    def on_metric_alert(self, alert: dict):
+        """互动数据提醒，和关键词匹配一起走通知队列"""
+        post = alert['post']
+        text = f"{alert['rule']}: {METRIC_NAMES.get(alert['metric'], alert['metric'])} " \
+               f"{alert['previous']} → {alert['value']}"
+        self.monitor_panel.log(f"📈 {post.get('username', '')} - {text}")
+        if config.get('monitor.notification', True):
+            self.notifications.submit({'post': post, 'keywords': [], 'rules': [alert['rule']],
+                                       'metric': text})
+        self.status_bar.showMessage(f"📈 {post.get('username', '')} - {text}")
+    
+    def on_notification(self, digest: dict):
+        """显示一条通知或一批匹配的摘要（托盘消息，不阻塞）"""
+        items = digest['items']
+        skipped = digest['suppressed'] + digest['dropped']
+        if not items:
+            if skipped:
+                self.status_bar.showMessage(f"🔕 {skipped} 条匹配因通知限流未提示")
+            return
+        self._last_notification = items[-1]
+        if len(items) == 1:
+            post = items[0]['post']
+            title = f"🔔 关键词匹配: {', '.join(items[0]['keywords'] or items[0].get('rules', []))}"
+            message = f"{post.get('username', '')} [{post.get('platform', '').upper()}]\n" \
+                      f"{items[0].get('metric') or (post.get('content') or '')[:80]}"
+        else:
+            title = f"🔔 {len(items)} 条新匹配"
+            lines = [f"{item['post'].get('username', '')}: "
+                     f"{', '.join(item['keywords'] or item.get('rules', []))}"
+                     for item in items[:5]]
+            if len(items) > 5:
+                lines.append(f"…另有 {len(items) - 5} 条")
+            message = '\n'.join(lines)
+        if skipped:
+            message += f"\n（{skipped} 条因限流未单独提示）"
+        
+        if config.get('notification.sound', True):
+            QApplication.beep()
+        if self.tray_icon is not None:
+            self.tray_icon.showMessage(title, message, QSystemTrayIcon.Information,
+                                       config.get('notification.toast_ms', 5000))
+        else:
+            self.show_last_notification()
+    
+    def show_last_notification(self):
+        """非模态显示最近一条匹配的详情（复用同一个窗口）"""
+        item = self._last_notification
+        if item is None:
+            return
+        if self._notification_dialog is not None:
+            self._notification_dialog.close()
+            self._notification_dialog.deleteLater()
+        self._notification_dialog = KeywordNotificationDialog(item['post'], item['keywords'], self)
+        self._notification_dialog.show()
     
     def closeEvent(self, event):
         """关闭事件"""
@@ -178,9 +294,14 @@ class MainWindow(QMainWindow):
         
         # 停止所有爬虫
         self.crawler_manager.stop_all()
+        # 写完归档段的压缩帧尾，否则最后一段无法完整读出
+        raw_archive.close()
         
         # 停止定时器
         self.refresh_timer.stop()
+        self.notifications.clear()
+        if self.tray_icon is not None:
+            self.tray_icon.hide()
         
         event.accept()
 
@@ -4,9 +4,12 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
                              QPushButton, QLabel, QLineEdit, QListWidget,
                              QSpinBox, QCheckBox, QTextEdit, QMessageBox,
-                             QListWidgetItem, QComboBox)
+                             QListWidgetItem, QComboBox, QTableWidget,
+                             QTableWidgetItem, QHeaderView)
 from PyQt5.QtCore import Qt, pyqtSignal
+from models.database import db
 from config import config
+import json
 
 class MonitorPanel(QWidget):
     """监控管理面板"""
@@ -16,8 +19,14 @@ class MonitorPanel(QWidget):
     monitor_stopped = pyqtSignal()
     keywords_changed = pyqtSignal()
     
+    # 匹配记录每页条数
+    MATCH_PAGE_SIZE = 50
+    
     def __init__(self):
         super().__init__()
+        self.match_page = 0
+        # 各页第一条之前的翻页位置 (matched_at, id)，第一页为 None
+        self.match_cursors = [None]
         self.init_ui()
         self.load_config()
     
@@ -133,6 +142,50 @@ class MonitorPanel(QWidget):
         
         layout.addWidget(notification_group)
         
+        # 匹配记录（按匹配时间倒序分页读取数据库）
+        match_group = QGroupBox("匹配记录")
+        match_layout = QVBoxLayout(match_group)
+        
+        match_filter_layout = QHBoxLayout()
+        match_filter_layout.addWidget(QLabel("规则:"))
+        self.match_rule_combo = QComboBox()
+        self.match_rule_combo.addItem("全部")
+        self.match_rule_combo.currentTextChanged.connect(self._on_match_rule_changed)
+        match_filter_layout.addWidget(self.match_rule_combo)
+        
+        refresh_match_btn = QPushButton("🔄 刷新")
+        refresh_match_btn.clicked.connect(self.load_matches)
+        match_filter_layout.addWidget(refresh_match_btn)
+        match_filter_layout.addStretch()
+        match_layout.addLayout(match_filter_layout)
+        
+        self.match_table = QTableWidget()
+        self.match_table.setColumnCount(5)
+        self.match_table.setHorizontalHeaderLabels(["匹配时间", "规则", "关键词", "用户", "内容"])
+        header = self.match_table.horizontalHeader()
+        for column in range(4):
+            header.setSectionResizeMode(column, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(4, QHeaderView.Stretch)
+        self.match_table.setAlternatingRowColors(True)
+        self.match_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.match_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.match_table.setMinimumHeight(200)
+        match_layout.addWidget(self.match_table)
+        
+        page_layout = QHBoxLayout()
+        self.match_prev_btn = QPushButton("上一页")
+        self.match_prev_btn.clicked.connect(self._prev_match_page)
+        page_layout.addWidget(self.match_prev_btn)
+        self.match_page_label = QLabel()
+        page_layout.addWidget(self.match_page_label)
+        self.match_next_btn = QPushButton("下一页")
+        self.match_next_btn.clicked.connect(self._next_match_page)
+        page_layout.addWidget(self.match_next_btn)
+        page_layout.addStretch()
+        match_layout.addLayout(page_layout)
+        
+        layout.addWidget(match_group)
+        
         # 监控日志
         log_group = QGroupBox("监控日志")
         log_layout = QVBoxLayout(log_group)
@@ -166,6 +219,7 @@ class MonitorPanel(QWidget):
         
         # 加载关键词
         self._refresh_keywords()
+        self.load_matches()
     
     def _refresh_keywords(self):
         """刷新关键词列表"""
@@ -240,8 +294,11 @@ class MonitorPanel(QWidget):
     def _on_match_mode_changed(self, text):
         """匹配模式改变"""
         mode = 'any' if text == "任意匹配" else 'all'
+        if mode == config.get('monitor.match_mode', 'any'):
+            return
         config.set('monitor.match_mode', mode)
         config.save_config()
+        self.keywords_changed.emit()
     
     def _start_monitor(self):
         """启动监控"""
@@ -274,6 +331,73 @@ class MonitorPanel(QWidget):
         self.log("监控已停止")
         self.monitor_stopped.emit()
     
+    def _selected_match_rule(self):
+        """当前筛选的规则，全部时为 None"""
+        rule = self.match_rule_combo.currentText()
+        return None if rule == "全部" else rule
+    
+    def load_matches(self):
+        """加载当前页的匹配记录"""
+        # 更新规则筛选项，保留当前选择
+        current = self.match_rule_combo.currentText()
+        self.match_rule_combo.blockSignals(True)
+        self.match_rule_combo.clear()
+        self.match_rule_combo.addItem("全部")
+        self.match_rule_combo.addItems(db.get_match_rules())
+        self.match_rule_combo.setCurrentText(current)
+        self.match_rule_combo.blockSignals(False)
+        
+        rule = self._selected_match_rule()
+        # 多取一条判断是否还有下一页，不统计总数
+        matches = db.get_keyword_matches(rule, limit=self.MATCH_PAGE_SIZE + 1,
+                                         before=self.match_cursors[self.match_page])
+        has_next = len(matches) > self.MATCH_PAGE_SIZE
+        matches = matches[:self.MATCH_PAGE_SIZE]
+        del self.match_cursors[self.match_page + 1:]
+        if has_next:
+            self.match_cursors.append((matches[-1]['matched_at'], matches[-1]['id']))
+        
+        self.match_table.setRowCount(len(matches))
+        for i, match in enumerate(matches):
+            matched_at = str(match.get('matched_at') or '').split('.')[0]  # 去掉毫秒
+            self.match_table.setItem(i, 0, QTableWidgetItem(matched_at))
+            self.match_table.setItem(i, 1, QTableWidgetItem(match.get('rule', '')))
+            keywords = json.loads(match['keywords']) if match.get('keywords') else []
+            self.match_table.setItem(i, 2, QTableWidgetItem(', '.join(keywords)))
+            user = f"{match.get('username') or match.get('user_id') or ''} [{match.get('platform', '')}]"
+            self.match_table.setItem(i, 3, QTableWidgetItem(user))
+            content = match.get('content') or ''
+            content_item = QTableWidgetItem(content[:80] + ('...' if len(content) > 80 else ''))
+            content_item.setToolTip(content)
+            self.match_table.setItem(i, 4, content_item)
+        
+        self.match_page_label.setText(f"第 {self.match_page + 1} 页")
+        self.match_prev_btn.setEnabled(self.match_page > 0)
+        self.match_next_btn.setEnabled(has_next)
+    
+    def on_matches_saved(self, count: int):
+        """有新的匹配记录写入，正在看第一页时刷新"""
+        if self.match_page == 0:
+            self.load_matches()
+    
+    def _on_match_rule_changed(self, text):
+        """切换规则筛选"""
+        self.match_page = 0
+        self.match_cursors = [None]
+        self.load_matches()
+    
+    def _prev_match_page(self):
+        """上一页"""
+        if self.match_page > 0:
+            self.match_page -= 1
+            self.load_matches()
+    
+    def _next_match_page(self):
+        """下一页"""
+        if self.match_page + 1 < len(self.match_cursors):
+            self.match_page += 1
+            self.load_matches()
+    
     def log(self, message: str):
         """记录日志"""
         from datetime import datetime
@@ -3,7 +3,8 @@
 """
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
                              QTableWidgetItem, QComboBox, QLineEdit, QPushButton,
-                             QLabel, QHeaderView, QTextEdit, QDialog, QDialogButtonBox)
+                             QLabel, QHeaderView, QTextEdit, QDialog, QDialogButtonBox,
+                             QCheckBox)
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QPixmap, QIcon
 from models.database import db
@@ -37,6 +38,12 @@ class PostListWidget(QWidget):
         self.search_input.returnPressed.connect(self.load_posts)
         filter_layout.addWidget(self.search_input)
         
+        # 合并近似重复
+        self.collapse_check = QCheckBox("合并相似帖子")
+        self.collapse_check.setChecked(True)
+        self.collapse_check.stateChanged.connect(self.load_posts)
+        filter_layout.addWidget(self.collapse_check)
+        
         # 刷新按钮
         self.refresh_btn = QPushButton("🔄 刷新")
         self.refresh_btn.clicked.connect(self.load_posts)
@@ -81,13 +88,10 @@ class PostListWidget(QWidget):
         if platform == "全部":
             platform = None
         
-        # 获取数据
-        posts = db.get_posts(platform=platform, limit=1000)
-        
-        # 搜索过滤
-        search_text = self.search_input.text().strip().lower()
-        if search_text:
-            posts = [p for p in posts if search_text in (p.get('content') or '').lower()]
+        # 获取数据（搜索在数据库中按归一化内容匹配，忽略繁简、全角/半角和标点差异）
+        posts = db.get_posts(platform=platform, limit=1000,
+                             search=self.search_input.text().strip(),
+                             collapse=self.collapse_check.isChecked())
         
         # 更新表格
         self.table.setRowCount(len(posts))
@@ -106,6 +110,8 @@ class PostListWidget(QWidget):
             content = post.get('content', '')
             if len(content) > 50:
                 content = content[:50] + '...'
+            if post.get('duplicates'):
+                content = f"[+{post['duplicates']} 条相似] {content}"
             content_item = QTableWidgetItem(content)
             self.table.setItem(i, 2, content_item)
             
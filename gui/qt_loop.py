@@ -0,0 +1,47 @@
+"""
+Qt 事件循环适配 - 让不依赖 Qt 的爬取/监控核心在界面线程中执行回调
+"""
+import time
+from abc import ABCMeta
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from crawler.events import EventLoop, TimerHandle
+from utils.logger import get_logger
+
+
+class _QtLoopMeta(type(QObject), ABCMeta):
+    """QObject 与抽象基类的元类不同，合并后才能同时继承"""
+
+
+class QtEventLoop(QObject, EventLoop, metaclass=_QtLoopMeta):
+    """把 EventLoop 的回调投递到 Qt 主线程（需在主线程创建）"""
+
+    _posted = pyqtSignal(object, tuple)
+
+    def __init__(self):
+        super().__init__()
+        self.logger = get_logger('events')
+        # 总是排队执行，即使在主线程中 post 也要等到下一轮事件循环
+        self._posted.connect(self._dispatch, Qt.QueuedConnection)
+
+    def post(self, callback, *args):
+        """投递回调（线程安全）"""
+        self._posted.emit(callback, args)
+
+    def call_later(self, delay: float, callback, *args) -> TimerHandle:
+        """delay 秒后在主线程执行回调（线程安全）"""
+        handle = TimerHandle(time.monotonic() + max(0.0, delay), callback, args)
+        self.post(self._start_timer, handle)
+        return handle
+
+    def _start_timer(self, handle: TimerHandle):
+        """在主线程启动 QTimer"""
+        if not handle.cancelled:
+            remaining = max(0.0, handle.when - time.monotonic())
+            QTimer.singleShot(int(remaining * 1000), lambda: self._dispatch(handle.run, ()))
+
+    def _dispatch(self, callback, args):
+        """执行回调，异常只记录不向 Qt 抛出"""
+        try:
+            callback(*args)
+        except Exception as e:
+            self.logger.error(f"回调异常 {getattr(callback, '__name__', callback)}: {e}")
@@ -86,6 +86,18 @@ class TaskPanel(QWidget):
         self.start_btn.clicked.connect(self.start_crawl)
         task_layout.addWidget(self.start_btn)
         
+        # 历史回填按钮（不受帖子数量限制，可断点续爬）
+        backfill_layout = QHBoxLayout()
+        self.backfill_btn = QPushButton("📚 历史回填")
+        self.backfill_btn.setToolTip("后台低优先级爬取全部历史帖子，中断后从上次的位置继续")
+        self.backfill_btn.clicked.connect(self.start_backfill)
+        backfill_layout.addWidget(self.backfill_btn)
+        
+        self.pause_backfill_btn = QPushButton("⏸ 暂停回填")
+        self.pause_backfill_btn.clicked.connect(self.pause_backfill)
+        backfill_layout.addWidget(self.pause_backfill_btn)
+        task_layout.addLayout(backfill_layout)
+        
         left_layout.addWidget(task_group)
         
         # 用户列表
@@ -167,6 +179,48 @@ class TaskPanel(QWidget):
         # 禁用按钮
         self.start_btn.setEnabled(False)
     
+    def start_backfill(self):
+        """开始或继续历史回填"""
+        platform = self.platform_combo.currentText()
+        user_id = self.user_input.text().strip()
+        
+        if not user_id:
+            QMessageBox.warning(self, "警告", "请输入用户ID")
+            return
+        
+        # 回填进度按用户 ID 保存，输入的是用户名时先换成已存储的用户 ID
+        user_id = db.resolve_user_id(platform, user_id) or user_id
+        checkpoint = db.get_checkpoint(platform, user_id)
+        restart = False
+        if checkpoint and checkpoint['status'] == 'done':
+            reply = QMessageBox.question(
+                self, "重新回填",
+                f"该用户的历史回填已完成（{checkpoint['posts']} 条帖子），是否从头重新回填？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                return
+            restart = True
+        
+        handle = self.crawler_manager.start_backfill(platform, user_id, restart=restart)
+        handle.progress.connect(self.on_progress)
+        handle.error.connect(lambda p, e: self.log(f"[{p}] 错误: {e}"))
+        handle.finished.connect(lambda p, c: (self.log(f"[{p}] 历史回填本次写入 {c} 条帖子"),
+                                              self.load_users()))
+        
+        if checkpoint and not restart:
+            self.log(f"继续回填 {platform} 用户 {user_id}（已完成 {checkpoint['pages']} 页）")
+        else:
+            self.log(f"开始回填 {platform} 用户 {user_id}")
+    
+    def pause_backfill(self):
+        """暂停历史回填"""
+        platform = self.platform_combo.currentText()
+        user_id = self.user_input.text().strip()
+        if user_id:
+            self.crawler_manager.stop_backfill(platform, user_id)
+            self.log(f"已暂停回填 {platform} 用户 {user_id}")
+    
     def crawl_user_from_list(self, item):
         """从列表爬取用户"""
         user = item.data(Qt.UserRole)
@@ -2,9 +2,12 @@
 数据库模型
 """
 import sqlite3
+import time
 from datetime import datetime
 from contextlib import contextmanager
 from config import DATABASE_PATH
+from utils.text import NORMALIZE_VERSION, normalize
+from utils.simhash import bands, nearest, simhash
 
 class Database:
     """数据库管理类"""
@@ -16,7 +19,8 @@ class Database:
     @contextmanager
     def get_connection(self):
         """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
+        # 多个进程（或多台机器上的工作进程）共用数据库时，等待其他连接释放写锁而不是立即报错
+        conn = sqlite3.connect(self.db_path, timeout=30)
         conn.row_factory = sqlite3.Row
         try:
             yield conn
@@ -57,6 +61,9 @@ class Database:
                     user_id TEXT NOT NULL,
                     username TEXT NOT NULL,
                     content TEXT,
+                    content_normalized TEXT,
+                    simhash INTEGER,
+                    dup_of INTEGER,
                     images TEXT,
                     videos TEXT,
                     likes INTEGER DEFAULT 0,
@@ -70,6 +77,28 @@ class Database:
                 )
             ''')
             
+            # 近似重复索引：指纹分段 -> 帖子行 ID（见 utils/simhash.py）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS post_bands (
+                    band INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    post INTEGER NOT NULL,
+                    PRIMARY KEY(band, value, post)
+                ) WITHOUT ROWID
+            ''')
+            
+            # 分段执行的数据迁移（按 posts.id 范围，last_id 为已处理到的行，处理完后删除）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS migrations (
+                    name TEXT PRIMARY KEY,
+                    last_id INTEGER DEFAULT 0,
+                    max_id INTEGER DEFAULT 0
+                )
+            ''')
+
+            self._migrate_normalized_content(conn)
+            self._migrate_fingerprints(conn)
+
             # 创建索引
             cursor.execute('''
                 CREATE INDEX IF NOT EXISTS idx_posts_platform_user 
@@ -79,7 +108,290 @@ class Database:
                 CREATE INDEX IF NOT EXISTS idx_posts_published_at 
                 ON posts(published_at DESC)
             ''')
-    
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_posts_dup_of
+                ON posts(dup_of) WHERE dup_of IS NOT NULL
+            ''')
+            
+            # 历史回填进度表（每页写入后更新，用于断点续爬）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                    platform TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    cursor TEXT,
+                    pages INTEGER DEFAULT 0,
+                    posts INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'running',
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY(platform, user_id)
+                )
+            ''')
+
+            # 持久化爬取任务队列（多个工作进程通过租约认领）
+            # lease_until、available_at 为 Unix 时间戳，多台机器共用时需要同步时钟
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    platform TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    max_posts INTEGER DEFAULT 50,
+                    priority INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'pending',
+                    owner TEXT,
+                    lease_until REAL,
+                    available_at REAL DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER DEFAULT 3,
+                    posts INTEGER DEFAULT 0,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # 同一用户同时只有一个未完成的任务
+            cursor.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_crawl_jobs_active
+                ON crawl_jobs(platform, user_id) WHERE status IN ('pending', 'running')
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_crawl_jobs_status
+                ON crawl_jobs(status, priority DESC, available_at)
+            ''')
+
+            # 关键词匹配记录（keywords、spans 为 JSON，spans 对应帖子原文）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS keyword_matches (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    platform TEXT NOT NULL,
+                    post_id TEXT NOT NULL,
+                    rule TEXT NOT NULL,
+                    keywords TEXT,
+                    spans TEXT,
+                    source TEXT DEFAULT 'live',
+                    matched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(platform, post_id, rule)
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_keyword_matches_time
+                ON keyword_matches(matched_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_keyword_matches_rule
+                ON keyword_matches(rule, matched_at)
+            ''')
+
+            # 规则变化后对已存储帖子的补匹配进度（last_id 为已处理到的 posts.id）
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rule_backfills (
+                    signature TEXT PRIMARY KEY,
+                    name TEXT,
+                    last_id INTEGER DEFAULT 0,
+                    matched INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'running',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+            self.search_index = self._create_search_index(conn)
+
+        # 先重新计算归一化内容，再按新内容计算指纹
+        self._run_migration('normalize', self._renormalize)
+        self._run_migration('fingerprints', self._fill_fingerprints, batch=1000)
+        if self.search_index:
+            self._run_migration('posts_fts', self._fill_search_index)
+
+    @classmethod
+    def _create_search_index(cls, conn):
+        """
+        content_normalized 的 FTS5 三元组全文索引，由触发器随 posts 更新
+
+        索引表自己保存一份归一化内容（外部内容表要求删除时给出原值，中途补建时不安全）。
+        已有帖子的索引登记为分段迁移补建。SQLite 不支持 FTS5 或三元组分词（3.34 以前）时
+        返回 False，搜索退回逐行比较。
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'").fetchone()
+        if exists:
+            return True
+        try:
+            conn.execute('''
+                CREATE VIRTUAL TABLE posts_fts USING fts5(content_normalized, tokenize = 'trigram')
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        conn.execute('''
+            CREATE TRIGGER posts_fts_insert AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts (rowid, content_normalized)
+                VALUES (new.id, new.content_normalized);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER posts_fts_delete AFTER DELETE ON posts BEGIN
+                DELETE FROM posts_fts WHERE rowid = old.id;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER posts_fts_update AFTER UPDATE OF content_normalized ON posts
+            WHEN old.content_normalized IS NOT new.content_normalized BEGIN
+                DELETE FROM posts_fts WHERE rowid = old.id;
+                INSERT INTO posts_fts (rowid, content_normalized)
+                VALUES (new.id, new.content_normalized);
+            END
+        ''')
+        cls._register_migration(conn, 'posts_fts')
+        return True
+
+    @staticmethod
+    def _fill_search_index(conn, start, end):
+        """补建一段已有帖子的全文索引（触发器已经写入的跳过）"""
+        conn.execute('''
+            INSERT INTO posts_fts (rowid, content_normalized)
+            SELECT id, content_normalized FROM posts
+            WHERE id > ? AND id <= ?
+              AND id NOT IN (SELECT rowid FROM posts_fts WHERE rowid > ? AND rowid <= ?)
+        ''', (start, end, start, end))
+
+    @staticmethod
+    def _register_migration(conn, name):
+        """登记分段迁移，范围为当前所有帖子（已登记的从头开始），没有帖子时不登记"""
+        conn.execute('''
+            INSERT OR REPLACE INTO migrations (name, max_id)
+            SELECT ?, MAX(id) FROM posts HAVING MAX(id) IS NOT NULL
+        ''', (name,))
+
+    def _run_migration(self, name, step, batch=5000):
+        """
+        按行 ID 分段执行登记过的迁移
+
+        每段一个事务（立即取得写锁，多个进程同时启动时各自处理不同的段），
+        其他连接在段之间可以写入，中断后从上次的位置继续。
+        """
+        while True:
+            with self.get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('SELECT last_id, max_id FROM migrations WHERE name = ?',
+                                   (name,)).fetchone()
+                if row is None:
+                    return
+                if row['last_id'] >= row['max_id']:
+                    conn.execute('DELETE FROM migrations WHERE name = ?', (name,))
+                    return
+                end = min(row['last_id'] + batch, row['max_id'])
+                step(conn, row['last_id'], end)
+                conn.execute('UPDATE migrations SET last_id = ? WHERE name = ?', (end, name))
+
+    def _contains_any(self, terms, rowid_range=None):
+        """
+        content_normalized 包含任一词的条件 (SQL, 参数)
+
+        词都不短于 3 个字符时查 FTS5 三元组索引，只读取命中的行；有更短的词
+        （三元组索引查不了）或没有全文索引时逐行 instr 比较。
+
+        Args:
+            rowid_range: (起, 止]，限定索引查找的行 ID 范围
+        """
+        if self.search_index and all(len(term) >= 3 for term in terms):
+            query = ' OR '.join('"' + term.replace('"', '""') + '"' for term in terms)
+            sql = 'id IN (SELECT rowid FROM posts_fts WHERE posts_fts MATCH ?'
+            params = [query]
+            if rowid_range:
+                sql += ' AND rowid > ? AND rowid <= ?'
+                params.extend(rowid_range)
+            return sql + ')', params
+        return '(' + ' OR '.join(['instr(content_normalized, ?) > 0'] * len(terms)) + ')', list(terms)
+
+    @classmethod
+    def _migrate_normalized_content(cls, conn):
+        """
+        旧数据库补充 content_normalized 列
+
+        user_version 记录归一化规则的版本。列是新加的或规则变化时，登记分段迁移重新计算
+        已存储帖子的归一化内容（见 _renormalize），指纹分段先清空，随后重新计算。
+        """
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(posts)')}
+        added = 'content_normalized' not in columns
+        if added:
+            conn.execute('ALTER TABLE posts ADD COLUMN content_normalized TEXT')
+        if added or conn.execute('PRAGMA user_version').fetchone()[0] < NORMALIZE_VERSION:
+            conn.execute('DELETE FROM post_bands')
+            cls._register_migration(conn, 'normalize')
+            cls._register_migration(conn, 'fingerprints')
+            conn.execute(f'PRAGMA user_version = {NORMALIZE_VERSION}')
+
+    @staticmethod
+    def _renormalize(conn, start, end):
+        """重新计算一段帖子的归一化内容，并清空指纹等待重新计算"""
+        rows = conn.execute('SELECT id, content FROM posts WHERE id > ? AND id <= ?',
+                            (start, end)).fetchall()
+        conn.executemany('''
+            UPDATE posts SET content_normalized = ?, simhash = NULL, dup_of = NULL WHERE id = ?
+        ''', [(normalize(row['content']), row['id']) for row in rows])
+
+    @classmethod
+    def _migrate_fingerprints(cls, conn):
+        """旧数据库补充指纹列，并登记分段迁移为已有帖子计算指纹（见 _fill_fingerprints）"""
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(posts)')}
+        missing = [column for column in ('simhash', 'dup_of') if column not in columns]
+        for column in missing:
+            conn.execute(f'ALTER TABLE posts ADD COLUMN {column} INTEGER')
+        if missing:
+            cls._register_migration(conn, 'fingerprints')
+
+    @classmethod
+    def _fill_fingerprints(cls, conn, start, end):
+        """为一段还没有指纹的帖子计算指纹、归入近似重复组（按行 ID 顺序，组首为最早的帖子）"""
+        rows = conn.execute('''
+            SELECT id, content_normalized FROM posts
+            WHERE id > ? AND id <= ? AND simhash IS NULL ORDER BY id
+        ''', (start, end)).fetchall()
+        for row in rows:
+            cls._index_fingerprint(conn, row['id'], simhash(row['content_normalized']))
+
+    @staticmethod
+    def _index_fingerprint(conn, row_id, fingerprint, old=None):
+        """
+        写入帖子指纹并归入近似重复组
+
+        dup_of 指向组内最早存储的帖子（组首帖子本身为 NULL）。
+        指纹按分段查找候选，不需要和全部帖子比较。没有指纹（文本太短）时记为 0。
+        """
+        if old:
+            conn.execute('DELETE FROM post_bands WHERE post = ?', (row_id,))
+        dup_of = None
+        if fingerprint is not None:
+            post_bands = bands(fingerprint)
+            # 写成 OR 的等值条件才能逐段走主键查找（行值 IN (VALUES ...) 会扫描整个分段表）
+            conditions = ' OR '.join(['(b.band = ? AND b.value = ?)'] * len(post_bands))
+            candidates = conn.execute(f'''
+                SELECT p.id, p.simhash, p.dup_of FROM post_bands b JOIN posts p ON p.id = b.post
+                WHERE ({conditions}) AND b.post != ?
+            ''', [v for pair in post_bands for v in pair] + [row_id]).fetchall()
+            roots = {row['id']: row['dup_of'] or row['id'] for row in candidates}
+            match = nearest(fingerprint, [(row['id'], row['simhash']) for row in candidates])
+            if match is not None:
+                dup_of = roots[match]
+            conn.executemany('INSERT OR IGNORE INTO post_bands (band, value, post) VALUES (?, ?, ?)',
+                             [(band, value, row_id) for band, value in post_bands])
+        conn.execute('UPDATE posts SET simhash = ?, dup_of = ? WHERE id = ?',
+                     (fingerprint if fingerprint is not None else 0, dup_of, row_id))
+
+    @classmethod
+    def _index_posts(cls, conn, posts):
+        """为刚写入的帖子更新指纹（内容没变、指纹相同的跳过）"""
+        for platform, post_id, fingerprint in posts:
+            row = conn.execute('SELECT id, simhash FROM posts WHERE platform = ? AND post_id = ?',
+                               (platform, post_id)).fetchone()
+            if row is None:
+                continue
+            value = fingerprint if fingerprint is not None else 0
+            if row['simhash'] == value:
+                continue
+            cls._index_fingerprint(conn, row['id'], fingerprint, row['simhash'])
+
     def add_user(self, platform, user_id, username, avatar=None, 
                  description=None, followers=0):
         """添加或更新用户"""
@@ -99,51 +411,627 @@ class Database:
                   followers, datetime.now()))
             return cursor.lastrowid
     
-    def add_post(self, platform, post_id, user_id, username, content=None,
-                 images=None, videos=None, likes=0, comments=0, shares=0,
-                 post_url=None, published_at=None):
-        """添加或更新帖子"""
+    def add_post(self, platform, post_id, user_id, username, content=None, **fields):
+        """
+        添加或更新帖子（参数见 upsert_post）
+
+        Returns:
+            是否为首次写入（新帖子）
+        """
+        return self.upsert_post(platform, post_id, user_id, username, content, **fields) is None
+
+    def upsert_post(self, platform, post_id, user_id, username, content=None, **fields):
+        """
+        添加或更新帖子（content_normalized、fingerprint 为 None 时按 content 计算）
+
+        Returns:
+            写入前的互动数据 {likes, comments, shares, updated_at}，新帖子为 None
+        """
+        return self.upsert_posts([dict(fields, platform=platform, post_id=post_id, user_id=user_id,
+                                       username=username, content=content)])[0]
+
+    def upsert_posts(self, posts):
+        """
+        添加或更新一批帖子（单个事务，参数同 upsert_post）
+
+        逐条插入以判断是否新帖，已有帖子写入前的互动数据按平台一次查询读出。
+
+        Returns:
+            每条帖子写入前的互动数据，新帖子为 None
+        """
+        if not posts:
+            return []
+        now = datetime.now()
+        posts = [dict(post) for post in posts]
+        fingerprints = []
+        existing = []
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO posts (platform, post_id, user_id, username, content,
-                                   images, videos, likes, comments, shares,
-                                   post_url, published_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(platform, post_id) DO UPDATE SET
-                    content = excluded.content,
-                    images = excluded.images,
-                    videos = excluded.videos,
-                    likes = excluded.likes,
-                    comments = excluded.comments,
-                    shares = excluded.shares,
-                    updated_at = excluded.updated_at
-            ''', (platform, post_id, user_id, username, content, images, videos,
-                  likes, comments, shares, post_url, published_at, datetime.now()))
-            return cursor.lastrowid
+            for post in posts:
+                if post.get('content_normalized') is None:
+                    post['content_normalized'] = normalize(post.get('content'))
+                if post.get('fingerprint') is None:
+                    post['fingerprint'] = simhash(post['content_normalized'])
+                fingerprints.append((post['platform'], post['post_id'], post['fingerprint']))
+                # 是否新帖由插入本身决定：冲突时不插入也不返回行
+                cursor = conn.execute('''
+                    INSERT INTO posts (platform, post_id, user_id, username, content,
+                                       content_normalized, images, videos, likes, comments,
+                                       shares, post_url, published_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(platform, post_id) DO NOTHING
+                    RETURNING id
+                ''', (post['platform'], post['post_id'], post['user_id'], post['username'],
+                      post.get('content'), post['content_normalized'], post.get('images'),
+                      post.get('videos'), post.get('likes', 0), post.get('comments', 0),
+                      post.get('shares', 0), post.get('post_url'), post.get('published_at'), now))
+                if cursor.fetchone() is None:
+                    existing.append(post)
+
+            # 插入已开始写事务并持有写锁，这里一次读出的就是更新前的数据
+            stored = {}
+            for platform in {post['platform'] for post in existing}:
+                metrics = self._read_metrics(conn, platform, [post['post_id'] for post in existing
+                                                              if post['platform'] == platform])
+                stored.update(((platform, post_id), values) for post_id, values in metrics.items())
+            previous = {}
+            for post in existing:
+                key = (post['platform'], post['post_id'])
+                previous[id(post)] = stored.get(key)
+                # 同一批中重复出现的帖子，前一次写入的数值即为下一次的原有数据
+                stored[key] = {'likes': post.get('likes', 0), 'comments': post.get('comments', 0),
+                               'shares': post.get('shares', 0), 'updated_at': str(now)}
+            conn.executemany('''
+                UPDATE posts SET content = ?, content_normalized = ?, images = ?, videos = ?,
+                    likes = ?, comments = ?, shares = ?, updated_at = ?
+                WHERE platform = ? AND post_id = ?
+            ''', [(post.get('content'), post['content_normalized'], post.get('images'),
+                   post.get('videos'), post.get('likes', 0), post.get('comments', 0),
+                   post.get('shares', 0), now, post['platform'], post['post_id'])
+                  for post in existing])
+            self._index_posts(conn, fingerprints)
+        return [previous.get(id(post)) for post in posts]
     
-    def get_posts(self, platform=None, user_id=None, limit=100, offset=0):
-        """获取帖子列表"""
+    def add_posts(self, posts):
+        """
+        批量添加或更新帖子（单个事务）
+
+        每条帖子可带 fetched_at 表示数据抓取时间：内容字段总是更新，
+        互动数据只在抓取时间不早于现有记录时才覆盖，避免旧数据回写。
+
+        Returns:
+            写入的条数
+        """
+        if not posts:
+            return 0
+        with self.get_connection() as conn:
+            return self._upsert_posts(conn, posts)
+
+    @classmethod
+    def _upsert_posts(cls, conn, posts):
+        """在给定连接中批量写入帖子（语义见 add_posts）"""
+        now = datetime.now()
+        rows = []
+        fingerprints = []
+        for p in posts:
+            normalized = p.get('content_normalized')
+            if normalized is None:
+                normalized = normalize(p.get('content'))
+            fingerprint = p['fingerprint'] if 'fingerprint' in p else simhash(normalized)
+            rows.append((p['platform'], p['post_id'], p['user_id'], p.get('username') or '',
+                         p.get('content'), normalized, p.get('images'), p.get('videos'),
+                         p.get('likes', 0), p.get('comments', 0), p.get('shares', 0),
+                         p.get('post_url'), p.get('published_at'), p.get('fetched_at') or now))
+            fingerprints.append((p['platform'], p['post_id'], fingerprint))
+        conn.executemany('''
+            INSERT INTO posts (platform, post_id, user_id, username, content,
+                               content_normalized, images, videos, likes, comments,
+                               shares, post_url, published_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(platform, post_id) DO UPDATE SET
+                content = excluded.content,
+                content_normalized = excluded.content_normalized,
+                images = excluded.images,
+                videos = excluded.videos,
+                likes = CASE WHEN excluded.updated_at >= posts.updated_at
+                             THEN excluded.likes ELSE posts.likes END,
+                comments = CASE WHEN excluded.updated_at >= posts.updated_at
+                                THEN excluded.comments ELSE posts.comments END,
+                shares = CASE WHEN excluded.updated_at >= posts.updated_at
+                              THEN excluded.shares ELSE posts.shares END,
+                updated_at = MAX(excluded.updated_at, posts.updated_at)
+        ''', rows)
+        cls._index_posts(conn, fingerprints)
+        return len(rows)
+
+    def get_posts(self, platform=None, user_id=None, limit=100, offset=0, search=None,
+                  collapse=False):
+        """
+        获取帖子列表
+
+        Args:
+            search: 按归一化内容搜索
+            collapse: 合并近似重复，只返回每组最早的帖子，duplicates 为组内其他帖子数
+                （有筛选条件时在筛选结果内合并，组首帖子不在结果中时由结果内最早的帖子代表）
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            query = 'SELECT * FROM posts WHERE 1=1'
+            where = '1=1'
             params = []
             
             if platform:
-                query += ' AND platform = ?'
+                where += ' AND platform = ?'
                 params.append(platform)
             
             if user_id:
-                query += ' AND user_id = ?'
+                where += ' AND user_id = ?'
                 params.append(user_id)
             
+            search = normalize(search)
+            if search:
+                clause, clause_params = self._contains_any([search])
+                where += ' AND ' + clause
+                params.extend(clause_params)
+            
+            if collapse and params:
+                query = f'''
+                    SELECT posts.*, f.duplicates FROM (
+                        SELECT id,
+                            ROW_NUMBER() OVER (PARTITION BY COALESCE(dup_of, id) ORDER BY id) AS position,
+                            COUNT(*) OVER (PARTITION BY COALESCE(dup_of, id)) - 1 AS duplicates
+                        FROM posts WHERE {where}
+                    ) f JOIN posts ON posts.id = f.id WHERE f.position = 1'''
+            elif collapse:
+                query = '''SELECT posts.*, (SELECT COUNT(*) FROM posts d WHERE d.dup_of = posts.id)
+                           AS duplicates FROM posts WHERE dup_of IS NULL'''
+            else:
+                query = f'SELECT * FROM posts WHERE {where}'
+            
             query += ' ORDER BY published_at DESC LIMIT ? OFFSET ?'
             params.extend([limit, offset])
             
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_post_metrics(self, platform, post_ids):
+        """一批帖子当前的互动数据 {post_id: {likes, comments, shares, updated_at}}，不存在的不返回"""
+        with self.get_connection() as conn:
+            return self._read_metrics(conn, platform, post_ids)
+
+    @staticmethod
+    def _read_metrics(conn, platform, post_ids):
+        """在给定连接中读取一批帖子的互动数据（每 500 条一次查询）"""
+        result = {}
+        post_ids = list(post_ids)
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            cursor = conn.execute(f'''
+                SELECT post_id, likes, comments, shares, updated_at FROM posts
+                WHERE platform = ? AND post_id IN ({','.join('?' * len(chunk))})
+            ''', [platform] + chunk)
+            for row in cursor.fetchall():
+                metrics = dict(row)
+                result[metrics.pop('post_id')] = metrics
+        return result
+
+    def has_post(self, platform, post_id):
+        """帖子是否已存储"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT 1 FROM posts WHERE platform = ? AND post_id = ?',
+                                  (platform, post_id))
+            return cursor.fetchone() is not None
+
+    def get_recent_publish_times(self, platform, user_id, limit=20):
+        """获取用户最近帖子的发布时间（用于估算发帖频率）"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT published_at FROM posts
+                WHERE platform = ? AND user_id = ? AND published_at IS NOT NULL
+                ORDER BY published_at DESC LIMIT ?
+            ''', (platform, user_id, limit))
+            # 旧数据库中带时区的时间由 to_datetime 换算成本地时间，和新写入的不带时区的时间统一
+            # （crawler 包导入时会导入本模块，在这里导入避免循环导入）
+            from crawler.parser import to_datetime
+            times = [to_datetime(row['published_at']) for row in cursor.fetchall()]
+            return [published for published in times if published]
+
+    def get_latest_post(self, platform, user_id):
+        """获取用户已存储的最新帖子（增量检查的高水位）"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT post_id, published_at FROM posts
+                WHERE platform = ? AND user_id = ?
+                ORDER BY published_at DESC LIMIT 1
+            ''', (platform, user_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_metrics_candidates(self, platform, since, limit=1000):
+        """
+        获取需要考虑刷新互动数据的帖子（since 之后发布的）
+
+        updated_at 即最近一次拿到互动数据的时间（单独刷新或随完整爬取更新）
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT post_id, user_id, username, post_url, published_at, likes, comments,
+                       shares, updated_at
+                FROM posts
+                WHERE platform = ? AND published_at >= ?
+                ORDER BY published_at DESC LIMIT ?
+            ''', (platform, since, limit))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def update_post_metrics(self, platform, metrics):
+        """
+        批量只更新互动数据
+
+        Args:
+            metrics: [(post_id, likes, comments, shares)]，数值为 None 时保留原值
+                     （帖子已删除时仍记录刷新时间，避免反复请求）
+
+        Returns:
+            更新的条数
+        """
+        now = datetime.now()
+        rows = [(likes, comments, shares, now, platform, post_id)
+                for post_id, likes, comments, shares in metrics]
+        if not rows:
+            return 0
+        with self.get_connection() as conn:
+            conn.executemany('''
+                UPDATE posts SET
+                    likes = COALESCE(?, likes),
+                    comments = COALESCE(?, comments),
+                    shares = COALESCE(?, shares),
+                    updated_at = ?
+                WHERE platform = ? AND post_id = ?
+            ''', rows)
+        return len(rows)
+
+    def get_checkpoint(self, platform, user_id):
+        """获取回填进度"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM crawl_checkpoints WHERE platform = ? AND user_id = ?
+            ''', (platform, user_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_checkpoints(self, status=None):
+        """获取回填进度列表"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if status:
+                cursor.execute('SELECT * FROM crawl_checkpoints WHERE status = ? ORDER BY updated_at',
+                               (status,))
+            else:
+                cursor.execute('SELECT * FROM crawl_checkpoints ORDER BY updated_at DESC')
+            return [dict(row) for row in cursor.fetchall()]
+
+    def save_checkpoint(self, platform, user_id, cursor=None, status='running', error=None,
+                        posts=None):
+        """
+        保存回填进度
+
+        posts 不为 None 时在同一事务中写入该页帖子并累加计数，
+        保证进度和数据要么都写入要么都没写入，续爬时不会漏页也不必重爬。
+        """
+        with self.get_connection() as conn:
+            count = self._upsert_posts(conn, posts) if posts else 0
+            conn.execute('''
+                INSERT INTO crawl_checkpoints (platform, user_id, cursor, pages, posts,
+                                               status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(platform, user_id) DO UPDATE SET
+                    cursor = COALESCE(excluded.cursor, crawl_checkpoints.cursor),
+                    pages = crawl_checkpoints.pages + excluded.pages,
+                    posts = crawl_checkpoints.posts + excluded.posts,
+                    status = excluded.status,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+            ''', (platform, user_id, cursor, 1 if posts is not None else 0, count,
+                  status, error, datetime.now()))
+
+    def delete_checkpoint(self, platform, user_id):
+        """删除回填进度（重新从头回填）"""
+        with self.get_connection() as conn:
+            conn.execute('DELETE FROM crawl_checkpoints WHERE platform = ? AND user_id = ?',
+                         (platform, user_id))
+
+    def enqueue_jobs(self, jobs, max_attempts=3):
+        """
+        批量加入爬取任务
+
+        Args:
+            jobs: [{platform, user_id, max_posts?, priority?}]，已有未完成任务的用户跳过
+
+        Returns:
+            新加入的任务数
+        """
+        rows = [(job['platform'], job['user_id'], job.get('max_posts', 50),
+                 job.get('priority', 0), max_attempts, datetime.now()) for job in jobs]
+        with self.get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT OR IGNORE INTO crawl_jobs (platform, user_id, max_posts, priority,
+                                                  max_attempts, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            return conn.total_changes - before
+
+    def claim_jobs(self, owner, limit=1, lease=60, platforms=None):
+        """
+        认领可执行的任务
+
+        等待中且到了可执行时间的任务，以及租约已过期（工作进程崩溃或失联）的任务
+        都可以被认领。认领是单条 UPDATE 语句，执行期间持有写锁，
+        多个进程同时认领也不会拿到同一个任务。
+
+        Returns:
+            认领到的任务列表
+        """
+        now = time.time()
+        where = ("((status = 'pending' AND available_at <= ?)"
+                 " OR (status = 'running' AND lease_until < ?))")
+        params = [now, now]
+        if platforms:
+            where += f" AND platform IN ({','.join('?' * len(platforms))})"
+            params.extend(platforms)
+        with self.get_connection() as conn:
+            # 租约过期次数达到上限的任务不再重试
+            conn.execute('''
+                UPDATE crawl_jobs SET status = 'failed', owner = NULL, lease_until = NULL,
+                    error = COALESCE(error, '租约多次过期'), updated_at = ?
+                WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts
+            ''', (datetime.now(), now))
+            cursor = conn.execute(f'''
+                UPDATE crawl_jobs SET status = 'running', owner = ?, lease_until = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id IN (SELECT id FROM crawl_jobs WHERE {where}
+                             ORDER BY priority DESC, available_at, id LIMIT ?)
+                RETURNING *
+            ''', [owner, now + lease, datetime.now()] + params + [limit])
+            return [dict(row) for row in cursor.fetchall()]
+
+    def heartbeat_jobs(self, owner, job_ids, lease=60):
+        """
+        续约
+
+        Returns:
+            仍由 owner 持有的任务 ID（其余的租约已过期并被其他进程认领）
+        """
+        if not job_ids:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.execute(f'''
+                UPDATE crawl_jobs SET lease_until = ?
+                WHERE owner = ? AND status = 'running'
+                  AND id IN ({','.join('?' * len(job_ids))})
+                RETURNING id
+            ''', [time.time() + lease, owner] + list(job_ids))
+            return [row['id'] for row in cursor.fetchall()]
+
+    def complete_job(self, job_id, owner, posts=0):
+        """任务完成，租约已丢失时返回 False"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE crawl_jobs SET status = 'done', owner = NULL, lease_until = NULL,
+                    posts = ?, error = NULL, updated_at = ?
+                WHERE id = ? AND owner = ? AND status = 'running'
+            ''', (posts, datetime.now(), job_id, owner))
+            return cursor.rowcount > 0
+
+    def fail_job(self, job_id, owner, error, retry_delay=60):
+        """
+        任务失败：未达到重试上限时按指数退避重新排队，否则标记为 failed
+
+        Returns:
+            是否会重试
+        """
+        with self.get_connection() as conn:
+            cursor = conn.execute('''
+                UPDATE crawl_jobs SET
+                    status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END,
+                    available_at = ? + ? * (1 << MIN(attempts - 1, 6)),
+                    owner = NULL, lease_until = NULL, error = ?, updated_at = ?
+                WHERE id = ? AND owner = ? AND status = 'running'
+                RETURNING status
+            ''', (time.time(), retry_delay, error, datetime.now(), job_id, owner))
+            row = cursor.fetchone()
+            return bool(row) and row['status'] == 'pending'
+
+    def release_jobs(self, owner, job_ids):
+        """工作进程退出时交还未完成的任务（不计入重试次数）"""
+        if not job_ids:
+            return 0
+        with self.get_connection() as conn:
+            cursor = conn.execute(f'''
+                UPDATE crawl_jobs SET status = 'pending', owner = NULL, lease_until = NULL,
+                    attempts = MAX(attempts - 1, 0), updated_at = ?
+                WHERE owner = ? AND status = 'running'
+                  AND id IN ({','.join('?' * len(job_ids))})
+            ''', [datetime.now(), owner] + list(job_ids))
+            return cursor.rowcount
+
+    def get_job_counts(self):
+        """各状态的任务数"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT status, COUNT(*) AS count FROM crawl_jobs GROUP BY status')
+            return {row['status']: row['count'] for row in cursor.fetchall()}
+
+    def get_rule_backfills(self, signatures):
+        """获取规则补匹配进度 {signature: 进度}"""
+        if not signatures:
+            return {}
+        with self.get_connection() as conn:
+            cursor = conn.execute(f'''
+                SELECT * FROM rule_backfills
+                WHERE signature IN ({','.join('?' * len(signatures))})
+            ''', list(signatures))
+            return {row['signature']: dict(row) for row in cursor.fetchall()}
+
+    def get_max_post_id(self):
+        """当前最大的帖子行 ID"""
+        with self.get_connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) AS max_id FROM posts').fetchone()['max_id']
+
+    def get_posts_for_match(self, after_id, limit=1000, max_id=None, terms=None):
+        """
+        按行 ID 顺序取一段帖子用于补匹配
+
+        Args:
+            terms: 归一化后的词，不为空时只取 content_normalized 包含其一的帖子
+
+        Returns:
+            (帖子列表, 本段扫描到的最大行 ID)，没有更多帖子时行 ID 为 None
+        """
+        with self.get_connection() as conn:
+            bound = 'id > ?' + (' AND id <= ?' if max_id is not None else '')
+            params = [after_id] + ([max_id] if max_id is not None else [])
+            # 先按 ID 取出本段范围，再在范围内过滤，保证没有命中的段也能推进进度
+            row = conn.execute(f'''
+                SELECT MAX(id) AS last_id FROM
+                    (SELECT id FROM posts WHERE {bound} ORDER BY id LIMIT ?)
+            ''', params + [limit]).fetchone()
+            last_id = row['last_id']
+            if last_id is None:
+                return [], None
+            query = '''
+                SELECT id, platform, post_id, user_id, content, content_normalized
+                FROM posts WHERE id > ? AND id <= ?
+            '''
+            params = [after_id, last_id]
+            if terms:
+                clause, clause_params = self._contains_any(terms, (after_id, last_id))
+                query += ' AND ' + clause
+                params.extend(clause_params)
+            cursor = conn.execute(query + ' ORDER BY id', params)
+            return [dict(row) for row in cursor.fetchall()], last_id
+
+    def start_rule_backfills(self, rules):
+        """
+        开始规则的补匹配：删除同名规则已有的匹配记录，并在同一事务中登记进度
+
+        匹配记录按规则名保存，规则内容变化后旧内容留下的记录不再准确，由补匹配按新规则
+        重新写入，同名规则旧内容的补匹配进度也一并删除。已登记过进度的规则（中断后继续）
+        不再删除。
+
+        Args:
+            rules: [(signature, name)]
+        """
+        now = datetime.now()
+        with self.get_connection() as conn:
+            started = {row['signature'] for row in conn.execute(f'''
+                SELECT signature FROM rule_backfills
+                WHERE signature IN ({','.join('?' * len(rules))})
+            ''', [signature for signature, _ in rules])}
+            fresh = [(signature, name) for signature, name in rules if signature not in started]
+            conn.executemany('DELETE FROM keyword_matches WHERE rule = ?',
+                             [(name,) for _, name in fresh])
+            # 同名规则旧内容的进度作废，改回旧内容时需要重新补匹配
+            conn.executemany('DELETE FROM rule_backfills WHERE name = ? AND signature != ?',
+                             [(name, signature) for signature, name in fresh])
+            conn.executemany('''
+                INSERT INTO rule_backfills (signature, name, updated_at) VALUES (?, ?, ?)
+            ''', [(signature, name, now) for signature, name in fresh])
+
+    def save_rule_backfills(self, progress, matches=None, status='running'):
+        """
+        保存规则补匹配进度，并在同一事务中写入该段的匹配记录
+
+        Args:
+            progress: [(signature, name, last_id, 本段匹配数)]
+            matches: [{platform, post_id, rule, keywords, spans}]，已有的记录不覆盖
+        """
+        now = datetime.now()
+        with self.get_connection() as conn:
+            if matches:
+                self._insert_keyword_matches(conn, matches, 'backfill', now)
+            conn.executemany('''
+                INSERT INTO rule_backfills (signature, name, last_id, matched, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(signature) DO UPDATE SET
+                    last_id = MAX(excluded.last_id, rule_backfills.last_id),
+                    matched = rule_backfills.matched + excluded.matched,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at
+            ''', [(signature, name, last_id, matched, status, now)
+                  for signature, name, last_id, matched in progress])
+
+    @staticmethod
+    def _insert_keyword_matches(conn, matches, source, now):
+        """写入匹配记录，同一帖子同一规则已有的记录不覆盖"""
+        conn.executemany('''
+            INSERT OR IGNORE INTO keyword_matches (platform, post_id, rule, keywords,
+                                                   spans, source, matched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(m['platform'], m['post_id'], m['rule'], m['keywords'], m['spans'], source,
+               m.get('matched_at') or now) for m in matches])
+
+    def save_keyword_matches(self, matches, source='live'):
+        """
+        批量保存匹配记录
+
+        Args:
+            matches: [{platform, post_id, rule, keywords, spans, matched_at}]，matched_at 可省略
+
+        Returns:
+            提交的记录数
+        """
+        if not matches:
+            return 0
+        with self.get_connection() as conn:
+            self._insert_keyword_matches(conn, matches, source, datetime.now())
+        return len(matches)
+
+    def get_keyword_matches(self, rule=None, limit=50, before=None):
+        """
+        按匹配时间倒序获取匹配记录（附带帖子的用户和内容）
+
+        按 (matched_at, id) 翻页，翻到后面的页也只扫描本页的索引范围。
+
+        Args:
+            rule: 只返回该规则的记录
+            before: 上一页最后一条的 (matched_at, id)，为 None 时从最新的开始
+        """
+        query = '''
+            SELECT m.*, p.user_id, p.username, p.content, p.post_url, p.published_at
+            FROM keyword_matches m
+            LEFT JOIN posts p ON p.platform = m.platform AND p.post_id = m.post_id
+            WHERE 1=1
+        '''
+        params = []
+        if rule:
+            query += ' AND m.rule = ?'
+            params.append(rule)
+        if before:
+            query += ' AND (m.matched_at, m.id) < (?, ?)'
+            params.extend(before)
+        query += ' ORDER BY m.matched_at DESC, m.id DESC LIMIT ?'
+        params.append(limit)
+        with self.get_connection() as conn:
+            return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def get_match_rules(self):
+        """有匹配记录的规则名"""
+        with self.get_connection() as conn:
+            cursor = conn.execute('SELECT DISTINCT rule FROM keyword_matches ORDER BY rule')
+            return [row['rule'] for row in cursor.fetchall()]
+
+    def resolve_user_id(self, platform, user):
+        """按用户 ID 或用户名查找已存储用户的 ID，没有时返回 None"""
+        with self.get_connection() as conn:
+            row = conn.execute('''
+                SELECT user_id FROM users WHERE platform = ? AND (user_id = ? OR username = ?)
+                ORDER BY user_id = ? DESC LIMIT 1
+            ''', (platform, user, user, user)).fetchone()
+            return row['user_id'] if row else None
+
     def get_users(self, platform=None):
         """获取用户列表"""
         with self.get_connection() as conn:
@@ -177,13 +1065,37 @@ class Database:
             return cursor.fetchone()['count']
     
     def delete_user(self, platform, user_id):
-        """删除用户及其帖子"""
+        """
+        删除用户及其帖子和帖子的匹配记录
+
+        同时清理指纹分段，组首帖子被删除的近似重复组改由最早的剩余帖子作组首。
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            posts = cursor.execute('SELECT id, simhash FROM posts WHERE platform = ? AND user_id = ?',
+                                   (platform, user_id)).fetchall()
+            cursor.executemany('DELETE FROM post_bands WHERE band = ? AND value = ? AND post = ?',
+                               [(band, value, row['id']) for row in posts if row['simhash']
+                                for band, value in bands(row['simhash'])])
+            regroups = cursor.execute('''
+                SELECT dup_of AS root, MIN(id) AS new_root FROM posts
+                WHERE dup_of IN (SELECT id FROM posts WHERE platform = ? AND user_id = ?)
+                  AND NOT (platform = ? AND user_id = ?)
+                GROUP BY dup_of
+            ''', (platform, user_id, platform, user_id)).fetchall()
+            cursor.executemany('''
+                UPDATE posts SET dup_of = CASE WHEN id = ? THEN NULL ELSE ? END WHERE dup_of = ?
+            ''', [(row['new_root'], row['new_root'], row['root']) for row in regroups])
+            cursor.execute('''
+                DELETE FROM keyword_matches WHERE platform = ? AND post_id IN
+                    (SELECT post_id FROM posts WHERE platform = ? AND user_id = ?)
+            ''', (platform, platform, user_id))
             cursor.execute('DELETE FROM posts WHERE platform = ? AND user_id = ?', 
                           (platform, user_id))
             cursor.execute('DELETE FROM users WHERE platform = ? AND user_id = ?', 
                           (platform, user_id))
+            cursor.execute('DELETE FROM crawl_checkpoints WHERE platform = ? AND user_id = ?',
+                          (platform, user_id))
 
 # 全局数据库实例
 db = Database()
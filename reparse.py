@@ -0,0 +1,68 @@
+"""
+离线重新解析归档
+把 data/archive 下的原始响应用当前解析器重新解析，并批量写回数据库，全程不访问网络
+
+用法: python reparse.py [--platform weibo] [--workers 4] [--since 20260101]
+"""
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawler.archive import ARCHIVE_DIR, list_segments, parse_segment
+from models.database import db
+from utils.logger import setup_logger
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='离线重新解析原始响应归档')
+    parser.add_argument('--archive-dir', default=str(ARCHIVE_DIR), help='归档目录')
+    parser.add_argument('--platform', choices=['weibo', 'douyin'], help='只处理指定平台')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='解析进程数')
+    parser.add_argument('--since', help='只处理该日期(YYYYMMDD)之后的段')
+    parser.add_argument('--batch', type=int, default=5000, help='每批写入条数')
+    args = parser.parse_args()
+
+    logger = setup_logger('reparse')
+    segments = list_segments(args.archive_dir, args.platform)
+    if args.since:
+        # 段文件名格式: 平台-YYYYmmdd-HHMMSS-pid-序号
+        segments = [p for p in segments if p.name.split('-')[1] >= args.since]
+    if not segments:
+        logger.info("没有找到归档段")
+        return 0
+
+    logger.info(f"开始重新解析 {len(segments)} 个归档段，进程数 {args.workers}")
+    started = time.perf_counter()
+    parsed = 0
+    written = 0
+    pending = []
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(parse_segment, path): path for path in segments}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                posts = future.result()
+            except Exception as e:
+                logger.error(f"解析失败 {path.name}: {e}")
+                continue
+            parsed += len(posts)
+            pending.extend(posts)
+            if len(pending) >= args.batch:
+                written += db.add_posts(pending)
+                pending = []
+            logger.info(f"[{done}/{len(segments)}] {path.name}: {len(posts)} 条")
+
+    written += db.add_posts(pending)
+    elapsed = time.perf_counter() - started
+    logger.info(f"完成: 解析 {parsed} 条，写入 {written} 条，耗时 {elapsed:.1f} 秒 "
+                f"({parsed / elapsed if elapsed else 0:,.0f} 条/秒)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
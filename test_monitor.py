@@ -151,6 +151,530 @@ def test_database():
         print(f"✗ 测试失败: {e}")
         return False
 
+def _check(label, actual, expected):
+    """比较结果并打印，返回是否一致"""
+    ok = actual == expected
+    print(f"{'✓' if ok else '✗'} {label}: {actual!r}" + ('' if ok else f"（期望 {expected!r}）"))
+    return ok
+
+def test_overlapping_matches():
+    """测试多模式匹配的重叠命中"""
+    print("\n" + "=" * 60)
+    print("测试重叠关键词...")
+    print("=" * 60)
+    
+    try:
+        from crawler.matcher import KeywordMatcher
+        
+        # 互相包含、首尾重叠的关键词都要各自命中
+        matcher = KeywordMatcher(['比特币', '比特', '特币', '币价', '比特币价格'])
+        text = "今天比特币价格大涨"
+        hits = sorted(matcher.find_all(text))
+        results = [
+            _check("全部命中", [(text[start:end], keyword) for start, end, keyword in hits],
+                   [('比特', '比特'), ('比特币', '比特币'), ('比特币价格', '比特币价格'),
+                    ('特币', '特币'), ('币价', '币价')]),
+            # 命中位置对应原文，中间夹着标点、空格和繁体字也一样
+            _check("原文位置", [("【新 品】優惠🔥"[start:end]) for start, end, _ in
+                            KeywordMatcher(['新品优惠']).find_all("【新 品】優惠🔥")], ['新 品】優惠']),
+            _check("自身重叠", len(KeywordMatcher(['aa']).find_all("aaaa")), 3),
+            _check("全部匹配模式", KeywordMatcher(['比特', '币价', '以太坊']).matched_keywords(text, 'all'),
+                   []),
+        ]
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_backfill_end_of_history():
+    """测试历史回填翻过最后一页时结束而不是报错"""
+    print("\n" + "=" * 60)
+    print("测试历史回填结束...")
+    print("=" * 60)
+    
+    try:
+        from crawler.weibo_crawler import WeiboCrawler
+        
+        class FakeResponse:
+            def __init__(self, body):
+                self.status_code = 200
+                self.content = body
+        
+        def make_crawler(body):
+            crawler = WeiboCrawler()
+            crawler.get = lambda url, params=None: FakeResponse(body)
+            crawler._get_container_id = lambda user_id: '1076031234567890'
+            return crawler
+        
+        results = []
+        # 最后一页之后接口返回 ok: 0、没有卡片
+        for body in ('{"ok": 0, "msg": "这里还没有内容", "data": {"cards": []}}'.encode(),
+                     b'{"ok": 0, "msg": "no more"}'):
+            results.append(_check("返回空页且没有下一页游标",
+                                  make_crawler(body).get_posts_page('1234567890', 'page:42'),
+                                  ([], None)))
+        # 正常的空页同样结束
+        results.append(_check("ok: 1 的空页",
+                              make_crawler(b'{"ok": 1, "data": {"cards": []}}').get_posts_page(
+                                  '1234567890', 'page:42'),
+                              ([], None)))
+        # 第一页的 ok: 0 可能是暂时出错，按失败处理，不能当作没有帖子
+        try:
+            make_crawler(b'{"ok": 0, "msg": "busy"}').get_posts_page('1234567890')
+            results.append(_check("第一页 ok: 0 按失败处理", '未报错', '报错'))
+        except Exception as e:
+            results.append(_check("第一页 ok: 0 按失败处理", type(e).__name__, 'CrawlerRequestError'))
+        results.append(_check("最新帖子探测不受影响",
+                              make_crawler(b'{"ok": 0, "msg": "busy"}')._fetch_page(
+                                  '1234567890', '1076031234567890', 1), None))
+        # 带着卡片的 ok: 0 仍按失败处理，交给重试
+        try:
+            make_crawler(b'{"ok": 0, "data": {"cards": [{"card_type": 9}]}}').get_posts_page(
+                '1234567890', 'page:42')
+            results.append(_check("ok: 0 带卡片按失败处理", '未报错', '报错'))
+        except Exception as e:
+            results.append(_check("ok: 0 带卡片按失败处理", type(e).__name__, 'CrawlerRequestError'))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_normalization():
+    """测试文本归一化保留符号和表情"""
+    print("\n" + "=" * 60)
+    print("测试文本归一化...")
+    print("=" * 60)
+    
+    try:
+        from utils.text import normalize
+        from crawler.matcher import KeywordMatcher
+        from crawler.rules import Rule, RuleSet, keywords_query
+        
+        results = [
+            _check("C++", normalize("C++"), "c++"),
+            _check("全角符号", normalize("＄BTC"), "$btc"),
+            _check("只有表情", normalize("🚀"), "🚀"),
+            _check("表情肤色", normalize("👍🏻"), "👍"),
+            _check("C#", normalize("Ｃ＃"), "c#"),
+            _check("词内标点保留", normalize("AT&T 涨价 100% @张三"), "at&t涨价100%@张三"),
+            _check("标点仍然去掉", normalize("【新 品】優惠！"), "新品优惠"),
+            _check("C# 不命中 C", KeywordMatcher(['C#']).matched_keywords("我在学 C 语言"), []),
+            _check("C++ 不命中 C", KeywordMatcher(['C++']).matched_keywords("我在学 C 语言"), []),
+            _check("C++ 命中 C++", KeywordMatcher(['C++']).matched_keywords("我在学 c++ 语言"),
+                   ['C++']),
+            _check("表情关键词", KeywordMatcher(['🚀']).matched_keywords("冲冲冲🚀🚀"), ['🚀']),
+            _check("表情关键词可作规则", keywords_query(['🚀']), '"🚀"'),
+            _check("表情规则命中", bool(RuleSet([Rule('表情', '"🚀" 比特币')]).match("比特币🚀")), True),
+        ]
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_rule_precedence():
+    """测试组合规则的运算符优先级：NOT > AND > OR"""
+    print("\n" + "=" * 60)
+    print("测试规则优先级...")
+    print("=" * 60)
+    
+    try:
+        from crawler.rules import Rule, RuleSet
+        
+        def matched(query, text):
+            return bool(RuleSet([Rule('测试', query)]).match(text))
+        
+        results = [
+            # a OR b AND c 等价于 a OR (b AND c)
+            _check("OR 低于 AND（只有 a）", matched("比特币 OR 以太坊 AND 暴涨", "比特币"), True),
+            _check("OR 低于 AND（只有 b）", matched("比特币 OR 以太坊 AND 暴涨", "以太坊"), False),
+            _check("括号改变优先级", matched("(比特币 OR 以太坊) AND 暴涨", "比特币"), False),
+            # 相邻的词隐含 AND，NOT 只作用于紧跟的一项
+            _check("隐含 AND", matched("比特币 暴涨", "比特币横盘"), False),
+            _check("NOT 先结合", matched("NOT 广告 比特币", "比特币暴涨"), True),
+            _check("NOT 不越过 AND", matched("NOT 广告 比特币", "广告比特币"), False),
+            _check("NOT 不越过 OR", matched("NOT 广告 OR 比特币", "广告比特币"), True),
+        ]
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_mixed_timezone_seed():
+    """测试带时区和不带时区的发帖时间混在一起时的调度估算"""
+    print("\n" + "=" * 60)
+    print("测试混合时区的调度初值...")
+    print("=" * 60)
+    
+    import tempfile
+    from datetime import datetime, timedelta, timezone
+    try:
+        from models.database import Database
+        from crawler.scheduler import PollScheduler
+        from crawler.manager import _is_newer
+        
+        # 临时数据库，不影响正在使用的数据
+        with tempfile.TemporaryDirectory() as tmp:
+            temp_db = Database.__new__(Database)
+            temp_db.db_path = os.path.join(tmp, 'test.db')
+            temp_db.init_database()
+            
+            base = datetime.now().replace(microsecond=0) - timedelta(hours=10)
+            for i in range(6):
+                published = base + timedelta(hours=i)
+                if i % 2:
+                    # 旧数据库中带时区的时间
+                    published = published.astimezone(timezone(timedelta(hours=8)))
+                temp_db.add_post('weibo', f'p{i}', 'u1', '测试用户', f'第 {i} 条',
+                                 published_at=published.isoformat())
+            times = temp_db.get_recent_publish_times('weibo', 'u1')
+            
+            results = [
+                _check("读出的时间都不带时区", all(t.tzinfo is None for t in times), True),
+                _check("按本地时间换算", sorted(times)[1], base + timedelta(hours=1)),
+            ]
+            
+            scheduler = PollScheduler(min_interval=60, max_interval=86400)
+            scheduler.sync([('weibo', 'u1', 1.0)], {'weibo': 300},
+                           history=temp_db.get_recent_publish_times)
+            schedule = scheduler._users[('weibo', 'u1')]
+            results.append(_check("平均发帖间隔", schedule.avg_gap, 3600.0))
+            # 之后新发现的帖子（不带时区）继续更新
+            scheduler.record_result('weibo', 'u1', 1, [base + timedelta(hours=6)])
+            results.append(_check("新帖时间", schedule.last_post_at, base + timedelta(hours=6)))
+            
+            # 非数字 ID 按发布时间比较，已存储的是带时区的 UTC 时间
+            stored = {'post_id': 'a', 'published_at': (base + timedelta(hours=5)).astimezone(
+                timezone.utc).isoformat()}
+            newer = {'post_id': 'b', 'published_at': (base + timedelta(hours=6)).isoformat()}
+            older = {'post_id': 'c', 'published_at': (base + timedelta(hours=4)).isoformat()}
+            results.append(_check("更新的帖子", _is_newer(newer, stored), True))
+            results.append(_check("更旧的帖子", _is_newer(older, stored), False))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_circuit_breaker():
+    """测试熔断器的打开、半开探测和关闭"""
+    print("\n" + "=" * 60)
+    print("测试熔断器状态转换...")
+    print("=" * 60)
+    
+    import time
+    try:
+        from crawler.resilience import (CircuitBreaker, RESULT_BLOCKED,
+                                        STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN)
+        
+        breaker = CircuitBreaker('test', window=10, min_requests=4, failure_rate=0.5,
+                                 cooldown=0.1, max_cooldown=0.4)
+        for _ in range(2):
+            breaker.record_success()
+        breaker.record_failure()
+        results = [_check("错误率未达阈值", breaker.state, STATE_CLOSED)]
+        breaker.record_failure()
+        results.append(_check("错误率达到阈值打开", breaker.state, STATE_OPEN))
+        results.append(_check("打开时拒绝请求", breaker.allow_request(), False))
+        
+        time.sleep(0.15)
+        results.append(_check("冷却后半开", breaker.state, STATE_HALF_OPEN))
+        results.append(_check("放行一个探测", breaker.allow_request(), True))
+        results.append(_check("探测期间不再放行", breaker.allow_request(), False))
+        breaker.record_failure()
+        results.append(_check("探测失败重新打开", breaker.state, STATE_OPEN))
+        time.sleep(0.15)
+        results.append(_check("冷却时间加倍", breaker.state, STATE_OPEN))
+        
+        time.sleep(0.1)
+        results.append(_check("加倍冷却后半开", breaker.state, STATE_HALF_OPEN))
+        breaker.allow_request()
+        breaker.record_success()
+        results.append(_check("探测成功关闭", breaker.state, STATE_CLOSED))
+        results.append(_check("关闭后放行", breaker.allow_request(), True))
+        
+        breaker.record_failure(RESULT_BLOCKED)
+        results.append(_check("418 直接打开", breaker.state, STATE_OPEN))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_job_lease():
+    """测试共享任务队列的认领、租约过期和重新认领"""
+    print("\n" + "=" * 60)
+    print("测试任务租约...")
+    print("=" * 60)
+    
+    import tempfile
+    try:
+        from models.database import Database
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            temp_db = Database.__new__(Database)
+            temp_db.db_path = os.path.join(tmp, 'test.db')
+            temp_db.init_database()
+            
+            jobs = [{'platform': 'weibo', 'user_id': 'u1'}, {'platform': 'weibo', 'user_id': 'u2'}]
+            results = [
+                _check("加入任务", temp_db.enqueue_jobs(jobs), 2),
+                _check("未完成的任务不重复加入", temp_db.enqueue_jobs(jobs[:1]), 0),
+            ]
+            
+            first = temp_db.claim_jobs('a', limit=1, lease=60)
+            # 租约为负数，认领后立即过期，相当于工作进程失联
+            second = temp_db.claim_jobs('b', limit=5, lease=-1)
+            results.append(_check("各认领一个", (len(first), len(second)), (1, 1)))
+            results.append(_check("不会认领同一任务", first[0]['id'] != second[0]['id'], True))
+            
+            reclaimed = temp_db.claim_jobs('c', limit=5, lease=60)
+            results.append(_check("过期任务被重新认领", [job['id'] for job in reclaimed],
+                                  [second[0]['id']]))
+            results.append(_check("重新认领计入次数", reclaimed[0]['attempts'], 2))
+            results.append(_check("原持有者续约失败", temp_db.heartbeat_jobs('b', [second[0]['id']]), []))
+            results.append(_check("原持有者不能完成", temp_db.complete_job(second[0]['id'], 'b'), False))
+            results.append(_check("新持有者完成", temp_db.complete_job(second[0]['id'], 'c', posts=3), True))
+            results.append(_check("未过期的租约不被抢", temp_db.claim_jobs('d', limit=5), []))
+            
+            # 过期次数达到上限后标记为失败，不再认领
+            temp_db.enqueue_jobs([{'platform': 'weibo', 'user_id': 'u3'}], max_attempts=1)
+            temp_db.claim_jobs('e', limit=5, lease=-1)
+            results.append(_check("达到上限不再认领", temp_db.claim_jobs('f', limit=5), []))
+            results.append(_check("任务状态", temp_db.get_job_counts(),
+                                  {'running': 1, 'done': 1, 'failed': 1}))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_seen_filter():
+    """测试已见帖子过滤的误判、容量上限和过期"""
+    print("\n" + "=" * 60)
+    print("测试已见帖子过滤...")
+    print("=" * 60)
+    
+    try:
+        from crawler.seen import SeenFilter
+        
+        seen = SeenFilter(max_size=20000, ttl=100)
+        for i in range(20000):
+            seen.check_and_add('weibo', str(i), now=0)
+        # 没见过的帖子不应被当成见过（键是 64 位哈希，误判只会来自哈希碰撞）
+        false_positives = sum(seen.check_and_add('weibo', f'x{i}', now=1) for i in range(20000))
+        results = [
+            _check("没见过的帖子误判数", false_positives, 0),
+            _check("容量不超过上限", len(seen), 20000),
+            _check("其他平台的同 ID 不算见过", seen.check_and_add('douyin', 'x1', now=1), False),
+        ]
+        
+        seen = SeenFilter(max_size=3, ttl=100)
+        for post_id in 'abc':
+            seen.check_and_add('weibo', post_id, now=0)
+        results.append(_check("见过的帖子", seen.check_and_add('weibo', 'a', now=1), True))
+        seen.check_and_add('weibo', 'd', now=2)
+        results.append(_check("超出容量淘汰最久未见的", seen.check_and_add('weibo', 'b', now=3), False))
+        results.append(_check("最近见过的保留", seen.check_and_add('weibo', 'a', now=4), True))
+        results.append(_check("过期后不算见过", seen.check_and_add('weibo', 'a', now=200), False))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_simhash_index():
+    """测试近似重复索引的分段查找和淘汰"""
+    print("\n" + "=" * 60)
+    print("测试近似重复索引...")
+    print("=" * 60)
+    
+    try:
+        from utils.simhash import SimHashIndex, simhash, distance, BAND_BITS
+        from utils.text import normalize
+        
+        base = 0x0123456789ABCDEF
+        # 距离 3，翻转的位都在第 0 段，其余三段相同
+        near = base ^ 0b111
+        # 距离 4，每段翻转一位，没有完全相同的段，分段查找不到
+        spread = base ^ sum(1 << (band * BAND_BITS) for band in range(4))
+        # 与两者距离都超过阈值，但有相同的段，会作为候选核对距离
+        far = base ^ (0b111111 << 3)
+        
+        index = SimHashIndex(max_size=3, ttl=100)
+        index.add('a', base, now=0)
+        index.add('b', near, now=1)
+        results = [
+            _check("近似重复返回最早的", index.find(near, now=2), 'a'),
+            _check("每段都不同时查不到", index.find(spread, now=2), None),
+            _check("距离超过阈值", index.find(far, now=2), None),
+        ]
+        
+        index.add('c', far, now=3)
+        index.add('d', spread, now=4)
+        results.append(_check("超出容量淘汰最早的", index.find(base, now=5), 'b'))
+        results.append(_check("容量", len(index), 3))
+        index.add('e', far ^ (1 << 63), now=50)
+        # t=120 时只有 'e' 没过期（ttl 100）
+        results.append(_check("过期淘汰", index.find(base, now=120), None))
+        results.append(_check("过期后的数量", len(index), 1))
+        results.append(_check("分段表同步清理", len(index._bands), 4))
+        
+        text = normalize("今天发布会上公布了新款手机的价格和上市时间，大家怎么看")
+        edited = normalize("今天发布会上公布了新款手机的价格和上市时间，大家怎么看？转发")
+        results.append(_check("改几个字的帖子指纹接近",
+                              distance(simhash(text), simhash(edited)) <= 5, True))
+        results.append(_check("太短的文本没有指纹", simhash(normalize("好的")), None))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_match_pagination():
+    """测试匹配记录按 (matched_at, id) 翻页"""
+    print("\n" + "=" * 60)
+    print("测试匹配记录翻页...")
+    print("=" * 60)
+    
+    import tempfile
+    from datetime import datetime, timedelta
+    try:
+        from models.database import Database
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            temp_db = Database.__new__(Database)
+            temp_db.db_path = os.path.join(tmp, 'test.db')
+            temp_db.init_database()
+            
+            base = datetime(2024, 1, 1, 12, 0)
+            # 同一时间的多条记录，翻页时靠 id 区分
+            matches = [{'platform': 'weibo', 'post_id': f'p{i}', 'rule': '新品' if i % 3 else '优惠',
+                        'keywords': '新品', 'spans': '[]',
+                        'matched_at': base + timedelta(minutes=i // 2)} for i in range(8)]
+            temp_db.save_keyword_matches(matches)
+            
+            pages = []
+            before = None
+            while True:
+                page = temp_db.get_keyword_matches(limit=3, before=before)
+                if not page:
+                    break
+                pages.append([row['post_id'] for row in page])
+                before = (page[-1]['matched_at'], page[-1]['id'])
+            
+            results = [
+                _check("分页", pages, [['p7', 'p6', 'p5'], ['p4', 'p3', 'p2'], ['p1', 'p0']]),
+            ]
+            first = temp_db.get_keyword_matches(rule='新品', limit=2)
+            second = temp_db.get_keyword_matches(rule='新品', limit=2,
+                                                 before=(first[-1]['matched_at'], first[-1]['id']))
+            results.append(_check("按规则翻页", [row['post_id'] for row in first + second],
+                                  ['p7', 'p5', 'p4', 'p2']))
+            results.append(_check("附带帖子内容的连接不丢记录",
+                                  len(temp_db.get_keyword_matches(limit=100)), 8))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_metric_alerts():
+    """测试互动数据的阈值和增长提醒"""
+    print("\n" + "=" * 60)
+    print("测试互动数据提醒...")
+    print("=" * 60)
+    
+    try:
+        from crawler.metric_alerts import MetricAlerts, MetricRule
+        
+        alerts = MetricAlerts([
+            MetricRule('评论破千', 'comments', above=1000),
+            MetricRule('点赞暴涨', 'likes', increase=500, window=3600),
+            MetricRule('只看 u2', 'shares', above=10, users=['u2']),
+        ])
+        
+        def fired(previous, current, now, user='u1', post='p1'):
+            return [alert['rule'] for alert in
+                    alerts.check('weibo', post, user, previous, current, now=now)]
+        
+        results = [
+            _check("未到阈值", fired({'comments': 900}, {'comments': 999}, 0), []),
+            _check("越过阈值", fired({'comments': 999}, {'comments': 1000}, 10), ['评论破千']),
+            _check("已在阈值之上不重复", fired({'comments': 1000}, {'comments': 1500}, 20), []),
+            _check("新帖子直接超过阈值", fired(None, {'comments': 2000}, 30, post='p2'), ['评论破千']),
+            _check("范围外的用户", fired({'shares': 0}, {'shares': 20}, 40), []),
+            _check("范围内的用户", fired({'shares': 0}, {'shares': 20}, 40, user='u2', post='p3'),
+                   ['只看 u2']),
+        ]
+        
+        # 增长规则：以写入前的数值和时间作起点
+        previous = {'likes': 100, 'updated_at': 1000.0}
+        results.append(_check("增长不足", fired(previous, {'likes': 400}, 1600, post='p4'), []))
+        results.append(_check("窗口内增长达到", fired({'likes': 400}, {'likes': 700}, 2000, post='p4'),
+                              ['点赞暴涨']))
+        results.append(_check("窗口内不重复提醒",
+                              fired({'likes': 700}, {'likes': 1500}, 2500, post='p4'), []))
+        # 超出窗口的采样丢弃，从窗口内最早的数值算起
+        results.append(_check("窗口外的增长不算",
+                              fired({'likes': 1500}, {'likes': 1600}, 5800, post='p4'), []))
+        results.append(_check("没有起点不提醒", fired(None, {'likes': 9000}, 6000, post='p5'), []))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
+def test_post_search_index():
+    """测试帖子全文索引搜索和规则修改后的旧匹配记录清理"""
+    print("\n" + "=" * 60)
+    print("测试帖子搜索索引...")
+    print("=" * 60)
+    
+    import tempfile
+    try:
+        from models.database import Database
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            temp_db = Database.__new__(Database)
+            temp_db.db_path = os.path.join(tmp, 'test.db')
+            temp_db.init_database()
+            
+            for i, text in enumerate(['今天发布新品啦', '限时優惠，C# 教程', '新品上市，限时优惠']):
+                temp_db.add_post('weibo', f'p{i}', 'u1', '测试用户', text)
+            temp_db.upsert_post('weibo', 'p0', 'u1', '测试用户', '内容改了')
+            
+            def search(text):
+                return sorted(post['post_id'] for post in temp_db.get_posts(search=text))
+            
+            results = [
+                _check("全文索引搜索", search('限时优惠'), ['p1', 'p2']),
+                _check("短词逐行比较", search('新品'), ['p2']),
+                _check("修改后的内容", search('内容改了'), ['p0']),
+                _check("补匹配预过滤", [post['post_id'] for post in
+                                        temp_db.get_posts_for_match(0, 10, None, ['c#教程', '新品上市'])[0]],
+                       ['p1', 'p2']),
+            ]
+            
+            match = {'platform': 'weibo', 'post_id': 'p2', 'keywords': '[]', 'spans': '[]'}
+            temp_db.save_keyword_matches([dict(match, rule='新品'), dict(match, rule='优惠')])
+            temp_db.start_rule_backfills([('新品 v2', '新品')])
+            temp_db.save_keyword_matches([dict(match, rule='新品', post_id='p0')])
+            # 中断后继续不再删除
+            temp_db.start_rule_backfills([('新品 v2', '新品')])
+            results.append(_check("规则修改后删除旧记录",
+                                  sorted((row['rule'], row['post_id'])
+                                         for row in temp_db.get_keyword_matches()),
+                                  [('优惠', 'p2'), ('新品', 'p0')]))
+        return all(results)
+        
+    except Exception as e:
+        print(f"✗ 测试失败: {e}")
+        return False
+
 def main():
     """主测试函数"""
     print("\n" + "=" * 60)
@@ -162,6 +686,18 @@ def main():
         ("关键词匹配", test_keyword_matching),
         ("配置操作", test_config_operations),
         ("数据库操作", test_database),
+        ("重叠关键词", test_overlapping_matches),
+        ("回填结束", test_backfill_end_of_history),
+        ("文本归一化", test_normalization),
+        ("规则优先级", test_rule_precedence),
+        ("混合时区", test_mixed_timezone_seed),
+        ("熔断器", test_circuit_breaker),
+        ("任务租约", test_job_lease),
+        ("已见帖子", test_seen_filter),
+        ("近似重复索引", test_simhash_index),
+        ("匹配记录翻页", test_match_pagination),
+        ("互动数据提醒", test_metric_alerts),
+        ("帖子搜索索引", test_post_search_index),
     ]
     
     results = []
@@ -0,0 +1,143 @@
+"""
+SimHash 指纹 - 近似重复检测
+
+对归一化后的文本按字符 n-gram 计算 64 位 SimHash，内容相近的帖子指纹的
+汉明距离很小。指纹切成 BANDS 段，距离不超过 BANDS - 1 的两条指纹至少有一段
+完全相同（抽屉原理），因此只需按段精确查找候选再核对距离，不必逐条比较。
+MAX_DISTANCE 比 BANDS - 1 大一点：短帖子改几个字距离常到 4～5，这部分大多也能
+通过分段找到（不保证全部找到），分段更多则候选太多、查找变慢。
+"""
+import hashlib
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+SHINGLE = 2  # n-gram 长度（字符），中文短文本用二元组更稳定
+MIN_LENGTH = 10  # 归一化文本短于该长度的不计算指纹（太短的文本指纹不可靠）
+BANDS = 4  # 分段数
+BAND_BITS = 64 // BANDS
+MAX_DISTANCE = 5  # 视为近似重复的最大汉明距离
+
+_MASK64 = (1 << 64) - 1
+_BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def _hash64(text: str) -> int:
+    """稳定的 64 位哈希（内置 hash() 每个进程的种子不同）"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(normalized: str) -> Optional[int]:
+    """
+    计算归一化文本的指纹（有符号 64 位整数，可直接存入 SQLite）
+
+    Returns:
+        指纹，文本太短时为 None
+    """
+    if not normalized or len(normalized) < MIN_LENGTH:
+        return None
+    weights = [0] * 64
+    shingles = Counter(normalized[i:i + SHINGLE] for i in range(len(normalized) - SHINGLE + 1))
+    for shingle, count in shingles.items():
+        value = _hash64(shingle)
+        for bit in range(64):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    result = 0
+    for bit in range(64):
+        if weights[bit] > 0:
+            result |= 1 << bit
+    return _to_signed(result)
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin((a ^ b) & _MASK64).count('1')
+
+
+def bands(fingerprint: int) -> List[Tuple[int, int]]:
+    """指纹的分段 [(段号, 段值)]"""
+    value = fingerprint & _MASK64
+    return [(band, value >> (band * BAND_BITS) & _BAND_MASK) for band in range(BANDS)]
+
+
+def nearest(fingerprint: int, candidates: Iterable[Tuple[int, int]],
+            max_distance: int = MAX_DISTANCE) -> Optional[int]:
+    """
+    在候选 [(键, 指纹)] 中找距离不超过 max_distance 的，返回键最小的（最早的）
+
+    Returns:
+        候选的键，没有近似重复时为 None
+    """
+    best = None
+    for key, other in candidates:
+        if other is not None and distance(fingerprint, other) <= max_distance:
+            if best is None or key < best:
+                best = key
+    return best
+
+
+class SimHashIndex:
+    """
+    内存中的近似重复索引（按分段查找），有容量上限并按时间淘汰
+
+    Args:
+        max_size: 最多保留的指纹数，超出时淘汰最早加入的
+        ttl: 指纹保留时间(秒)
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Hashable, Tuple[int, float]]' = OrderedDict()
+        self._bands: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find(self, fingerprint: int, now: Optional[float] = None) -> Optional[Hashable]:
+        """查找近似重复的键（最早加入的），没有时返回 None"""
+        self._evict(time.monotonic() if now is None else now)
+        best = None
+        for band in bands(fingerprint):
+            for key in self._bands.get(band, ()):
+                if distance(fingerprint, self._entries[key][0]) <= MAX_DISTANCE:
+                    if best is None or self._entries[key][1] < self._entries[best][1]:
+                        best = key
+        return best
+
+    def add(self, key: Hashable, fingerprint: int, now: Optional[float] = None):
+        """加入指纹"""
+        now = time.monotonic() if now is None else now
+        self._remove(key)
+        self._entries[key] = (fingerprint, now)
+        for band in bands(fingerprint):
+            self._bands.setdefault(band, set()).add(key)
+        self._evict(now)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in bands(entry[0]):
+            keys = self._bands.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._bands[band]
+
+    def _evict(self, now: float):
+        """淘汰超出容量和过期的指纹"""
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+        while self._entries:
+            key, (_, added_at) = next(iter(self._entries.items()))
+            if now - added_at <= self.ttl:
+                break
+            self._remove(key)
@@ -0,0 +1,117 @@
+"""
+文本归一化 - 关键词匹配和帖子搜索共用
+
+逐字符处理：NFKC（全角转半角、兼容字符归一）、转小写、繁体转简体，
+去掉标点、空白以及零宽、控制字符。数学、货币符号和表情保留，# % & @ 这几个
+常出现在词里的标点也保留，"C++"、"C#"、"$BTC"、"AT&T"、只有表情的关键词归一化后
+不会变样或变成空。入库时计算一次存入
+posts.content_normalized，匹配和搜索都直接使用，不必每次查询都重新归一化。
+"""
+import unicodedata
+from typing import List, Tuple
+
+# 归一化规则的版本，规则变化时加一，数据库据此重新计算已存储帖子的归一化内容
+NORMALIZE_VERSION = 3
+
+# 删除的字符类别：标点、修饰符号（含表情肤色）、空白、控制和格式字符（零宽字符属于 Cf）、
+# 附加符号（表情变体选择符等）
+_DROP_CATEGORIES = {'Pc', 'Pd', 'Ps', 'Pe', 'Pi', 'Pf', 'Po',
+                    'Sk',
+                    'Zs', 'Zl', 'Zp', 'Cc', 'Cf', 'Mn', 'Me'}
+
+# 虽属标点但保留的字符："C#"、"100%"、"AT&T"、"@用户" 去掉后意思就变了
+_KEEP_CHARS = frozenset('#%&@')
+
+# 常用繁体字 -> 简体字（一对一，覆盖社交平台文本中最常见的部分）
+_T2S_PAIRS = (
+    '萬万 與与 醜丑 專专 業业 叢丛 東东 絲丝 兩两 嚴严 喪丧 個个 豐丰 臨临 為为 麗丽 舉举 '
+    '義义 烏乌 樂乐 喬乔 習习 鄉乡 書书 買买 亂乱 爭争 於于 虧亏 雲云 亞亚 產产 畝亩 親亲 '
+    '億亿 僅仅 從从 侖仑 倉仓 儀仪 們们 價价 眾众 優优 會会 傘伞 偉伟 傳传 傷伤 倫伦 偽伪 '
+    '體体 餘余 傭佣 僉佥 俠侠 侶侣 僥侥 偵侦 側侧 僑侨 儈侩 儕侪 儂侬 俁俣 儔俦 儼俨 倆俩 '
+    '儷俪 儉俭 債债 傾倾 僂偻 僨偾 償偿 儲储 兒儿 兌兑 黨党 蘭兰 關关 興兴 養养 獸兽 內内 '
+    '岡冈 冊册 寫写 軍军 農农 馮冯 沖冲 決决 況况 凍冻 淨净 涼凉 減减 湊凑 凜凛 幾几 鳳凤 '
+    '憑凭 凱凯 擊击 鑿凿 劃划 劉刘 則则 剛刚 創创 刪删 別别 剗刬 劑剂 剮剐 劍剑 劇剧 勸劝 '
+    '辦办 務务 動动 勵励 勁劲 勞劳 勢势 勳勋 勻匀 匯汇 區区 醫医 華华 協协 單单 賣卖 盧卢 '
+    '衛卫 卻却 廠厂 廳厅 曆历 厲厉 壓压 厭厌 廁厕 縣县 參参 雙双 發发 變变 敘叙 臺台 葉叶 '
+    '號号 嘆叹 嘰叽 嚇吓 呂吕 嗎吗 啟启 吳吴 聽听 員员 響响 唄呗 啞哑 喚唤 嘩哗 喲哟 嘍喽 '
+    '嗆呛 嚨咙 團团 園园 圍围 圖图 圓圆 國国 聖圣 場场 壞坏 塊块 堅坚 壇坛 壩坝 墳坟 墜坠 '
+    '壘垒 墾垦 壯壮 聲声 殼壳 壺壶 處处 備备 複复 頭头 誇夸 夾夹 奪夺 奮奋 奧奥 婦妇 媽妈 '
+    '嫵妩 姍姗 姦奸 婁娄 嬰婴 嬌娇 孫孙 學学 寧宁 寶宝 實实 寵宠 審审 憲宪 宮宫 寬宽 賓宾 '
+    '寢寝 對对 尋寻 導导 壽寿 將将 爾尔 塵尘 嘗尝 屍尸 盡尽 層层 屆届 屬属 歲岁 豈岂 島岛 '
+    '嶺岭 嶽岳 峽峡 崗岗 嵐岚 巖岩 幣币 帥帅 師师 帳帐 帶带 幫帮 幹干 庫库 廣广 莊庄 慶庆 '
+    '廢废 開开 異异 棄弃 張张 彌弥 彎弯 彈弹 強强 歸归 當当 錄录 彙汇 彥彦 徹彻 徑径 後后 '
+    '復复 憶忆 懷怀 態态 慫怂 憐怜 總总 懇恳 惡恶 惱恼 悅悦 懸悬 驚惊 慘惨 慣惯 憤愤 願愿 '
+    '應应 戀恋 戲戏 戰战 戶户 撲扑 執执 擴扩 掃扫 揚扬 擾扰 撫抚 搶抢 護护 報报 擔担 擬拟 '
+    '攏拢 揀拣 擁拥 攔拦 擰拧 撥拨 擇择 掛挂 摯挚 捲卷 掄抡 換换 損损 搖摇 擺摆 攝摄 擠挤 '
+    '據据 擋挡 撐撑 擱搁 攜携 數数 斂敛 斷断 無无 舊旧 時时 曠旷 暢畅 暫暂 曉晓 暈晕 術术 '
+    '機机 殺杀 雜杂 權权 條条 來来 楊杨 極极 構构 槍枪 標标 棟栋 欄栏 樹树 樣样 橋桥 檢检 '
+    '樓楼 歡欢 歐欧 殘残 殲歼 毀毁 畢毕 氣气 漢汉 湯汤 溝沟 沒没 滬沪 淚泪 潑泼 澤泽 潔洁 '
+    '灑洒 濃浓 漣涟 測测 濟济 渾浑 濤涛 漲涨 澀涩 淵渊 漁渔 溫温 遊游 灣湾 濕湿 滅灭 燈灯 '
+    '靈灵 災灾 爐炉 點点 煉炼 爛烂 熱热 煩烦 燒烧 營营 愛爱 爺爷 牆墙 狀状 獨独 獅狮 獄狱 '
+    '貓猫 獻献 環环 現现 瑪玛 璽玺 甕瓮 電电 畫画 療疗 瘋疯 癢痒 盤盘 蓋盖 監监 盜盗 睜睁 '
+    '礦矿 碼码 磚砖 確确 礎础 禮礼 禍祸 禪禅 離离 種种 積积 穩稳 稱称 窮穷 竊窃 競竞 筆笔 '
+    '築筑 簡简 類类 糧粮 紀纪 約约 紅红 級级 紙纸 紛纷 細细 終终 組组 經经 結结 給给 絡络 '
+    '統统 繼继 績绩 續续 維维 綠绿 網网 線线 練练 縮缩 繩绳 罷罢 羅罗 聯联 聰聪 職职 聞闻 '
+    '腸肠 膚肤 腦脑 臉脸 膽胆 脫脱 腫肿 臟脏 艦舰 艱艰 藝艺 節节 蘇苏 蘋苹 範范 茲兹 莖茎 '
+    '薦荐 藥药 獲获 蕭萧 蓮莲 蟲虫 雖虽 蝦虾 螞蚂 蠶蚕 衝冲 補补 襯衬 裝装 製制 見见 規规 '
+    '視视 覺觉 覽览 觀观 觸触 計计 訂订 認认 討讨 讓让 訓训 議议 記记 講讲 許许 論论 設设 '
+    '訪访 證证 評评 識识 詞词 試试 詩诗 話话 誠诚 該该 詳详 語语 誤误 說说 請请 讀读 課课 '
+    '誰谁 調调 談谈 謝谢 謠谣 謎谜 譜谱 豎竖 豬猪 貝贝 負负 財财 貢贡 貨货 販贩 貧贫 購购 '
+    '貫贯 責责 貴贵 費费 貼贴 貿贸 資资 賈贾 賊贼 賞赏 賬账 賭赌 賺赚 賽赛 贊赞 贈赠 贏赢 '
+    '趕赶 趙赵 趨趋 躍跃 蹤踪 車车 軌轨 轉转 輪轮 軟软 較较 載载 輕轻 輛辆 輸输 辭辞 邊边 '
+    '遼辽 達达 遷迁 過过 邁迈 運运 還还 這这 進进 遠远 違违 連连 遲迟 適适 選选 遺遗 鄧邓 '
+    '鄭郑 鄰邻 醬酱 釋释 針针 釣钓 鈔钞 鈴铃 鐵铁 銀银 銅铜 鋁铝 銷销 鋒锋 鋪铺 鏈链 錯错 '
+    '錢钱 鋼钢 錶表 鍋锅 鍵键 鎖锁 鏡镜 鐘钟 鑰钥 長长 門门 閃闪 閉闭 問问 閒闲 間间 悶闷 '
+    '閱阅 闊阔 隊队 陽阳 陰阴 陣阵 階阶 際际 陸陆 隨随 險险 隱隐 難难 雞鸡 霧雾 靜静 韓韩 '
+    '頁页 頂顶 項项 順顺 須须 預预 領领 頻频 題题 額额 顏颜 顧顾 顯显 風风 飛飞 飯饭 飲饮 '
+    '餅饼 館馆 饑饥 餓饿 馬马 駕驾 驗验 騎骑 驅驱 驟骤 髮发 鬆松 鬥斗 鬧闹 魚鱼 鮮鲜 鳥鸟 '
+    '鴨鸭 鵝鹅 麥麦 黃黄 齊齐 齒齿 龍龙 龜龟 檯台 濾滤 摺折 讚赞 羣群 獎奖 訊讯 虛虚 '
+)
+_T2S = {pair[0]: pair[1] for pair in _T2S_PAIRS.split()}
+
+
+class _NormalizeTable(dict):
+    """逐字符归一化表（供 str.translate 使用，首次遇到的字符计算后缓存）"""
+
+    def __missing__(self, code: int) -> str:
+        result = []
+        for char in unicodedata.normalize('NFKC', chr(code)).casefold():
+            if char not in _KEEP_CHARS and unicodedata.category(char) in _DROP_CATEGORIES:
+                continue
+            result.append(_T2S.get(char, char))
+        normalized = ''.join(result)
+        self[code] = normalized
+        return normalized
+
+
+_TABLE = _NormalizeTable()
+
+
+def normalize(text: str) -> str:
+    """归一化文本（长度可能变化，需要对应原文位置时用 normalize_with_offsets）"""
+    if not text:
+        return ''
+    return text.translate(_TABLE)
+
+
+def normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    """
+    归一化并返回位置映射
+
+    Returns:
+        (归一化文本, offsets)，offsets[i] 为归一化文本第 i 个字符在原文中的位置
+    """
+    parts = []
+    offsets = []
+    table = _TABLE
+    for index, char in enumerate(text or ''):
+        mapped = table[ord(char)]
+        if mapped:
+            parts.append(mapped)
+            offsets.extend([index] * len(mapped))
+    return ''.join(parts), offsets
+
+
+def original_span(offsets: List[int], start: int, end: int) -> Tuple[int, int]:
+    """把归一化文本中的 [start, end) 换算为原文位置"""
+    return offsets[start], offsets[end - 1] + 1